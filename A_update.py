@@ -4,15 +4,14 @@ import time
 import json
 import pandas as pd
 import schedule
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
 from openpyxl.utils import get_column_letter
-from watchdog.observers.polling import PollingObserver as Observer
 from datetime import datetime
 import pythoncom
 import win32com.client
+import fs_watch         # 同目录的共用模块：就绪探测、监控后端选择
 
 # === 加载配置 ===
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -29,9 +28,22 @@ sheet      = cfg['sheet']['target_sheet']
 sources    = cfg['sources']
 settings   = cfg.get('settings', {})
 clear_old  = settings.get('clear_old_highlight','N').upper() == 'Y'
+# 监控后端：'auto'（默认，网络盘 / 同步盘上轮询，否则原生）/ 'native' / 'polling'
+observer_mode = settings.get('observer', 'auto').lower()
+poll_interval = settings.get('poll_interval_seconds', 1)
+# 就绪探测：保存之后等文件真正可用再继续（代替固定的 sleep）
+ready_timeout = settings.get('ready_timeout_seconds', 60)
+ready_stable  = settings.get('ready_stable_seconds', 0.5)
+ready_poll    = settings.get('ready_poll_seconds', 0.2)
 fund_patterns  = cfg.get('fund_function_patterns', {})
 owner_patterns = cfg.get('owner_root_cause_patterns', {})
 
+def wait_until_ready(fp, stage="", timeout=None):
+    """fs_watch.wait_until_ready，超时（默认 ready_timeout）/ 稳定时间 / 轮询间隔取 settings"""
+    return fs_watch.wait_until_ready(fp, stage, ready_timeout if timeout is None else timeout,
+                                     ready_stable, ready_poll)
+
+
 def is_row_blank(ws, row):
     for c in range(1, ws.max_column + 1):
         if ws.cell(row, c).value not in (None, ""):
@@ -345,10 +357,15 @@ def update_excel(new_fp):
     
     # 保存
     wb.save(orig_fp)  
-    time.sleep(5)
+    wait_until_ready(orig_fp, "保存汇总表")
     print(f"[{ts}] 更新完成并保存到原表{orig_fp}, 请继续输入")
     
 
+def _start_observer(handler, dirs):
+    """fs_watch.start_observer，监控模式 / 轮询间隔取 settings.observer / poll_interval_seconds"""
+    return fs_watch.start_observer(handler, dirs, observer_mode, poll_interval)
+
+
 class FolderHandler(FileSystemEventHandler):
     def __init__(self, folders, debounce_seconds=5):
         self.folders = folders
@@ -388,11 +405,8 @@ def main():
     for d in (ORIG_DIR, JIRA_DIR, OCTANE_DIR):
         os.makedirs(d, exist_ok=True)
 
-    observer = Observer()
     handler  = FolderHandler(folders, debounce_seconds=5)
-    observer.schedule(handler, path=JIRA_DIR, recursive=False)
-    observer.schedule(handler, path=OCTANE_DIR, recursive=False)
-    observer.start()
+    observer = _start_observer(handler, [JIRA_DIR, OCTANE_DIR])
     print(f"监控：{JIRA_DIR}, {OCTANE_DIR}")
 
     try:
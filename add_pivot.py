@@ -3,13 +3,13 @@ import time
 import json
 import pandas as pd
 import schedule
-from watchdog.observers.polling import PollingObserver as Observer
 from watchdog.events import FileSystemEventHandler
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
 from openpyxl.utils import get_column_letter
 from datetime import datetime
 import win32com.client  # pip install pywin32
+import fs_watch         # 同目录的共用模块：监控后端选择
 
 # === 加载配置 ===
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -24,6 +24,9 @@ paths           = cfg['paths']
 sheet_name      = cfg['sheet']['target_sheet']
 sources         = cfg['sources']
 clear_old       = cfg.get('settings', {}).get('clear_old_highlight','N').upper() == 'Y'
+# 监控后端：'auto'（默认，网络盘 / 同步盘上轮询，否则原生）/ 'native' / 'polling'
+observer_mode   = cfg.get('settings', {}).get('observer', 'auto').lower()
+poll_interval   = cfg.get('settings', {}).get('poll_interval_seconds', 1)
 fund_patterns   = cfg.get('fund_function_patterns', {})
 owner_patterns  = cfg.get('owner_root_cause_patterns', {})
 
@@ -220,6 +223,11 @@ def update_in_place(new_fp):
     # ---- 调用 COM 去更新并刷新 PivotTable ----
     _refresh_pivot_tables(orig_fp, sheet_name)
 
+def _start_observer(handler, dirs):
+    """fs_watch.start_observer，监控模式 / 轮询间隔取 settings.observer / poll_interval_seconds"""
+    return fs_watch.start_observer(handler, dirs, observer_mode, poll_interval)
+
+
 class FolderHandler(FileSystemEventHandler):
     def on_created(self, event):
         self._check(event.src_path)
@@ -237,11 +245,8 @@ def main():
     for d in (ORIG_DIR, JIRA_DIR, OCTANE_DIR):
         os.makedirs(d, exist_ok=True)
 
-    observer = Observer()
     handler  = FolderHandler()
-    observer.schedule(handler, path=JIRA_DIR, recursive=False)
-    observer.schedule(handler, path=OCTANE_DIR, recursive=False)
-    observer.start()
+    observer = _start_observer(handler, [JIRA_DIR, OCTANE_DIR])
     print(f"监控目录：{JIRA_DIR}, {OCTANE_DIR}")
 
     # 保留每日 08:00 全量扫描（可选）
@@ -0,0 +1,117 @@
+# bench_jira_csv.py
+# 对比 Jira 导出 CSV 的两种读法，读入和日期解析分开计时：
+#   旧：裸 pd.read_csv（全部列、全部推断类型）+ 合并时逐个 pd.to_datetime 解析日期
+#   新：tx_auto_update2.3.1.2.py 里的 _read_csv_typed（列投影 + 指定类型）+ _normalize_dates（整列解析）
+# 新实现经 tx_loader 载入，配置取 unified_config_auto.json 的 sources.Jira。
+#
+# 用法：python bench_jira_csv.py [行数=50000] [列数=150]
+# 生成的临时 CSV 放在系统临时目录，跑完删除。装了 pyarrow 时顺带测 csv_engine="pyarrow"。
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from tx_loader import load_tx
+
+
+# —— 旧流程 ——
+def read_bare(fp):
+    """旧读法：全部列、全部推断类型"""
+    return pd.read_csv(fp)
+
+
+def dates_legacy(df, src_cfg):
+    """旧流程：合并时逐个 pd.to_datetime 解析日期"""
+    return df[src_cfg["date_col"]].map(lambda v: pd.to_datetime(v).to_pydatetime())
+
+
+def build_csv(fp, rows, ncol):
+    """仿 CodeCraft Jira 导出：mapping 用到的 8 列 + 其余填充列（文本 / 数字 / 大量空值混杂）"""
+    rng  = np.random.default_rng(0)
+    base = pd.date_range("2024-01-01", periods=rows, freq="17min")
+    data = {
+        "Issue key":         [f"CC-{i}" for i in range(rows)],
+        "Issue id":          np.arange(100000, 100000 + rows),
+        "Created":           base.strftime("%d/%b/%y %I:%M %p"),
+        "Summary":           [f"[SLI] lane change aborted near exit {i % 977}" for i in range(rows)],
+        "Status":            rng.choice(["Open", "In Progress", "Resolved", "Closed"], rows),
+        "Reporter":          rng.choice(["rep a", "rep b", "rep c"], rows),
+        "Assignee":          rng.choice(["Zed Zhang", "Amy Li", ""], rows),
+        "Affects Version/s": rng.choice(["25.07", "25.11", "26.03"], rows),
+        "Priority":          rng.choice(["P1", "P2", "P3"], rows),
+    }
+    for c in range(len(data), ncol):
+        kind = c % 3
+        if kind == 0:
+            data[f"Custom field ({c})"] = rng.choice(["alpha", "beta", "", "gamma delta"], rows)
+        elif kind == 1:
+            data[f"Custom field ({c})"] = rng.integers(0, 10000, rows)
+        else:
+            data[f"Custom field ({c})"] = np.where(rng.random(rows) < 0.7, np.nan, rng.random(rows))
+    pd.DataFrame(data).to_csv(fp, index=False)
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - t0
+
+
+def peak_mem(func, *args):
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(name, read, dates, fp, src_cfg):
+    """读入、日期解析分别计时（不开 tracemalloc），再单独跑一遍读入量峰值内存"""
+    df, t_read = timed(read, fp)
+    _, t_date  = timed(dates, df, src_cfg)
+    peak = peak_mem(read, fp)
+    print(f"  {name:<26} {df.shape[1]:>4} 列  读入 {t_read:7.3f} s  日期 {t_date:7.3f} s  "
+          f"合计 {t_read + t_date:7.3f} s  读入峰值内存 {peak / 2**20:8.1f} MiB")
+    return t_read, t_date, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    ncol = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+
+    workdir = tempfile.mkdtemp()
+    try:
+        tx = load_tx(workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    src_cfg = tx.sources["Jira"]
+
+    fd, fp = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        build_csv(fp, rows, ncol)
+        print(f"Jira CSV：{rows} 行 × {ncol} 列，{os.path.getsize(fp) / 2**20:.1f} MiB")
+        old = run("旧：read_csv + 逐个解析", read_bare, dates_legacy, fp, src_cfg)
+        new = run("新：_read_csv_typed（c）", lambda p: tx._read_csv_typed(p, src_cfg),
+                  tx._normalize_dates, fp, src_cfg)
+        try:
+            import pyarrow  # noqa: F401
+            arrow_cfg = dict(src_cfg, csv_engine="pyarrow")
+            run("新：_read_csv_typed（pyarrow）", lambda p: tx._read_csv_typed(p, arrow_cfg),
+                tx._normalize_dates, fp, arrow_cfg)
+        except ImportError:
+            print("  （未安装 pyarrow，跳过 pyarrow 解析器）")
+        speedup = lambda a, b: a / max(b, 1e-9)
+        print(f"  读入加速比 {speedup(old[0], new[0]):.1f}x，日期解析加速比 {speedup(old[1], new[1]):.1f}x，"
+              f"合计 {speedup(old[0] + old[1], new[0] + new[1]):.1f}x；"
+              f"读入峰值内存降为 1/{old[2] / max(new[2], 1):.1f}")
+    finally:
+        os.remove(fp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench_trim_blank_rows.py
+# 对比逐行 delete_rows 与一次性截断两种尾部空行清理方式的耗时
+#
+# 用法：python bench_trim_blank_rows.py [尾部空行数=50000] [数据行数=5000] [列数=30]
+# 旧实现是平方级，5 万空行要跑很久；加 --skip-legacy 只测新实现。
+# 新实现直接取 tx_auto_update2.3.1.2.py 里的 trim_trailing_blank_rows（经 tx_loader 载入）。
+
+import sys
+import time
+import shutil
+import tempfile
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+from tx_loader import load_tx
+
+
+# —— 旧实现（各脚本里复制的版本） ——
+def is_row_blank(ws, row):
+    for c in range(1, ws.max_column + 1):
+        if ws.cell(row, c).value not in (None, ""):
+            return False
+    return True
+
+def trim_trailing_blank_rows_legacy(ws):
+    for r in range(ws.max_row, 1, -1):
+        if is_row_blank(ws, r):
+            ws.delete_rows(r)
+        else:
+            break
+
+
+def build_sheet(data_rows, phantom_rows, ncol):
+    """表头 + data_rows 行数据 + phantom_rows 行只有填充色、没有值的“幽灵行”"""
+    wb = Workbook()
+    ws = wb.active
+    ws.append([f"Col{c}" for c in range(1, ncol + 1)])
+    for r in range(data_rows):
+        ws.append([f"r{r}c{c}" for c in range(ncol)])
+    fill = PatternFill("solid", fgColor="ADD8E6")
+    for r in range(data_rows + 2, data_rows + 2 + phantom_rows):
+        ws.cell(r, 1).fill = fill
+        ws.cell(r, ncol).fill = fill
+    return ws
+
+
+def run(func, data_rows, phantom_rows, ncol):
+    ws = build_sheet(data_rows, phantom_rows, ncol)
+    before = ws.max_row
+    t0 = time.perf_counter()
+    func(ws)
+    cost = time.perf_counter() - t0
+    assert ws.max_row == data_rows + 1, ws.max_row
+    print(f"  {func.__name__:<34} {before:>7} → {ws.max_row:<7} 行  耗时 {cost:8.3f} s")
+    return cost
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    phantom = int(args[0]) if len(args) > 0 else 50000
+    data    = int(args[1]) if len(args) > 1 else 5000
+    ncol    = int(args[2]) if len(args) > 2 else 30
+
+    workdir = tempfile.mkdtemp()
+    try:
+        tx = load_tx(workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"数据行 {data}，尾部空行 {phantom}，列数 {ncol}")
+    new_cost = run(tx.trim_trailing_blank_rows, data, phantom, ncol)
+    if "--skip-legacy" in sys.argv:
+        return
+    old_cost = run(trim_trailing_blank_rows_legacy, data, phantom, ncol)
+    print(f"  加速比 {old_cost / max(new_cost, 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# fs_watch.py
+# 各监控脚本（tx_auto_update2.3.1.2.py、A_update.py、add_pivot.py）共用的文件系统工具：
+#   就绪探测：等 Excel / OneDrive 放开文件再读写（代替固定的 sleep）
+#   监控后端：按目录所在的盘选原生文件通知或轮询
+# 这里不读配置，超时、监控模式等参数由调用方从各自的 settings 传入。
+
+import os
+import time
+import ctypes
+from watchdog.observers import Observer as NativeObserver
+from watchdog.observers.polling import PollingObserver
+try:
+    import msvcrt       # Windows：就绪探测里试加独占锁
+except ImportError:
+    msvcrt = None
+try:
+    import fcntl        # POSIX
+except ImportError:
+    fcntl = None
+
+
+# === 就绪探测 ===
+def excel_lock_files(fp):
+    """Excel 打开 xxx.xlsx 时在同目录生成的锁文件 ~$xxx.xlsx（长文件名时去掉前两个字符）"""
+    d, name = os.path.split(fp)
+    return [os.path.join(d, "~$" + name), os.path.join(d, "~$" + name[2:])]
+
+
+def try_exclusive(fp):
+    """能否以读写方式打开并加上独占锁（Excel / OneDrive 占用时失败）"""
+    try:
+        with open(fp, 'r+b') as fh:
+            if msvcrt:
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            elif fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(fh, fcntl.LOCK_UN)
+        return True
+    except OSError:
+        return False
+
+
+def wait_until_ready(fp, stage="", timeout=60, stable=0.5, poll=0.2):
+    """
+    等 fp 可以安全读写：size 和 mtime 至少 stable 秒没变、没有 Excel 的 ~$ 锁文件、能独占打开。
+    文件本来就空闲时立即返回；超过 timeout 秒打印警告并返回 False，调用方照常继续。
+    """
+    start = time.monotonic()
+    last = since = None
+    while True:
+        now = time.monotonic()
+        try:
+            st = os.stat(fp)
+        except FileNotFoundError:
+            st = None
+        sig = (st.st_size, st.st_mtime_ns) if st else None
+        if since is None or sig != last:
+            # 第一次看到的文件按 mtime 推算已经稳定了多久，只有刚写完的才需要等
+            age = max(time.time() - st.st_mtime, 0) if st and since is None else 0
+            last, since = sig, now - age
+        if st is None:
+            reason = "文件不存在"
+        elif now - since < stable:
+            reason = "大小 / 修改时间还在变化"
+        elif any(os.path.exists(p) for p in excel_lock_files(fp)):
+            reason = "Excel 打开中（有 ~$ 锁文件）"
+        elif not try_exclusive(fp):
+            reason = "被其它程序占用"
+        else:
+            waited = now - start
+            if waited >= 1:
+                print(f"  {stage or os.path.basename(fp)}：等待 {waited:.1f}s 后就绪")
+            return True
+        if now - start >= timeout:
+            print(f"⚠️ {stage or os.path.basename(fp)}：{timeout}s 内未就绪（{reason}），继续执行")
+            return False
+        time.sleep(poll)
+
+
+# === 监控后端 ===
+NETWORK_FS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'sshfs', 'fuse.sshfs', 'fuse.rclone', 'davfs',
+              'fuse.davfs2', 'fuse.onedriver', 'fuse.gvfsd-fuse', '9p', 'drvfs', 'afs', 'ceph', 'glusterfs'}
+
+def remote_mount(path):
+    """目录在网络盘 / 同步盘上时返回说明（原生文件通知在这类挂载上不可靠），本地盘返回 None"""
+    path = os.path.realpath(path)
+    for env in ('OneDrive', 'OneDriveCommercial', 'OneDriveConsumer'):
+        root = os.environ.get(env)
+        if root and (path + os.sep).lower().startswith(os.path.realpath(root).lower() + os.sep):
+            return f"OneDrive 同步目录 {root}"
+    if os.name == 'nt':
+        if path.startswith('\\\\'):
+            return "网络路径"
+        if ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + '\\') == 4:   # DRIVE_REMOTE
+            return "网络驱动器"
+        return None
+    try:
+        with open('/proc/mounts', encoding='utf-8') as fh:
+            mounts = [(mp.replace('\\040', ' '), fs) for _, mp, fs, *_ in (line.split() for line in fh)]
+    except OSError:
+        return None
+    hits = [(mp, fs) for mp, fs in mounts if path == mp or path.startswith(mp.rstrip('/') + '/')]
+    if hits:
+        mp, fs = max(hits, key=lambda m: len(m[0]))
+        if fs in NETWORK_FS:
+            return f"{fs} 挂载 {mp}"
+    return None
+
+
+def start_observer(handler, dirs, mode='auto', poll_interval=1):
+    """
+    选监控后端并启动，返回 observer：
+      'native'  系统原生通知（Linux inotify、Windows ReadDirectoryChangesW…）
+      'polling' 每 poll_interval 秒轮询一次
+      'auto'    默认；有目录在网络盘 / 同步盘上时轮询，否则原生
+    原生后端启动失败（如 inotify 句柄数用尽）时退回轮询。
+    """
+    reason = ""
+    if mode == 'auto':
+        remote = [r for r in map(remote_mount, dirs) if r]
+        mode   = 'polling' if remote else 'native'
+        reason = f"（{remote[0]}）" if remote else ""
+    if mode == 'native':
+        observer = NativeObserver()
+        try:
+            for d in dirs:
+                observer.schedule(handler, path=d, recursive=False)
+            observer.start()
+            print(f"监控后端：{type(observer).__name__}（原生）")
+            return observer
+        except OSError as e:
+            reason = f"（原生监控启动失败：{e}）"
+    observer = PollingObserver(timeout=poll_interval)
+    for d in dirs:
+        observer.schedule(handler, path=d, recursive=False)
+    observer.start()
+    print(f"监控后端：PollingObserver，每 {poll_interval}s 轮询{reason}")
+    return observer
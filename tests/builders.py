@@ -0,0 +1,259 @@
+# 测试用的汇总表 / Octane 导出 / Jira 导出生成器，列名与 unified_config_auto.json 的 mapping 对应
+import os
+import re
+import csv
+import random
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import PatternFill
+
+HEADERS = ["ID", "Ticket no. supplier", "Name", "Closed in version", "Involved I-Step",
+           "First use/SoP of function", "Creation time", "Days", "Open >20 days", "Error occurrence",
+           "Phase", "Found in function", "Function", "Defect finder", "Owner", "Root cause",
+           "Target I-Step:", "Follow up", "Planned closing version", "No TIS", "Days in the pahse", "Tags",
+           "Top issue Candidiate", "Blocking reason", "Rejected ticket", "Octane or Jira", "Priority"]
+OCTANE_COLS = ["ID", "Ticket no. supplier", "Name", "Closed in version", "Involved I-Step",
+               "First use/SoP of function", "Creation time", "Error occurrence", "Phase", "Found in function",
+               "Defect finder", "Owner", "Target I-Step", "Target Week", "Planned closing version",
+               "Days in phase", "Tags"]
+JIRA_COLS = ["Issue key", "Issue id", "Created", "Summary", "Status", "Reporter", "Assignee",
+             "Affects Version/s", "Priority", "Extra1"]
+DATE_FORMAT = "m/d/yyyy h:mm:ss AM/PM"
+
+FUNCS   = ["keep distance [01.02.02.15.02.11]", "change lane [01.02.02.15.02.07]", "foo", "BS2 something", None]
+OWNERS  = ["Rick Yu", "Zed Zhang", "nobody", "Han Jia (hanjia)", "", None, "Matthias Stark"]
+PHASES  = ["New", "Open", "Closed", "Resolved", "In progress", "Concluded", None]
+ISTEPS  = ["G070-24-11-500", "U006-25-03", "Something （25-07-452 ATS+3）", "x (24-01-1)", "plain", None]
+FILLS   = {"green": "8ED973", "blue": "ADD8E6", "gray": "C0C0C0", "red": "FF0000"}
+
+
+def summary_path(tx):
+    return os.path.join(tx.ORIG_DIR, tx.paths['original_file'])
+
+
+def octane_path(tx, name="octane_export.xlsx"):
+    return os.path.join(tx.OCTANE_DIR, name)
+
+
+def jira_path(tx, name="jira.csv"):
+    return os.path.join(tx.JIRA_DIR, name)
+
+
+def legacy_istep(val):
+    """旧版逐个值的 Involved I-Step 规整（_istep_na05 的对照）"""
+    s = str(val)
+    if s.startswith("G070") or s.startswith("U006"):
+        return "NA05" + s[4:]
+    m = re.search(r'[（(]([\d-]+)', s)
+    return f"NA05-{m.group(1)}" if m else val
+
+
+def _ticket(rng, i, jira):
+    return {"ID": f"CC-{i}" if jira else i, "Ticket no. supplier": f"T{i}", "Name": f"name {i}",
+            "Involved I-Step": rng.choice(ISTEPS),
+            "Creation time": datetime(2025, 1, 1) + timedelta(days=rng.randint(0, 200), minutes=rng.randint(0, 999)),
+            "Phase": rng.choice(PHASES), "Found in function": rng.choice(FUNCS), "Owner": rng.choice(OWNERS),
+            "Target I-Step:": rng.choice(["", "A", None]), "Planned closing version": rng.choice(["", "v1", None]),
+            "Tags": rng.choice(["IPN_CN_TopIssue", "x", None]), "Top issue Candidiate": rng.choice(["Yes", None]),
+            "Blocking reason": rng.choice(["blk", None]), "Defect finder": "df", "Priority": rng.choice(["P1", "P2"]),
+            "Days in the pahse": rng.randint(0, 50)}
+
+
+def build_summary(fp, n=60, seed=1, sheet="Octane and jira", extra_sheet=True):
+    """
+    汇总表：n 行工单（每 3 行一个 Jira），随机染上受管颜色和一个非受管的红色，
+    Creation time 带日期格式；末尾有只带格式的空行；最后一个 Octane ID 在表里重复出现一次。
+    返回 (octane_ids, jira_ids)
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = sheet
+    ws.append(HEADERS)
+    if extra_sheet:
+        other = wb.create_sheet("Notes")
+        other["A1"] = "keep me"
+    fills = {k: PatternFill("solid", fgColor=v) for k, v in FILLS.items()}
+    octane_ids, jira_ids = [], []
+    for k in range(n):
+        jira = k % 3 == 0
+        i = 1000 + k
+        (jira_ids if jira else octane_ids).append(f"CC-{i}" if jira else i)
+        v = _ticket(rng, i, jira)
+        ws.append([v.get(h) for h in HEADERS])
+        r = ws.max_row
+        for c in range(1, len(HEADERS) + 1):
+            x = rng.random()
+            if x < 0.05:
+                ws.cell(r, c).fill = fills["green"]
+            elif x < 0.1:
+                ws.cell(r, c).fill = fills["blue"]
+            elif x < 0.12:
+                ws.cell(r, c).fill = fills["red"]
+        ws.cell(r, 7).number_format = DATE_FORMAT
+    # 表里重复的 ID：按最后一行为准
+    dup = dict(_ticket(rng, octane_ids[-1], False), Phase="Open")
+    ws.append([v for v in (dup.get(h) for h in HEADERS)])
+    for r in range(ws.max_row + 1, ws.max_row + 10):
+        ws.cell(r, 3).fill = fills["red"]
+    wb.save(fp)
+    return octane_ids, jira_ids
+
+
+def build_octane(fp, existing, n_new=10, seed=2, start=5000, links=True):
+    """Octane 导出：部分已有 ID + n_new 个新 ID，前三个 ID 重复一次；大部分 ID 带超链接"""
+    rng = random.Random(seed)
+    ids = [i for i in existing if rng.random() < 0.7] + list(range(start, start + n_new))
+    ids += ids[:3]
+    rng.shuffle(ids)
+    wb = Workbook()
+    ws = wb.active
+    ws.append(OCTANE_COLS)
+    for i in ids:
+        v = _ticket(rng, i, False)
+        row = {"ID": i, "Ticket no. supplier": rng.choice([f"T{i}", f"T{i}b"]), "Name": v["Name"],
+               "Involved I-Step": v["Involved I-Step"], "Creation time": v["Creation time"], "Phase": v["Phase"],
+               "Found in function": v["Found in function"], "Owner": v["Owner"], "Target I-Step": v["Target I-Step:"],
+               "Planned closing version": v["Planned closing version"], "Days in phase": v["Days in the pahse"],
+               "Tags": v["Tags"], "Defect finder": "df2", "Target Week": rng.choice(["KW1", None])}
+        ws.append([row.get(h) for h in OCTANE_COLS])
+        if links and rng.random() < 0.8:
+            ws.cell(ws.max_row, 1).hyperlink = f"https://octane/x?id={i}"
+    wb.save(fp)
+    return ids
+
+
+def build_jira(fp, existing, n_new=8, seed=3, start=7000):
+    """Jira CSV：部分已有 ID + n_new 个新 ID；少量 Created 是无法解析的文本或空值"""
+    rng = random.Random(seed)
+    ids = [i for i in existing if rng.random() < 0.7] + [f"CC-{i}" for i in range(start, start + n_new)]
+    with open(fp, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(JIRA_COLS)
+        for k, key in enumerate(ids):
+            d = (datetime(2025, 1, 1) + timedelta(days=rng.randint(0, 200), hours=rng.randint(0, 23))
+                 ).strftime("%d/%b/%y %I:%M %p")
+            if k == 1:
+                d = "garbage"
+            elif k == 2:
+                d = ""
+            w.writerow([key, k, d, f"sum {key}", rng.choice(["New", "Open", "Closed", "In Progress"]), "rep",
+                        rng.choice(["Rick Yu", "Zed Zhang", "x", ""]), rng.choice(["v1", ""]),
+                        rng.choice(["P1", "P2", ""]), "e1"])
+    return ids
+
+
+def sheet_state(fp, sheet="Octane and jira"):
+    """
+    {(行, 列): (值, 纯色填充 RGB 后 6 位, 数字格式, 超链接)}，用来比较两条路径写出的汇总表；
+    没有值、没有填充、没有超链接的格子不计（只带格式的空格子）
+    """
+    ws = load_workbook(fp)[sheet]
+    state = {}
+    for (r, c), cell in ws._cells.items():
+        value = cell.value
+        fill  = cell.fill.fgColor.rgb[-6:] if cell.fill.patternType == "solid" else None
+        link  = cell.hyperlink.target if cell.hyperlink is not None else None
+        if value in (None, "") and fill is None and link is None:
+            continue
+        state[(r, c)] = (value, fill, cell.number_format, link)
+    return state
+
+
+_NS = ('xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+       'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_CT  = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+
+
+def add_pivots(fp, sheet="Octane and jira", ref="A1:AA5", count=1, host_part="xl/worksheets/sheet2.xml",
+               data_fmt=None):
+    """
+    手写最小的透视表部件（缓存定义 + 缓存记录 + 透视表）挂到 host_part 所在的工作表上，
+    count 个透视表各自一个内容相同的缓存（cacheId 从 5 起）。
+    data_fmt 给了 numFmtId 时透视表带一个按该格式显示的数据字段。
+    """
+    import re
+    import shutil
+    import zipfile
+    tmp = fp + ".src"
+    shutil.move(fp, tmp)
+    host_rels = f"{os.path.dirname(host_part)}/_rels/{os.path.basename(host_part)}.rels"
+    overrides, wb_rels, caches, host = [], [], [], []
+    parts = {}
+    for k in range(1, count + 1):
+        parts[f"xl/pivotCache/pivotCacheDefinition{k}.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<pivotCacheDefinition {_NS} r:id="rId1" '
+            f'refreshOnLoad="0" recordCount="2"><cacheSource type="worksheet"><worksheetSource ref="{ref}" '
+            f'sheet="{sheet}"/></cacheSource><cacheFields count="1"><cacheField name="ID" numFmtId="0">'
+            f'<sharedItems/></cacheField></cacheFields></pivotCacheDefinition>')
+        parts[f"xl/pivotCache/pivotCacheRecords{k}.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<pivotCacheRecords {_NS} count="2">'
+            f'<r><s v="a"/></r><r><s v="b"/></r></pivotCacheRecords>')
+        parts[f"xl/pivotCache/_rels/pivotCacheDefinition{k}.xml.rels"] = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="http://schemas.'
+            f'openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="{_REL}/pivotCacheRecords" '
+            f'Target="pivotCacheRecords{k}.xml"/></Relationships>')
+        parts[f"xl/pivotTables/pivotTable{k}.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<pivotTableDefinition {_NS} name="PT{k}" '
+            f'cacheId="{4 + k}" dataCaption="Values"><location ref="A{3 + 4 * k}:B{5 + 4 * k}" firstHeaderRow="1" '
+            f'firstDataRow="1" firstDataCol="0"/><pivotFields count="1"><pivotField showAll="0"/></pivotFields>'
+            + (f'<dataFields count="1"><dataField name="Count of ID" fld="0" subtotal="count" '
+               f'numFmtId="{data_fmt}"/></dataFields>' if data_fmt is not None else '')
+            + '</pivotTableDefinition>')
+        parts[f"xl/pivotTables/_rels/pivotTable{k}.xml.rels"] = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="http://schemas.'
+            f'openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="{_REL}/pivotCacheDefinition" '
+            f'Target="../pivotCache/pivotCacheDefinition{k}.xml"/></Relationships>')
+        overrides += [f'<Override PartName="/xl/pivotCache/pivotCacheDefinition{k}.xml" ContentType="{_CT}.pivotCacheDefinition+xml"/>',
+                      f'<Override PartName="/xl/pivotCache/pivotCacheRecords{k}.xml" ContentType="{_CT}.pivotCacheRecords+xml"/>',
+                      f'<Override PartName="/xl/pivotTables/pivotTable{k}.xml" ContentType="{_CT}.pivotTable+xml"/>']
+        wb_rels.append(f'<Relationship Id="rIdPc{k}" Type="{_REL}/pivotCacheDefinition" '
+                       f'Target="pivotCache/pivotCacheDefinition{k}.xml"/>')
+        caches.append(f'<pivotCache cacheId="{4 + k}" r:id="rIdPc{k}"/>')
+        host.append(f'<Relationship Id="rIdPt{k}" Type="{_REL}/pivotTable" Target="../pivotTables/pivotTable{k}.xml"/>')
+    parts[host_rels] = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="http://'
+                        'schemas.openxmlformats.org/package/2006/relationships">' + "".join(host) + '</Relationships>')
+
+    with zipfile.ZipFile(tmp) as zin, zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info.filename).decode("utf-8")
+            if info.filename == "[Content_Types].xml":
+                data = data.replace("</Types>", "".join(overrides) + "</Types>")
+            elif info.filename == "xl/_rels/workbook.xml.rels":
+                data = data.replace("</Relationships>", "".join(wb_rels) + "</Relationships>")
+            elif info.filename == "xl/workbook.xml":
+                data = re.sub(r"(</sheets>)", r"\1<pivotCaches>" + "".join(caches) + "</pivotCaches>", data, count=1)
+            zout.writestr(info, data)
+        for name, data in parts.items():
+            zout.writestr(name, data)
+    os.remove(tmp)
+
+
+def renumber_formats(fp, ids):
+    """把 styles.xml 里的自定义 numFmtId 按 {旧: 新} 改号（模拟 Excel 存出来的非连续编号）"""
+    import re
+    import shutil
+    import zipfile
+    tmp = fp + ".src"
+    shutil.move(fp, tmp)
+    with zipfile.ZipFile(tmp) as zin, zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info.filename)
+            if info.filename == "xl/styles.xml":
+                data = re.sub(rb'numFmtId="(\d+)"',
+                              lambda m: b'numFmtId="%d"' % ids.get(int(m.group(1)), int(m.group(1))), data)
+            zout.writestr(info, data)
+    os.remove(tmp)
+
+
+def numfmt_codes(fp):
+    """styles.xml 里的 {numFmtId: formatCode}"""
+    import re
+    import zipfile
+    from xml.sax.saxutils import unescape
+    with zipfile.ZipFile(fp) as z:
+        xml = z.read("xl/styles.xml").decode("utf-8")
+    return {int(i): unescape(c, {"&quot;": '"', "&apos;": "'"})
+            for i, c in re.findall(r'<numFmt numFmtId="(\d+)" formatCode="([^"]*)"', xml)}
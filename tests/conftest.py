@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from tx_loader import load_tx  # noqa: E402
+
+# 测试用的 settings 覆盖：保存后不等文件稳定、不走 COM、不生成报表；指纹 / 变更日志按需在用例里打开
+TEST_SETTINGS = {
+    "ready_stable_seconds": 0,
+    "ready_timeout_seconds": 5,
+    "ready_poll_seconds": 0.01,
+    "pivot_refresh": "xml",
+    "reports": "N",
+    "fingerprint": "N",
+    "journal": "N",
+}
+
+
+@pytest.fixture
+def make_tx(tmp_path):
+    """按需载入脚本：make_tx(journal="Y") 之类覆盖 settings，每次一个独立的工作目录"""
+    count = [0]
+
+    def make(**settings):
+        count[0] += 1
+        workdir = tmp_path / f"w{count[0]}"
+        workdir.mkdir()
+        return load_tx(str(workdir), dict(TEST_SETTINGS, **settings))
+    return make
+
+
+@pytest.fixture
+def tx(make_tx):
+    return make_tx()
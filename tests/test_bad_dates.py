@@ -0,0 +1,55 @@
+# 无法解析的日期：只报告通过指纹过滤、真正要合并的行；每个来源一份报告
+import csv
+import glob
+import os
+
+import pandas as pd
+
+from builders import build_summary, build_jira, summary_path, jira_path
+
+
+def _edit_row(fp, k, col, value):
+    with open(fp, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    rows[k + 1][col] = value
+    with open(fp, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_only_rows_that_survive_the_fingerprint_filter(make_tx):
+    tx = make_tx(fingerprint="Y")
+    _, jira_ids = build_summary(summary_path(tx))
+    ids = build_jira(jira_path(tx), jira_ids)
+    report = os.path.join(tx.ORIG_DIR, "date_errors_Jira.csv")
+
+    tx.update_excel(jira_path(tx))
+    assert pd.read_csv(report)["Issue key"].tolist() == [ids[1]]
+    os.remove(report)
+
+    # 第二次只改了另一个工单：带坏日期的那行指纹没变，不再报告
+    _edit_row(jira_path(tx), 0, 3, "changed summary")
+    tx.update_excel(jira_path(tx))
+    assert not os.path.exists(report)
+
+    # 坏日期那行本身改了，再次报告（覆盖同一个文件）
+    _edit_row(jira_path(tx), 1, 3, "changed too")
+    tx.update_excel(jira_path(tx))
+    assert pd.read_csv(report)["Issue key"].tolist() == [ids[1]]
+    assert [os.path.basename(p) for p in glob.glob(os.path.join(tx.ORIG_DIR, "date_errors_*"))] == \
+        ["date_errors_Jira.csv"]
+
+
+def test_dry_run_only_prints(make_tx, capsys):
+    tx = make_tx()
+    _, jira_ids = build_summary(summary_path(tx))
+    build_jira(jira_path(tx), jira_ids)
+    tx.plan_changes([jira_path(tx)])
+    assert "无法解析" in capsys.readouterr().out
+    assert glob.glob(os.path.join(tx.ORIG_DIR, "date_errors_*")) == []
+
+
+def test_to_pydatetime_only_swallows_parse_errors(tx):
+    assert tx._to_pydatetime("garbage") is None
+    assert tx._to_pydatetime(10 ** 30) is None          # 越界
+    assert tx._to_pydatetime(object()) is None
+    assert tx._to_pydatetime("2025-03-04 05:06").year == 2025
@@ -0,0 +1,61 @@
+# 批量合并：同一批里有两份会清除旧高亮的 Octane 导出
+import os
+import time
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import PatternFill
+
+from builders import build_summary, build_octane, build_jira, sheet_state, summary_path, octane_path, jira_path
+
+
+def _two_octane_exports(tx, jira=False):
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    first  = build_octane(octane_path(tx, "octane_1.xlsx"), octane_ids, seed=2, start=5000)
+    second = build_octane(octane_path(tx, "octane_2.xlsx"), octane_ids, seed=4, start=6000)
+    later = time.time() + 10
+    os.utime(octane_path(tx, "octane_2.xlsx"), (later, later))
+    if jira:
+        build_jira(jira_path(tx), jira_ids)
+    return first, second
+
+
+def test_clear_highlight_skips_cells_without_style(tx):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["ID"])
+    ws.cell(2, 1).value = 1                        # 没设过样式：_style 为 None
+    ws.cell(2, 2).fill = PatternFill("solid", fgColor="ADD8E6")
+    ws.cell(2, 3).fill = PatternFill("solid", fgColor="FF0000")
+    tx.clear_highlight(ws, tx.highlight_colors)
+    assert ws.cell(2, 2).fill.patternType is None
+    assert ws.cell(2, 3).fill.fgColor.rgb.endswith("FF0000")
+
+
+def test_batch_of_two_octane_exports(tx):
+    first, second = _two_octane_exports(tx)
+    tx.update_batch([octane_path(tx, "octane_1.xlsx"), octane_path(tx, "octane_2.xlsx")])
+
+    ws = load_workbook(summary_path(tx))[tx.sheet]
+    rows = {ws.cell(r, 1).value: r for r in range(2, ws.max_row + 1)}
+    assert all(i in rows for i in first + second)
+    # 第二份导出合并前清掉了第一份留下的高亮，只有第二份新增的行还是绿色
+    green = {r for r in range(2, ws.max_row + 1)
+             if ws.cell(r, 3).fill.patternType == "solid" and ws.cell(r, 3).fill.fgColor.rgb.endswith("8ED973")}
+    assert green == {rows[i] for i in range(6000, 6010)}
+
+
+
+def test_batch_matches_sequential_updates(make_tx, capsys):
+    batch_tx = make_tx()
+    _two_octane_exports(batch_tx, jira=True)
+    # 参数顺序故意打乱：Jira 在前、较新的 Octane 在较旧的前面
+    batch_tx.update_batch([jira_path(batch_tx), octane_path(batch_tx, "octane_2.xlsx"),
+                           octane_path(batch_tx, "octane_1.xlsx")])
+    assert "合并顺序已调整" in capsys.readouterr().out
+
+    seq_tx = make_tx()
+    _two_octane_exports(seq_tx, jira=True)
+    for fp in (octane_path(seq_tx, "octane_1.xlsx"), octane_path(seq_tx, "octane_2.xlsx"), jira_path(seq_tx)):
+        seq_tx.update_excel(fp)
+
+    assert sheet_state(summary_path(batch_tx)) == sheet_state(summary_path(seq_tx))
@@ -0,0 +1,33 @@
+# dry-run + apply 必须与直接 update_excel 得到同样的汇总表（值、填充、数字格式、超链接）
+import json
+
+from builders import build_summary, build_octane, build_jira, sheet_state, summary_path, octane_path, jira_path
+
+
+def _exports(tx):
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    build_octane(octane_path(tx), octane_ids)
+    build_jira(jira_path(tx), jira_ids)
+    return [octane_path(tx), jira_path(tx)]
+
+
+def test_dry_run_then_apply_matches_update_excel(make_tx):
+    planned = make_tx()
+    cs_fp = planned.plan_changes(_exports(planned))
+    with open(cs_fp, encoding="utf-8") as f:
+        cs = json.load(f)
+    assert cs["formats"] and {fmt for _, _, fmt in cs["formats"]} == {planned.DATE_FORMAT}
+    assert planned.apply_changes(cs_fp)
+
+    direct = make_tx()
+    for fp in _exports(direct):
+        direct.update_excel(fp)
+
+    assert sheet_state(summary_path(planned)) == sheet_state(summary_path(direct))
+
+
+def test_apply_refuses_stale_change_set(make_tx):
+    tx = make_tx()
+    cs_fp = tx.plan_changes(_exports(tx))
+    tx.update_excel(octane_path(tx))
+    assert tx.apply_changes(cs_fp) is False
@@ -0,0 +1,36 @@
+# 指纹过滤：影响合并结果的配置变了（关键词、transforms…），上次的指纹全部作废、整份重新合并
+from openpyxl import load_workbook
+
+from builders import build_summary, build_octane, sheet_state, summary_path, octane_path
+
+ROOT_CAUSE_C = 16
+
+
+def _run_twice(tx, patterns):
+    octane_ids, _ = build_summary(summary_path(tx))
+    build_octane(octane_path(tx), octane_ids)
+    tx.update_excel(octane_path(tx))
+    tx.owner_patterns = patterns
+    tx.update_excel(octane_path(tx))
+
+
+def test_pattern_change_forces_full_remerge(make_tx):
+    patterns = {"Motion plan v2": ["Zed Zhang"]}
+    fp_tx = make_tx(fingerprint="Y")
+    _run_twice(fp_tx, patterns)
+
+    direct_tx = make_tx()
+    _run_twice(direct_tx, patterns)
+    assert sheet_state(summary_path(fp_tx)) == sheet_state(summary_path(direct_tx))
+
+    ws = load_workbook(summary_path(fp_tx))["Octane and jira"]
+    assert "Motion plan v2" in {ws.cell(r, ROOT_CAUSE_C).value for r in range(2, ws.max_row + 1)}
+
+
+def test_config_hash_covers_transforms_and_date_format(tx):
+    base = tx._config_hash("Octane")
+    tx.sources["Octane"] = dict(tx.sources["Octane"], date_format="%d.%m.%Y")
+    assert tx._config_hash("Octane") != base
+    changed = tx._config_hash("Octane")
+    tx.sources["Octane"] = dict(tx.sources["Octane"], transforms={"Name": ["strip"]})
+    assert tx._config_hash("Octane") != changed
@@ -0,0 +1,71 @@
+# fs_watch：各监控脚本共用的就绪探测
+import os
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers.polling import PollingObserver
+
+import fs_watch
+
+
+def test_idle_file_is_ready_immediately(tmp_path):
+    fp = tmp_path / "a.xlsx"
+    fp.write_bytes(b"x")
+    old = time.time() - 60
+    os.utime(fp, (old, old))
+    t0 = time.monotonic()
+    assert fs_watch.wait_until_ready(str(fp), timeout=5, stable=0.5, poll=0.01)
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_fresh_file_waits_until_stable(tmp_path):
+    fp = tmp_path / "a.xlsx"
+    fp.write_bytes(b"x")
+    t0 = time.monotonic()
+    assert fs_watch.wait_until_ready(str(fp), timeout=5, stable=0.2, poll=0.01)
+    assert time.monotonic() - t0 >= 0.1
+
+
+def test_excel_lock_file_and_missing_file_time_out(tmp_path, capsys):
+    fp = tmp_path / "summary.xlsx"
+    fp.write_bytes(b"x")
+    (tmp_path / "~$summary.xlsx").write_bytes(b"")
+    assert not fs_watch.wait_until_ready(str(fp), "打开汇总表", timeout=0.05, stable=0, poll=0.01)
+    assert "Excel 打开中" in capsys.readouterr().out
+    assert not fs_watch.wait_until_ready(str(tmp_path / "missing.xlsx"), timeout=0.05, stable=0, poll=0.01)
+    assert "文件不存在" in capsys.readouterr().out
+
+
+def test_script_wrapper_uses_settings(make_tx, tmp_path):
+    tx = make_tx(ready_timeout_seconds=0.05)
+    assert tx.wait_until_ready(str(tmp_path / "missing.xlsx")) is False
+
+
+def test_remote_mount_detects_onedrive(tmp_path, monkeypatch):
+    sub = tmp_path / "exports"
+    sub.mkdir()
+    monkeypatch.setenv("OneDrive", str(tmp_path))
+    assert fs_watch.remote_mount(str(sub)).startswith("OneDrive")
+    monkeypatch.delenv("OneDrive")
+    monkeypatch.delenv("OneDriveCommercial", raising=False)
+    monkeypatch.delenv("OneDriveConsumer", raising=False)
+    assert not (fs_watch.remote_mount(str(sub)) or "").startswith("OneDrive")
+
+
+def test_start_observer_modes(tmp_path, monkeypatch):
+    handler = FileSystemEventHandler()
+    observer = fs_watch.start_observer(handler, [str(tmp_path)], "polling", 0.1)
+    try:
+        assert isinstance(observer, PollingObserver)
+    finally:
+        observer.stop()
+        observer.join()
+
+    # auto：目录在同步盘上时改用轮询
+    monkeypatch.setenv("OneDrive", str(tmp_path))
+    observer = fs_watch.start_observer(handler, [str(tmp_path)], "auto", 0.1)
+    try:
+        assert isinstance(observer, PollingObserver)
+    finally:
+        observer.stop()
+        observer.join()
@@ -0,0 +1,88 @@
+# 变更日志：update → rollback 往返后汇总表回到原样（值、填充、数字格式、超链接）
+import sqlite3
+from contextlib import closing
+
+from openpyxl import load_workbook
+
+from builders import build_summary, build_octane, build_jira, sheet_state, summary_path, octane_path, jira_path
+
+
+def _last_run(tx):
+    with closing(sqlite3.connect(tx.JOURNAL_DB)) as conn:
+        return conn.execute("SELECT max(run) FROM runs").fetchone()[0]
+
+
+def test_update_then_rollback_round_trip(make_tx):
+    tx = make_tx(journal="Y")
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    build_octane(octane_path(tx), octane_ids)
+    build_jira(jira_path(tx), jira_ids)
+    # 日期列用和 DATE_FORMAT 不同的格式，Jira 更新日期时会改掉它
+    wb = load_workbook(summary_path(tx))
+    ws = wb["Octane and jira"]
+    ws.cell(2, 1).hyperlink = "https://example.invalid/keep"
+    for r in range(2, ws.max_row + 1):
+        ws.cell(r, 7).number_format = "yyyy-mm-dd"
+    wb.save(summary_path(tx))
+    original = sheet_state(summary_path(tx))
+
+    tx.update_excel(octane_path(tx))
+    octane_run = _last_run(tx)
+    tx.update_excel(jira_path(tx))
+    jira_run = _last_run(tx)
+    assert sheet_state(summary_path(tx)) != original
+
+    # 先回滚较早的 run 会撞上后一次 run 改过的格子
+    assert tx.rollback(jira_run) and tx.rollback(octane_run)
+    assert sheet_state(summary_path(tx)) == original
+
+    ws = load_workbook(summary_path(tx))["Octane and jira"]
+    n = len(octane_ids) + len(jira_ids) + 2
+    assert all(ws.cell(r, c).value is None for r in (n + 1, n + 2) for c in range(1, ws.max_column + 1))
+
+
+def test_rollback_refuses_cells_changed_later(make_tx):
+    tx = make_tx(journal="Y")
+    octane_ids, _ = build_summary(summary_path(tx))
+    build_octane(octane_path(tx), octane_ids)
+    tx.update_excel(octane_path(tx))
+    run = _last_run(tx)
+    wb = load_workbook(summary_path(tx))
+    ws = wb["Octane and jira"]
+    r = ws.max_row
+    ws.cell(r, 3).value = "edited by hand"
+    wb.save(summary_path(tx))
+    before = sheet_state(summary_path(tx))
+    assert tx.rollback(run) is False
+    assert sheet_state(summary_path(tx)) == before
+
+
+def test_old_journal_table_is_migrated(make_tx):
+    tx = make_tx(journal="Y")
+    with closing(sqlite3.connect(tx.JOURNAL_DB)) as conn, conn:
+        conn.execute("CREATE TABLE journal (run INTEGER, sheet TEXT, row INTEGER, col INTEGER, "
+                     "old, old_kind TEXT, new, new_kind TEXT, old_fill TEXT, new_fill TEXT)")
+        conn.execute("INSERT INTO journal VALUES (1, 's', 2, 3, 'a', NULL, 'b', NULL, NULL, NULL)")
+    with closing(tx._journal_db()) as conn:
+        cols = [row[1] for row in conn.execute("PRAGMA table_info(journal)")]
+        assert cols[-5:] == ["old_fmt", "new_fmt", "old_link", "new_link", "existed"]
+        assert conn.execute("SELECT old, existed FROM journal").fetchall() == [("a", None)]
+
+
+def _run_cells(tx, run):
+    with closing(sqlite3.connect(tx.JOURNAL_DB)) as conn:
+        return {(r, c) for r, c in conn.execute("SELECT row, col FROM journal WHERE run=?", (run,))}
+
+
+def test_journal_covers_every_changed_cell(make_tx):
+    """变更日志只登记合并要写的格，但表上每个变了的格都得在里面"""
+    tx = make_tx(journal="Y")
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    build_octane(octane_path(tx), octane_ids)
+    build_jira(jira_path(tx), jira_ids)
+    for fp in (octane_path(tx), jira_path(tx), octane_path(tx)):
+        before = sheet_state(summary_path(tx))
+        tx.update_excel(fp)
+        after = sheet_state(summary_path(tx))
+        changed = {k for k in before.keys() | after.keys() if before.get(k) != after.get(k)}
+        assert changed and changed <= _run_cells(tx, _last_run(tx))
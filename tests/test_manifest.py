@@ -0,0 +1,62 @@
+# 已处理导出清单 / catch_up_scan：记过的导出跳过，内容变了的重新处理，临时文件和没写完的文件不算
+import os
+import time
+
+from builders import build_summary, build_jira, summary_path, jira_path
+
+
+def _export(fp, body=b"Issue key,Created\nCC-1,1/1/2025\n", mtime=None):
+    with open(fp, "wb") as fh:
+        fh.write(body)
+    if mtime is not None:
+        os.utime(fp, (mtime, mtime))
+    return os.path.abspath(fp)
+
+
+def test_recorded_export_is_skipped(tx):
+    fp = _export(jira_path(tx))
+    assert tx.catch_up_scan() == [fp]
+    tx._manifest_record([fp])
+    assert tx.catch_up_scan() == []
+
+
+def test_changed_export_is_reprocessed(tx):
+    fp = _export(jira_path(tx), mtime=time.time() - 60)
+    tx._manifest_record([fp])
+    _export(fp, b"Issue key,Created\nCC-1,1/1/2025\nCC-2,1/2/2025\n")
+    assert tx.catch_up_scan() == [fp]
+
+
+def test_touched_but_identical_export_only_updates_manifest(tx):
+    fp = _export(jira_path(tx), mtime=time.time() - 60)
+    tx._manifest_record([fp])
+    os.utime(fp, None)
+    assert tx.catch_up_scan() == []
+    assert tx.catch_up_scan() == []                 # 清单里的修改时间已更新，不再算哈希
+
+
+def test_only_newest_export_per_source(tx):
+    _export(jira_path(tx, "old.csv"), mtime=time.time() - 60)
+    new = _export(jira_path(tx, "new.csv"))
+    assert tx.catch_up_scan() == [new]
+
+
+def test_temp_and_incomplete_files_ignored(tx):
+    fp = _export(jira_path(tx), mtime=time.time() - 60)
+    tx._manifest_record([fp])
+    _export(jira_path(tx, "~$jira.csv"))
+    _export(jira_path(tx, "next.csv.crdownload"))
+    _export(jira_path(tx, "cut.csv"), b"Issue key,Created\nCC-1,1/1")
+    with open(os.path.join(tx.OCTANE_DIR, "octane.xlsx"), "wb") as fh:
+        fh.write(b"PK\x03\x04partial")
+    assert tx.catch_up_scan() == []
+    assert tx._is_temp_name("~$jira.csv") and tx._is_temp_name("x.xlsx.tmp") and not tx._is_temp_name("jira.csv")
+
+
+def test_catch_up_then_update_records_the_export(tx):
+    _, jira_ids = build_summary(summary_path(tx))
+    build_jira(jira_path(tx), jira_ids)
+    pending = tx.catch_up_scan()
+    assert pending == [os.path.abspath(jira_path(tx))]
+    tx.update_batch(pending)
+    assert tx.catch_up_scan() == []
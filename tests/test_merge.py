@@ -0,0 +1,150 @@
+# _merge_frames 对照旧版 update_excel 里逐行 iterrows 的合并规则
+import pandas as pd
+import pytest
+
+from builders import build_summary, build_octane, build_jira, legacy_istep, summary_path, octane_path, jira_path
+
+
+def _blank(v):
+    return v is None or (isinstance(v, float) and pd.isna(v)) or v == ""
+
+
+def _same(a, b):
+    return (_blank(a) and _blank(b)) or a == b
+
+
+def _first_hit(text, patterns):
+    text = str(text or "").lower()
+    for name, kws in patterns.items():
+        if any(kw.lower() in text for kw in kws):
+            return name
+    return None
+
+
+def legacy_merge(tx, snap, df_new, mapping, header2col, headers, id_key, date_col):
+    """旧版逐行合并（已有行逐字段比较、新增行逐格构造），在快照上重放；返回 (改动的格子, 新增行)"""
+    id2row = {v: r for r, v in snap[header2col["ID"]].items() if v}
+    changed, appends = set(), []
+
+    def put(r, c, val):
+        if snap.at[r, c] != val:
+            snap.at[r, c] = val
+            changed.add((r, c))
+
+    for _, new_row in df_new.iterrows():
+        new_id = new_row.get(id_key)
+        if pd.isna(new_id) or not new_id:
+            continue
+        if new_id in id2row:
+            r = id2row[new_id]
+            if any(k in (snap.at[r, header2col["Phase"]] or "") for k in ("Concluded", "Closed", "Resolved")):
+                continue
+            if date_col:
+                raw = new_row.get(date_col, "")
+                if pd.notna(raw) and raw != "":
+                    try:
+                        put(r, header2col[mapping[date_col]], pd.to_datetime(raw).to_pydatetime())
+                    except (ValueError, TypeError):
+                        pass
+            for nk, ok in mapping.items():
+                if nk == date_col or ok == "Function":
+                    continue
+                val = new_row.get(nk, "")
+                if pd.isna(val) or val == "":
+                    continue
+                if ok == "Involved I-Step":
+                    val = legacy_istep(val)
+                if header2col.get(ok):
+                    put(r, header2col[ok], val)
+            cause = _first_hit(snap.at[r, header2col["Owner"]], tx.owner_patterns)
+            if cause:
+                put(r, header2col["Root cause"], cause)
+        else:
+            vals = {}
+            for hdr in headers:
+                val = ""
+                for nk, ok in mapping.items():
+                    if ok == hdr:
+                        tmp = new_row.get(nk, "")
+                        if pd.notna(tmp) and tmp != "":
+                            if hdr == mapping.get(date_col):
+                                try:
+                                    val = pd.to_datetime(tmp).to_pydatetime()
+                                except (ValueError, TypeError):
+                                    val = tmp
+                            else:
+                                val = tmp
+                            if ok == "Involved I-Step":
+                                val = legacy_istep(val)
+                        break
+                vals[hdr] = val
+            func = _first_hit(vals["Found in function"], tx.fund_patterns)
+            if func:
+                vals["Function"] = func
+            cause = _first_hit(vals["Owner"], tx.owner_patterns)
+            if cause:
+                vals["Root cause"] = cause
+            appends.append((new_id, [vals[h] for h in headers]))
+    return changed, appends
+
+
+def _compare(tx, df_new, df_legacy, source_key):
+    wb, ws, _ = tx._open_summary(summary_path(tx))
+    tx.trim_trailing_blank_rows(ws)
+    header2col = {ws.cell(1, c).value: c for c in range(1, ws.max_column + 1)}
+    headers    = list(header2col)
+    src_cfg    = tx.sources[source_key]
+    mapping    = src_cfg["mapping"]
+    id_key     = next(k for k, v in mapping.items() if v == "ID")
+    date_col   = src_cfg.get("date_col")
+
+    snap = tx._snapshot_sheet(ws)
+    ref  = snap.copy()
+    updates, appends = tx._merge_frames(snap, df_new, mapping, header2col, headers, id_key, date_col,
+                                        src_cfg.get("transforms"))
+    ref_changed, ref_appends = legacy_merge(tx, ref, df_legacy, mapping, header2col, headers, id_key, date_col)
+
+    assert {(r, c) for r, c, _, _ in updates} == ref_changed
+    diff = [(r, c, snap.at[r, c], ref.at[r, c]) for r in snap.index for c in snap.columns
+            if not _same(snap.at[r, c], ref.at[r, c])]
+    assert diff == []
+    assert [i for i, _ in appends] == [i for i, _ in ref_appends]
+    for (new_id, vals), (_, ref_vals) in zip(appends, ref_appends):
+        assert all(_same(a, b) for a, b in zip(vals, ref_vals)), new_id
+    return updates, appends
+
+
+def test_octane_merge_matches_row_by_row(tx):
+    octane_ids, _ = build_summary(summary_path(tx))
+    ids = build_octane(octane_path(tx), octane_ids)
+    df, _ = tx._read_excel_with_links(octane_path(tx))
+    updates, appends = _compare(tx, df, df, "Octane")
+    assert updates and appends
+    # 导出里重复的新 ID 照旧追加两次
+    assert len(appends) == len([i for i in ids if i not in octane_ids])
+
+
+def test_jira_merge_matches_row_by_row(tx):
+    _, jira_ids = build_summary(summary_path(tx))
+    build_jira(jira_path(tx), jira_ids)
+    raw = tx._read_csv_typed(jira_path(tx), tx.sources["Jira"])
+    df, bad = tx._normalize_dates(raw, tx.sources["Jira"])
+    assert bad[tx.sources["Jira"]["date_col"]].tolist() == ["garbage"]
+    updates, _ = _compare(tx, df, raw, "Jira")
+    date_c = 7
+    assert any(c == date_c and fmt == tx.DATE_FORMAT for _, c, _, fmt in updates)
+
+
+@pytest.mark.parametrize("dup_in_export", [True, False])
+def test_duplicate_ids(tx, dup_in_export):
+    """表里重复的 ID 只更新最后一行；导出里重复的 ID 按出现顺序依次更新"""
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    target = octane_ids[-1]
+    rows = [{"ID": target, "Name": "first", "Phase": "Open"}]
+    if dup_in_export:
+        rows.append({"ID": target, "Name": "second", "Phase": None})
+    df = pd.DataFrame(rows)
+    updates, appends = _compare(tx, df, df, "Octane")
+    assert appends == []
+    name_rows = {r for r, c, _, _ in updates if c == 3}
+    assert name_rows == {len(octane_ids) + len(jira_ids) + 2}     # 表头 + n 行 + 重复行
@@ -0,0 +1,39 @@
+# _compile_patterns / _classify：组合正则必须与“按配置顺序逐组 any(kw in text)”一致
+import itertools
+
+
+def _first_hit(text, patterns):
+    text = str(text or "").lower()
+    for name, kws in patterns.items():
+        if any(kw.lower() in text for kw in kws):
+            return name
+    return None
+
+
+def test_first_group_in_config_order_wins(tx):
+    patterns = {"A": ["zzz"], "B": ["aaa"]}
+    rx, names = tx._compile_patterns(patterns)
+    # B 的关键词在文本里更靠前，但 A 在配置里排前面
+    assert tx._classify("aaa then zzz", rx, names) == "A"
+    assert tx._classify("only aaa", rx, names) == "B"
+    assert tx._classify("nothing", rx, names) is None
+
+
+def test_overlapping_keywords_and_escaping(tx):
+    patterns = {"long": ["keep lane extended [01.02]"], "short": ["keep lane"], "dots": ["a.b"]}
+    rx, names = tx._compile_patterns(patterns)
+    assert tx._classify("Keep Lane Extended [01.02] x", rx, names) == "long"
+    assert tx._classify("keep lane [01.02]", rx, names) == "short"
+    assert tx._classify("axb", rx, names) is None          # “.” 按字面匹配
+    assert tx._classify(None, rx, names) is None
+    assert tx._classify("", *tx._compile_patterns({})) is None
+    assert tx._classify("x", *tx._compile_patterns({"empty": []})) is None
+
+
+def test_matches_legacy_loop_on_config_patterns(tx):
+    for patterns in (tx.fund_patterns, tx.owner_patterns):
+        kws = [kw for group in patterns.values() for kw in group]
+        texts = [None, "", "no match here"] + kws + [f"{a}, {b}" for a, b in itertools.permutations(kws[:12], 2)]
+        rx, names = tx._compile_patterns(patterns)
+        for text in texts:
+            assert tx._classify(text, rx, names) == _first_hit(text, patterns), text
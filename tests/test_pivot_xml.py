@@ -0,0 +1,118 @@
+# _refresh_pivots_xml：把透视缓存的数据源改写成 A1:<表头末列><ID 列末行>，标记打开时刷新
+import os
+import posixpath
+import re
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+from builders import build_summary, add_pivots, summary_path
+
+DEFS = ["xl/pivotCache/pivotCacheDefinition1.xml", "xl/pivotCache/pivotCacheDefinition2.xml"]
+
+
+def _parts(fp):
+    with zipfile.ZipFile(fp) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def _root(xml):
+    return re.search(rb"<pivotCacheDefinition\b[^>]*>", xml).group(0).decode()
+
+
+def _summary_with_pivots(tx, sheet="Octane and jira"):
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    add_pivots(summary_path(tx), sheet=sheet, count=2)
+    return len(octane_ids) + len(jira_ids) + 2              # 表头 + n 行 + 重复行；末尾只带格式的空行不算
+
+
+def test_ref_rewritten_to_data_extent(tx):
+    last_row = _summary_with_pivots(tx)
+    before = _parts(summary_path(tx))
+    tx._refresh_pivots_xml(summary_path(tx), tx.sheet)
+    after = _parts(summary_path(tx))
+
+    for part in DEFS:
+        assert f'ref="A1:AA{last_row}"'.encode() in after[part]
+        assert 'refreshOnLoad="1"' in _root(after[part])
+        assert after[part].count(b"refreshOnLoad") == 1
+    assert after.keys() == before.keys()
+    assert all(after[n] == before[n] for n in before if n not in DEFS)
+    assert load_workbook(summary_path(tx))["Notes"]._pivots
+
+
+def test_caches_of_other_sheets_untouched(tx):
+    _summary_with_pivots(tx, sheet="Notes")
+    before = _parts(summary_path(tx))
+    tx._refresh_pivots_xml(summary_path(tx), tx.sheet)
+    assert _parts(summary_path(tx)) == before
+
+
+def test_drop_mode_removes_records(make_tx):
+    tx = make_tx(pivot_records="drop")
+    last_row = _summary_with_pivots(tx)
+    tx._refresh_pivots_xml(summary_path(tx), tx.sheet)
+    after = _parts(summary_path(tx))
+
+    assert not [n for n in after if "pivotCacheRecords" in n]
+    assert b"pivotCacheRecords" not in after["[Content_Types].xml"]
+    assert not [n for n in after if n.startswith("xl/pivotCache/_rels/")]
+    for part in DEFS:
+        root = _root(after[part])
+        assert 'saveData="0"' in root and 'refreshOnLoad="1"' in root
+        assert "r:id" not in root and "recordCount" not in root
+        assert f'ref="A1:AA{last_row}"'.encode() in after[part]
+    assert len(load_workbook(summary_path(tx))["Notes"]._pivots) == 2
+
+
+def test_unknown_data_sheet_leaves_file_alone(tx):
+    _summary_with_pivots(tx)
+    before = _parts(summary_path(tx))
+    tx._refresh_pivots_xml(summary_path(tx), "Missing sheet")
+    assert _parts(summary_path(tx)) == before
+
+
+def test_auto_mode_prefers_com_only_when_available(make_tx):
+    tx = make_tx(pivot_refresh="auto")
+    assert tx.pivot_refresh == ("com" if tx.win32com else "xml")
+
+
+def _dangling(parts):
+    """[Content_Types] 里登记了但包里没有的部件，以及 rels 指向的不存在部件"""
+    names = set(parts)
+    missing = [p for p in re.findall(r'PartName="/([^"]+)"', parts["[Content_Types].xml"].decode()) if p not in names]
+    for rels, data in parts.items():
+        if not rels.endswith(".rels"):
+            continue
+        base = posixpath.dirname(posixpath.dirname(rels))
+        for target in re.findall(r'Target="([^"]+)"', data.decode()):
+            path = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(base, target))
+            if "://" not in target and path not in names:
+                missing.append(f"{rels} → {target}")
+    return missing
+
+
+def test_consolidate_shares_one_cache(tx):
+    _summary_with_pivots(tx)
+    tx.consolidate_pivot_caches(summary_path(tx))
+    after = _parts(summary_path(tx))
+
+    assert [n for n in after if n.startswith("xl/pivotCache/pivotCacheDefinition")] == [DEFS[0]]
+    assert 'refreshOnLoad="1"' in _root(after[DEFS[0]])
+    assert after["xl/workbook.xml"].count(b"<pivotCache ") == 1
+    assert b'cacheId="5"' in after["xl/pivotTables/pivotTable2.xml"]
+    assert b"pivotCacheDefinition1.xml" in after["xl/pivotTables/_rels/pivotTable2.xml.rels"]
+    assert _dangling(after) == []
+    assert not os.path.exists(summary_path(tx) + ".tmp")
+    assert len(load_workbook(summary_path(tx))["Notes"]._pivots) == 2
+
+
+def test_consolidate_leaves_original_when_write_fails(tx, monkeypatch):
+    _summary_with_pivots(tx)
+    before = _parts(summary_path(tx))
+    monkeypatch.setattr(tx.zipfile.ZipFile, "testzip", lambda self: "xl/workbook.xml")
+    with pytest.raises(zipfile.BadZipFile):
+        tx.consolidate_pivot_caches(summary_path(tx))
+    assert _parts(summary_path(tx)) == before
+    assert not os.path.exists(summary_path(tx) + ".tmp")
@@ -0,0 +1,94 @@
+# UpdateQueue：同一来源的事件合并成最新的导出，按入队先后处理，某次更新抛异常不影响后面的任务
+import os
+import threading
+import time
+
+import pytest
+
+
+def _until(cond, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _export(folder, name, mtime):
+    fp = os.path.join(folder, name)
+    with open(fp, "w") as fh:
+        fh.write("x\n")
+    os.utime(fp, (mtime, mtime))
+    return fp
+
+
+@pytest.fixture
+def gate():
+    """没放行前工作线程停在更新里"""
+    ev = threading.Event()
+    ev.set()
+    return ev
+
+
+@pytest.fixture
+def calls(tx, gate, monkeypatch):
+    """把 update_excel / update_batch 换成只记录参数；路径里带 boom 的抛异常"""
+    log = []
+
+    def run(paths_):
+        gate.wait(3)
+        log.append(list(paths_))
+        if any("boom" in p for p in paths_):
+            raise RuntimeError("boom")
+    monkeypatch.setattr(tx, "update_excel", lambda p: run([p]))
+    monkeypatch.setattr(tx, "update_batch", run)
+    return log
+
+
+@pytest.fixture
+def queue(tx, calls, gate):
+    q = tx.UpdateQueue(delay_seconds=0.05)
+    yield q
+    gate.set()
+    q.close()
+
+
+def test_same_source_coalesces_to_newest(tx, calls, queue):
+    old = _export(tx.JIRA_DIR, "old.csv", 1000)
+    new = _export(tx.JIRA_DIR, "new.csv", 2000)
+    octane = _export(tx.OCTANE_DIR, "o.xlsx", 1500)
+    with queue._cond:                     # 三个事件在同一批里入队
+        queue.put(new)
+        queue.put(old)                    # 更早导出的不覆盖更新的
+        queue.put(octane)
+    assert _until(lambda: queue.status()["runs"] == 1)
+    assert calls == [[new, octane]]
+    assert queue.status()["coalesced"] == 1 and queue.status()["depth"] == 0
+
+
+def test_jobs_run_in_order_one_at_a_time(tx, calls, gate, queue):
+    gate.clear()
+    first = _export(tx.JIRA_DIR, "a.csv", 1000)
+    queue.put(first)
+    assert _until(lambda: queue.status()["running"] == [first])
+    second = _export(tx.OCTANE_DIR, "b.xlsx", 1000)
+    third = _export(tx.JIRA_DIR, "c.csv", 3000)
+    queue.put(second)
+    queue.put(third)
+    assert queue.status()["depth"] == 2   # 正在处理时新事件排队，不并发执行
+    gate.set()
+    assert _until(lambda: queue.status()["runs"] == 2)
+    assert calls == [[first], [second, third]]
+
+
+def test_failed_job_does_not_stop_the_worker(tx, calls, queue, capsys):
+    queue.put(_export(tx.JIRA_DIR, "boom.csv", 1000))
+    assert _until(lambda: queue.status()["runs"] == 1)
+    ok = _export(tx.OCTANE_DIR, "ok.xlsx", 1000)
+    queue.put(ok)
+    assert _until(lambda: queue.status()["runs"] == 2)
+    assert calls[-1] == [ok]
+    assert queue.status()["errors"] == 1
+    out = capsys.readouterr().out
+    assert "处理失败：boom.csv" in out and "处理完成：ok.xlsx" in out and "队列深度 0" in out
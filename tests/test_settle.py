@@ -0,0 +1,148 @@
+# SettleTracker / _complete_trailer：导出写完（结尾完整、大小稳定）后才交给 dispatch
+import os
+import threading
+import time
+
+import pytest
+from openpyxl import Workbook
+
+
+def _xlsx(fp):
+    wb = Workbook()
+    wb.active["A1"] = "ID"
+    wb.save(fp)
+    return str(fp)
+
+
+def _truncated_xlsx(fp):
+    _xlsx(fp)
+    with open(fp, "rb") as fh:
+        data = fh.read()
+    with open(fp, "wb") as fh:
+        fh.write(data[:len(data) // 2])
+    return str(fp)
+
+
+def _until(cond, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_complete_trailer(tx, tmp_path):
+    (tmp_path / "ok.csv").write_bytes(b"a,b\n1,2\n")
+    (tmp_path / "cut.csv").write_bytes(b"a,b\n1,")
+    (tmp_path / "empty.csv").write_bytes(b"")
+    assert tx._complete_trailer(str(tmp_path / "ok.csv"))
+    assert not tx._complete_trailer(str(tmp_path / "cut.csv"))
+    assert not tx._complete_trailer(str(tmp_path / "empty.csv"))
+    assert tx._complete_trailer(_xlsx(tmp_path / "ok.xlsx"))
+    assert not tx._complete_trailer(_truncated_xlsx(tmp_path / "cut.xlsx"))
+    with pytest.raises(OSError):
+        tx._complete_trailer(str(tmp_path / "missing.xlsx"))
+
+
+@pytest.fixture
+def tracker(tx):
+    seen, lock = [], threading.Lock()
+
+    def dispatch(path):
+        with lock:
+            seen.append(path)
+    return tx.SettleTracker(dispatch, settle_seconds=0.05, timeout=0.3), seen
+
+
+def test_complete_file_dispatched_once_per_version(tracker, tmp_path):
+    tr, seen = tracker
+    fp = str(tmp_path / "jira.csv")
+    with open(fp, "w") as fh:
+        fh.write("a\n1\n")
+    tr.track(fp)
+    assert _until(lambda: seen == [fp])
+    tr.track(fp)                                   # 同一版本的重复事件
+    time.sleep(0.2)
+    assert seen == [fp]
+
+    later = time.time() + 5
+    with open(fp, "a") as fh:
+        fh.write("2\n")
+    os.utime(fp, (later, later))
+    tr.track(fp)
+    assert _until(lambda: seen == [fp, fp])
+
+
+def test_csv_without_newline_dispatched_at_timeout(tracker, tmp_path, capsys):
+    tr, seen = tracker
+    fp = str(tmp_path / "jira.csv")
+    with open(fp, "w") as fh:
+        fh.write("a\n1")
+    t0 = time.monotonic()
+    tr.track(fp)
+    assert _until(lambda: seen == [fp])
+    assert time.monotonic() - t0 >= 0.3
+    assert "不以换行结尾" in capsys.readouterr().out
+
+
+def test_truncated_xlsx_dropped(tracker, tmp_path, capsys):
+    tr, seen = tracker
+    fp = _truncated_xlsx(tmp_path / "octane.xlsx")
+    tr.track(fp)
+    assert _until(lambda: "不是完整的 xlsx" in capsys.readouterr().out)
+    tr.track(fp)                                   # 同一个坏版本不再等
+    time.sleep(0.5)
+    assert seen == []
+
+
+def test_file_finishing_late_is_dispatched(tracker, tmp_path):
+    tr, seen = tracker
+    fp = str(tmp_path / "octane.xlsx")
+    with open(fp, "wb") as fh:
+        fh.write(b"PK\x03\x04partial")
+    tr.track(fp)
+    time.sleep(0.1)
+    assert seen == []
+    _xlsx(fp)
+    assert _until(lambda: seen == [fp])
+
+
+def test_failed_dispatch_is_retried_on_next_event(tx, tmp_path):
+    seen = []
+
+    def dispatch(path):
+        seen.append(path)
+        if len(seen) == 1:
+            raise RuntimeError("queue full")
+    tr = tx.SettleTracker(dispatch, settle_seconds=0.05, timeout=0.3)
+    fp = str(tmp_path / "jira.csv")
+    with open(fp, "w") as fh:
+        fh.write("a\n1\n")
+    tr.track(fp)
+    assert _until(lambda: len(seen) == 1)
+    tr.track(fp)                                   # 同一版本：上次没交出去，再交一次
+    assert _until(lambda: len(seen) == 2)
+    tr.track(fp)
+    time.sleep(0.2)
+    assert len(seen) == 2
+
+
+def test_handler_dispatches_quick_rewrite(make_tx, monkeypatch):
+    """交出一次之后几秒内改写的新版本照样处理（不再按时间去抖）"""
+    tx = make_tx(settle_seconds=0.05, settle_timeout_seconds=0.3)
+    seen = []
+    monkeypatch.setattr(tx, "update_excel", seen.append)
+    handler = tx.FolderHandler(tx.folders)
+    fp = os.path.join(tx.JIRA_DIR, "jira.csv")
+    with open(fp, "w") as fh:
+        fh.write("a\n1\n")
+    handler._maybe_update(fp)
+    assert _until(lambda: seen == [fp])
+
+    later = time.time() + 3
+    with open(fp, "a") as fh:
+        fh.write("2\n")
+    os.utime(fp, (later, later))
+    handler._maybe_update(fp)
+    assert _until(lambda: seen == [fp, fp])
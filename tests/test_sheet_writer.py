@@ -0,0 +1,77 @@
+# writer='sheet'：只重写目标表，其它工作表、透视表部件和工作簿关系原样保留
+import re
+import zipfile
+
+from openpyxl import load_workbook
+
+from builders import (build_summary, build_octane, add_pivots, sheet_state, renumber_formats, numfmt_codes,
+                      summary_path, octane_path)
+
+_UNTOUCHED = ("xl/worksheets/sheet2.xml", "xl/worksheets/_rels/sheet2.xml.rels", "xl/workbook.xml",
+              "xl/pivotCache/", "xl/pivotTables/")
+
+
+def _parts(fp):
+    with zipfile.ZipFile(fp) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def _run(make_tx, writer, pivots=2):
+    tx = make_tx(writer=writer, pivot_refresh="off")
+    octane_ids, _ = build_summary(summary_path(tx))
+    add_pivots(summary_path(tx), count=pivots)
+    build_octane(octane_path(tx), octane_ids)
+    before = _parts(summary_path(tx))
+    tx.update_excel(octane_path(tx))
+    return tx, before, _parts(summary_path(tx))
+
+
+def test_sheet_writer_keeps_other_parts(make_tx):
+    tx, before, after = _run(make_tx, "sheet")
+    kept = [n for n in before if n.startswith(_UNTOUCHED)]
+    assert len(kept) == 13
+    for name in kept:
+        assert after.get(name) == before[name], name
+    # 工作簿关系只允许追加（原表没有 sharedStrings 时会补一条）
+    rels = lambda xml: set(re.findall(rb"<Relationship [^>]*/>", xml))
+    assert rels(before["xl/_rels/workbook.xml.rels"]) <= rels(after["xl/_rels/workbook.xml.rels"])
+    assert after["xl/worksheets/sheet1.xml"] != before["xl/worksheets/sheet1.xml"]
+
+    wb = load_workbook(summary_path(tx))
+    assert wb.sheetnames == ["Octane and jira", "Notes"]
+    assert wb["Notes"]["A1"].value == "keep me"
+    assert len(wb["Notes"]._pivots) == 2
+
+
+def test_sheet_writer_matches_workbook_writer(make_tx):
+    # openpyxl 整本保存时多个透视表会互相覆盖缓存，这里只挂一个
+    sheet_tx, _, _ = _run(make_tx, "sheet", pivots=1)
+    book_tx, _, _ = _run(make_tx, "workbook", pivots=1)
+    assert sheet_state(summary_path(sheet_tx)) == sheet_state(summary_path(book_tx))
+
+
+def test_sheet_writer_keeps_custom_number_format_ids(make_tx):
+    """Excel 存出来的自定义格式编号不一定从 164 连续排；透视表等部件直接按编号引用，必须原样保留"""
+    tx = make_tx(writer="sheet", pivot_refresh="off")
+    octane_ids, _ = build_summary(summary_path(tx))
+    wb = load_workbook(summary_path(tx))
+    wb["Notes"]["B2"] = 1.5
+    wb["Notes"]["B2"].number_format = "0.000"
+    wb.save(summary_path(tx))
+    renumber_formats(summary_path(tx), {164: 180, 165: 200, 166: 165})
+    add_pivots(summary_path(tx), data_fmt=165)
+    build_octane(octane_path(tx), octane_ids)
+    before = numfmt_codes(summary_path(tx))
+    assert before[165] == "0.000"
+
+    tx.update_excel(octane_path(tx))
+
+    after = numfmt_codes(summary_path(tx))
+    assert all(after[i] == code for i, code in before.items())
+    with zipfile.ZipFile(summary_path(tx)) as z:
+        assert b'numFmtId="165"' in z.read("xl/pivotTables/pivotTable1.xml")
+    wb = load_workbook(summary_path(tx))
+    assert wb["Notes"]["B2"].number_format == "0.000"
+    assert wb["Notes"]._pivots[0].dataFields[0].numFmtId == 165
+    ws = wb["Octane and jira"]
+    assert ws.cell(2, 7).number_format == "m/d/yyyy h:mm:ss AM/PM"
@@ -0,0 +1,119 @@
+# store 模式：工单库渲染回汇总表时只改有差异的单元格，结果与直接更新汇总表一致
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from openpyxl import load_workbook
+from openpyxl.styles import Font
+
+from conftest import REPO_DIR
+from builders import build_summary, build_octane, build_jira, sheet_state, summary_path, octane_path, jira_path
+
+DAYS_C, PLANNED_C = 15, 10
+
+
+def _decorate(fp):
+    """加上工具不管的格式：加粗字体、数字格式，以及一个非日期列上的日期值（自带格式）"""
+    wb = load_workbook(fp)
+    ws = wb["Octane and jira"]
+    for r in range(2, 12):
+        ws.cell(r, 3).font = Font(bold=True)
+        ws.cell(r, DAYS_C).number_format = "0.00"
+    ws.cell(2, PLANNED_C).value = datetime(2025, 6, 1)
+    ws.cell(2, PLANNED_C).number_format = "yyyy"
+    wb.save(fp)
+
+
+def _add_note(fp, row=300):
+    """数据区下方隔开一段的备注行（没有 ID）"""
+    wb = load_workbook(fp)
+    wb["Octane and jira"].cell(row, 3).value = "Total: see Notes"
+    wb.save(fp)
+
+
+def _run(tx, note=False):
+    octane_ids, jira_ids = build_summary(summary_path(tx))
+    _decorate(summary_path(tx))
+    if note:
+        _add_note(summary_path(tx))
+    build_octane(octane_path(tx), octane_ids)
+    build_jira(jira_path(tx), jira_ids)
+    tx.update_excel(octane_path(tx))
+    tx.update_excel(jira_path(tx))
+
+
+def test_render_only_touches_changed_cells(make_tx):
+    store_tx = make_tx(store="Y", render_debounce_seconds=3600)
+    _run(store_tx)
+    store_tx._render_timer.cancel()
+    store_tx.render_store()
+
+    direct_tx = make_tx()
+    _run(direct_tx)
+    assert sheet_state(summary_path(store_tx)) == sheet_state(summary_path(direct_tx))
+
+    wb = load_workbook(summary_path(store_tx))
+    ws = wb["Octane and jira"]
+    assert all(ws.cell(r, 3).font.b for r in range(2, 12))
+    assert ws.cell(2, PLANNED_C).number_format == "yyyy"
+    assert wb["Notes"]["A1"].value == "keep me"
+
+
+def test_render_drops_rows_missing_from_store(make_tx):
+    tx = make_tx(store="Y", render_debounce_seconds=3600)
+    build_summary(summary_path(tx))
+    tx._store_seed(summary_path(tx))
+    headers, values, fills, links = tx._store_load()
+    last = values.index.max()
+    tx._store_save(headers, values.drop(index=last), fills.drop(index=last), links)
+    tx.render_store()
+
+    ws = load_workbook(summary_path(tx))["Octane and jira"]
+    assert all(ws.cell(last, c).value is None for c in range(1, ws.max_column + 1))
+    assert ws.cell(last - 1, 1).value == values.at[last - 1, 1]
+
+
+def test_rows_after_last_id_survive(make_tx):
+    store_tx = make_tx(store="Y", render_debounce_seconds=3600)
+    _run(store_tx, note=True)
+    store_tx._render_timer.cancel()
+    store_tx.render_store()
+
+    direct_tx = make_tx()
+    _run(direct_tx, note=True)
+    ws = load_workbook(summary_path(store_tx))["Octane and jira"]
+    assert ws.cell(300, 3).value == "Total: see Notes"
+    assert sheet_state(summary_path(store_tx)) == sheet_state(summary_path(direct_tx))
+
+
+def test_cli_batch_renders_before_exit(make_tx):
+    store_tx = make_tx(store="Y", render_debounce_seconds=3600)
+    octane_ids, jira_ids = build_summary(summary_path(store_tx))
+    _decorate(summary_path(store_tx))
+    build_octane(octane_path(store_tx), octane_ids)
+    build_jira(jira_path(store_tx), jira_ids)
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    subprocess.run([sys.executable, store_tx.__file__, "batch", octane_path(store_tx), jira_path(store_tx)],
+                   cwd=os.path.dirname(store_tx.__file__), env=env, check=True, capture_output=True)
+
+    direct_tx = make_tx()
+    _run(direct_tx)
+    assert sheet_state(summary_path(store_tx)) == sheet_state(summary_path(direct_tx))
+
+
+def test_startup_renders_when_store_is_newer(make_tx):
+    tx = make_tx(store="Y", render_debounce_seconds=3600)
+    _run(tx)
+    tx._render_timer.cancel()
+    tx._render_if_stale()
+    rendered = sheet_state(summary_path(tx))
+
+    direct_tx = make_tx()
+    _run(direct_tx)
+    assert rendered == sheet_state(summary_path(direct_tx))
+
+    # 汇总表已经比工单库新：不再渲染
+    mtime = os.path.getmtime(summary_path(tx))
+    tx._render_if_stale()
+    assert os.path.getmtime(summary_path(tx)) == mtime
@@ -0,0 +1,39 @@
+# 字段转换：_istep_na05 整列结果与旧版逐个值规整一致；transforms 配置的解析
+import numpy as np
+import pandas as pd
+import pytest
+
+from builders import legacy_istep
+
+VALUES = ["G070-24-11-500", "U006-25-03", "G07", "Something （25-07-452 ATS+3）", "x (24-01-1) y (9)",
+          "（）", "plain", "", 12345, 3.5, None, np.nan, "NA05-25-07-1", "u006 lower", "a(12-3", "b（-)"]
+
+
+def test_istep_na05_matches_legacy(tx):
+    val = pd.Series(VALUES, index=range(10, 10 + len(VALUES)), dtype=object)
+    out = tx._istep_na05(val)
+    assert out.index.equals(val.index)
+    for v, got in zip(VALUES, out.tolist()):
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            assert pd.isna(got)
+        else:
+            assert got == legacy_istep(v), v
+
+
+def test_istep_na05_all_blank_and_empty(tx):
+    assert tx._istep_na05(pd.Series([None, np.nan], dtype=object)).isna().all()
+    assert tx._istep_na05(pd.Series([], dtype=object)).empty
+
+
+def test_compile_mapping_transforms(tx):
+    mapping = {"I-Step": "Involved I-Step", "Name": "Name", "Alt": "Involved I-Step"}
+    pairs, first = tx._compile_mapping(mapping)
+    assert [fns for _, _, fns in pairs] == [(tx._istep_na05,), (), (tx._istep_na05,)]
+    assert first["Involved I-Step"][0] == "I-Step"
+
+    # 配了 transforms 就只用配置里的，默认转换不再按表头套用
+    pairs, _ = tx._compile_mapping(mapping, {"Name": ["istep_na05"]})
+    assert [fns for _, _, fns in pairs] == [(), (tx._istep_na05,), ()]
+
+    with pytest.raises(ValueError, match="未知的字段转换"):
+        tx._compile_mapping(mapping, {"Name": ["nope"]})
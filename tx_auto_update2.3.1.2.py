@@ -1,18 +1,41 @@
 import os
 import re
 import time
+import io
+import sys
 import json
+import sqlite3
+import threading
+import traceback
+import hashlib
+import zipfile
+import posixpath
+import numpy as np
 import pandas as pd
 import schedule
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-from openpyxl.utils import get_column_letter
-from watchdog.observers.polling import PollingObserver as Observer
-from datetime import datetime
-import pythoncom
-import win32com.client
+# 下面用到了 openpyxl 的内部结构（ws._cells、cell._style、StyleArray、wb._fills / _number_formats），
+# 版本固定在 requirements.txt 的 openpyxl==3.1.5，升级前先跑一遍 tests
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter, column_index_from_string, range_boundaries
+from openpyxl.utils.datetime import from_excel, from_ISO8601, CALENDAR_WINDOWS_1900, CALENDAR_MAC_1904
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_REVERSE, BUILTIN_FORMATS_MAX_SIZE
+from openpyxl.styles.numbers import is_date_format, is_timedelta_format
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.cell.cell import Cell
+from pandas.io.parsers import TextParser
+import xml.etree.ElementTree as ET
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape as xml_escape, unescape as xml_unescape, quoteattr
+from datetime import datetime, timedelta, date as dt_date, time as dt_time
+from contextlib import closing
+import fs_watch         # 同目录的共用模块：就绪探测、监控后端选择
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:     # 非 Windows / 没装 pywin32：Pivot 只能用 xml 方式刷新
+    pythoncom = win32com = None
 
 # === 加载配置 ===
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -29,26 +52,124 @@ sheet      = cfg['sheet']['target_sheet']
 sources    = cfg['sources']
 settings   = cfg.get('settings', {})
 clear_old  = settings.get('clear_old_highlight','N').upper() == 'Y'
+# 清除旧高亮时视为“本工具染的色”的颜色（绿=新增, 蓝=更新, 灰=Top issue 失效）
+highlight_colors = settings.get('highlight_colors', ["8ED973", "ADD8E6", "C0C0C0"])
+# 'sheet'：只读写目标数据表，其它工作表/透视表部件原样保留；'workbook'：整本 load/save
+writer_mode = settings.get('writer', 'workbook').lower()
+# 工单指纹库：记录上次成功运行时每个工单映射字段的哈希，重复投递的导出只合并有变化的工单
+use_fingerprints = settings.get('fingerprint', 'N').upper() == 'Y'
+FINGERPRINT_DB   = os.path.join(ORIG_DIR, settings.get('fingerprint_db', '.ticket_fingerprints.sqlite'))
+# 列式工单库：开启后数据以它为准，汇总表在入库后去抖渲染（或手动 render）
+use_store       = settings.get('store', 'N').upper() == 'Y'
+STORE_DB        = os.path.join(ORIG_DIR, settings.get('store_db', 'ticket_store.sqlite'))
+render_debounce = settings.get('render_debounce_seconds', 60)
+# 变更日志：每次写汇总表都把改动的单元格（旧值/新值、旧/新填充色）追加记录，可按 run 回滚
+use_journal = settings.get('journal', 'N').upper() == 'Y'
+JOURNAL_DB  = os.path.join(ORIG_DIR, settings.get('journal_db', '.ticket_journal.sqlite'))
+# 已处理导出清单：路径、大小、修改时间、内容哈希、run 号；守护进程启动时据此补处理停机期间到达的导出
+MANIFEST_DB = os.path.join(ORIG_DIR, settings.get('manifest_db', '.export_manifest.sqlite'))
+# Pivot 刷新：'auto'（默认）装了 pywin32 的 Windows 上用 'com'，否则 'xml'；
+# 'com' 用 Excel COM 刷新（仅 Windows + pywin32）；'xml' 直接改写透视缓存的数据源范围并标记打开时刷新
+# （不需要 Excel，需显式设置）；'off' 不刷新
+pivot_refresh = settings.get('pivot_refresh', 'auto').lower()
+if pivot_refresh == 'auto':
+    pivot_refresh = 'com' if win32com else 'xml'
+# xml 刷新时对旧 pivotCacheRecords 的处理：'keep' 保留；'drop' 删掉，Excel 打开时按新数据重建
+pivot_records = settings.get('pivot_records', 'keep').lower()
+# 就绪探测：保存 / 刷新之后等文件真正可用再进入下一步（代替固定的 sleep）
+ready_timeout = settings.get('ready_timeout_seconds', 60)
+ready_stable  = settings.get('ready_stable_seconds', 0.5)
+ready_poll    = settings.get('ready_poll_seconds', 0.2)
+# 监控后端：'auto'（默认，网络盘 / 同步盘上轮询，否则原生）/ 'native' / 'polling'
+observer_mode = settings.get('observer', 'auto').lower()
+poll_interval = settings.get('poll_interval_seconds', 1)
+# 写入中文件的判定：size / mtime 连续 settle_seconds 不变且文件结尾完整才处理；超过 settle_timeout_seconds 仍不完整则放弃等待
+settle_seconds = settings.get('settle_seconds', 2)
+settle_timeout = settings.get('settle_timeout_seconds', 120)
+# 监控队列：同一来源的事件在处理前合并；最后一个事件之后静默这么久才开始处理，便于攒批
+queue_delay = settings.get('queue_delay_seconds', 2)
+# 报表：每次写完汇总表按 pivot_reports 用 pandas 聚合出静态报表工作簿，数据没变化时沿用上次的结果
+use_reports   = settings.get('reports', 'N').upper() == 'Y'
+REPORT_FP     = os.path.join(ORIG_DIR, paths.get('report_file', 'Ticket report.xlsx'))
+REPORT_CACHE  = os.path.join(ORIG_DIR, settings.get('report_cache', '.report_cache.json'))
+pivot_reports = cfg.get('pivot_reports') or {}
 fund_patterns  = cfg.get('fund_function_patterns', {})
 owner_patterns = cfg.get('owner_root_cause_patterns', {})
+# 派生列规则：每条规则 when 里的条件同时成立的行写 value（不成立的写 else），并染 fill
+derived_columns = cfg.get('derived_columns') or [
+    {"column": "Top issue Candidiate", "rules": [
+        {"when": [{"column": "Tags", "contains": "IPN_CN_TopIssue"},
+                  {"column": "Top issue Candidiate", "blank": True}],
+         "value": "Yes", "fill": "new"},
+        {"when": [{"column": "Tags", "contains": "IPN_CN_TopIssue", "not": True},
+                  {"column": "Top issue Candidiate", "equals": "Yes"}],
+         "fill": "gray"}]},
+    {"column": "Rejected ticket", "rules": [
+        {"when": [{"column": "Blocking reason", "blank": False},
+                  {"column": "Phase", "contains": "New"}],
+         "value": 1, "else": 0}]},
+]
+# 公式列：{表头} 换成该列字母、{row} 换成行号；目标写成 "A|B" 时取第一个存在的表头
+formula_columns = cfg.get('formula_columns') or {
+    "Days":                         '=DATEDIF(${Creation time}{row},TODAY(),"D")',
+    "Open >20 days|Open > 20 days": '=IF({Days}{row}>20,1,0)',
+    "No TIS":                       '=IF(OR({Planned closing version}{row}<>"",{Target I-Step:}{row}<>""),0,1)',
+}
 
 # Excel VBA 常量（数字形式）
 XL_UP       = -4162   # xlUp
 XL_TOLEFT   = -4159   # xlToLeft
 XL_DATABASE = 1       # xlDatabase
 
-def is_row_blank(ws, row):
-    for c in range(1, ws.max_column + 1):
-        if ws.cell(row, c).value not in (None, ""):
-            return False
-    return True
+def trim_trailing_blank_rows(ws, journal=None):
+    """
+    扫一遍单元格存储找到最后一个非空行，其下的空行（只有格式没有值）一次性截掉。
+    逐行 ws.delete_rows 每次都要挪动整张表的单元格，尾部空行一多就是平方级耗时。
+    journal 为变更日志的登记表（见 _journal_touch），截掉的格先登记。
+    """
+    last = 1
+    for (r, _), cell in ws._cells.items():
+        if r > last and cell.value not in (None, ""):
+            last = r
+    dropped = [k for k in ws._cells if k[0] > last]
+    _journal_touch(journal, ws, dropped)
+    for key in dropped:
+        del ws._cells[key]
+
+def _managed_colors(colors):
+    """'8ED973' → {'8ED973', '008ED973', 'FF8ED973'}"""
+    managed = set()
+    for c in colors:
+        c = c.upper()[-6:]
+        managed |= {c, "00" + c, "FF" + c}
+    return managed
+
+def clear_highlight(ws, colors, journal=None):
+    """
+    在样式表层面清除高亮：先在工作簿的 fill 表里找出受管颜色对应的 fillId，
+    再扫一遍单元格只比较整数 fillId，命中的改指向无填充（表头行不动）。
+    没设过样式的单元格（ws.cell() / _append_row 写的空值）_style 为 None，跳过。
+    journal 为变更日志的登记表（见 _journal_touch），改动的格先登记。
+    """
+    managed = _managed_colors(colors)
+    wb  = ws.parent
+    ids = {i for i, pf in enumerate(wb._fills)
+           if getattr(pf, 'patternType', None) == "solid"
+           and (pf.fgColor.rgb or pf.fgColor.value) in managed}
+    if not ids:
+        return
+    none_id = wb._fills.add(PatternFill())
+    hits = [cell for (r, _), cell in ws._cells.items()
+            if r > 1 and cell._style is not None and cell._style.fillId in ids]
+    _journal_touch(journal, ws, [(cell.row, cell.column) for cell in hits])
+    for cell in hits:
+        cell._style.fillId = none_id
+
+def wait_until_ready(fp, stage="", timeout=None):
+    """fs_watch.wait_until_ready，超时（默认 ready_timeout）/ 稳定时间 / 轮询间隔取 settings"""
+    return fs_watch.wait_until_ready(fp, stage, ready_timeout if timeout is None else timeout,
+                                     ready_stable, ready_poll)
 
-def trim_trailing_blank_rows(ws):
-    for r in range(ws.max_row, 1, -1):
-        if is_row_blank(ws, r):
-            ws.delete_rows(r)
-        else:
-            break
 
 def find_last_data_row(ws, key_col):
     for r in range(ws.max_row, 1, -1):
@@ -58,7 +179,7 @@ def find_last_data_row(ws, key_col):
 
 
 
-def _refresh_pivots_in_workbook(xlsx_path, data_sheet_name):
+def _refresh_pivots_com(xlsx_path, data_sheet_name):
     """
     用 COM 打开 xlsx_path，基于 data_sheet_name 的 ID 列范围
     更新并刷新整本工作簿中所有 PivotTable。
@@ -108,7 +229,9 @@ def _refresh_pivots_in_workbook(xlsx_path, data_sheet_name):
         source_ref   = f"'{data_sheet_name}'!{top_left}:{bottom_right}"
         print(f"  COM: 设置 Pivot 数据源为 {source_ref}")
 
-        # 5) 遍历所有工作表的 PivotTable
+        # 5) 遍历所有工作表的 PivotTable：只新建一个缓存，其余透视表通过 CacheIndex 共用，
+        #    否则每次刷新都给每个透视表多建一个缓存，工作簿越来越大
+        shared = None
         for ws in wb.Worksheets:
             try:
                 pts = ws.PivotTables()  # 必须调用
@@ -121,11 +244,15 @@ def _refresh_pivots_in_workbook(xlsx_path, data_sheet_name):
             for i in range(1, cnt+1):
                 pt = pts.Item(i)
                 try:
-                    cache = wb.PivotCaches().Create(
-                        SourceType=XL_DATABASE,
-                        SourceData=source_ref
-                    )
-                    pt.ChangePivotCache(cache)
+                    if shared is None:
+                        cache = wb.PivotCaches().Create(
+                            SourceType=XL_DATABASE,
+                            SourceData=source_ref
+                        )
+                        pt.ChangePivotCache(cache)
+                        shared = pt.CacheIndex
+                    else:
+                        pt.CacheIndex = shared
                     pt.RefreshTable()
                     print(f"    ✔️ 已刷新 PivotTable [{pt.Name}]")
                 except Exception as e:
@@ -140,59 +267,1750 @@ def _refresh_pivots_in_workbook(xlsx_path, data_sheet_name):
 
     
 
-def update_excel(new_fp):
+def _xml_name(tag):
+    """去掉命名空间，'{ns}row' → 'row'"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _zip_path(base_dir, target):
+    """rels 里的 Target 可能是相对路径，也可能以 / 开头"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _read_rels(zf, rels_path, base_dir, types=None):
+    """rId → 目标；外部链接保持原样，包内部件转成 zip 内路径。传入 types 时顺带填 rId → Type"""
+    rels = {}
+    if rels_path not in zf.namelist():
+        return rels
+    with zf.open(rels_path) as fh:
+        for _, el in iterparse(fh):
+            if _xml_name(el.tag) == 'Relationship':
+                target = el.get('Target', '')
+                if el.get('TargetMode') != 'External':
+                    target = _zip_path(base_dir, target)
+                rels[el.get('Id')] = target
+                if types is not None:
+                    types[el.get('Id')] = el.get('Type', '')
+    return rels
+
+
+def _read_shared_strings(zf):
+    """共享字符串表（富文本只取文字）"""
+    strings = []
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return strings
+    with zf.open('xl/sharedStrings.xml') as fh:
+        for _, el in iterparse(fh):
+            if _xml_name(el.tag) != 'si':
+                continue
+            parts = []
+            for child in el:
+                if _xml_name(child.tag) == 't':
+                    parts.append(child.text or '')
+                elif _xml_name(child.tag) == 'r':
+                    parts.extend(t.text or '' for t in child if _xml_name(t.tag) == 't')
+            strings.append(''.join(parts).replace('x005F_', ''))
+            el.clear()
+    return strings
+
+
+def _cast_number(v):
+    return float(v) if ('.' in v or 'E' in v or 'e' in v) else int(v)
+
+
+def _read_excel_with_links(fp, link_col="ID"):
+    """
+    一次打开 xlsx，流式解析第一个工作表的 XML：
+    返回 (df, {link_col 单元格值: 超链接})。
+    df 与 pd.read_excel(fp) 的结果一致（同样交给 pandas 的 TextParser 做类型推断），
+    解析过程中逐行清理 XML 节点，内存占用不随行数增长。
+    """
+    with zipfile.ZipFile(fp) as zf:
+        names = set(zf.namelist())
+
+        # 1) 工作簿：第一个 sheet 的路径 & 日期纪元
+        wb_rels = _read_rels(zf, 'xl/_rels/workbook.xml.rels', 'xl')
+        sheet_rid, epoch = None, CALENDAR_WINDOWS_1900
+        with zf.open('xl/workbook.xml') as fh:
+            for _, el in iterparse(fh):
+                name = _xml_name(el.tag)
+                if name == 'workbookPr' and el.get('date1904') in ('1', 'true'):
+                    epoch = CALENDAR_MAC_1904
+                elif name == 'sheet' and sheet_rid is None:
+                    sheet_rid = next(v for k, v in el.attrib.items() if _xml_name(k) == 'id')
+        sheet_fp = wb_rels[sheet_rid]
+
+        # 2) 共享字符串
+        strings = _read_shared_strings(zf)
+
+        # 3) 样式：哪些 xf 是日期 / 时长格式
+        date_xf, delta_xf = set(), set()
+        if 'xl/styles.xml' in names:
+            custom, xfs, in_xfs = {}, [], False
+            with zf.open('xl/styles.xml') as fh:
+                for event, el in iterparse(fh, events=('start', 'end')):
+                    name = _xml_name(el.tag)
+                    if name == 'cellXfs':
+                        in_xfs = event == 'start'
+                    elif event == 'end' and name == 'numFmt':
+                        custom[int(el.get('numFmtId'))] = el.get('formatCode')
+                    elif event == 'end' and name == 'xf' and in_xfs:
+                        xfs.append(int(el.get('numFmtId', 0)))
+            for idx, fmt_id in enumerate(xfs):
+                code = custom.get(fmt_id) or BUILTIN_FORMATS.get(fmt_id)
+                if code and is_date_format(code):
+                    date_xf.add(idx)
+                    if is_timedelta_format(code):
+                        delta_xf.add(idx)
+
+        # 4) 工作表本体：值 + 超链接
+        data, last_with_data = [], -1
+        link_refs, key_col, keys = [], None, {}
+        sheet_data = None
+        with zf.open(sheet_fp) as fh:
+            for event, el in iterparse(fh, events=('start', 'end')):
+                name = _xml_name(el.tag)
+                if event == 'start':
+                    if name == 'sheetData':
+                        sheet_data = el
+                    continue
+                if name == 'row':
+                    r = int(el.get('r') or len(data) + 1)
+                    while len(data) < r - 1:
+                        data.append([])
+                    row = []
+                    for c in el:
+                        if _xml_name(c.tag) != 'c':
+                            continue
+                        ref = c.get('r')
+                        col = column_index_from_string(ref.rstrip('0123456789')) if ref else len(row) + 1
+                        row.extend([""] * (col - 1 - len(row)))
+                        t, v, val = c.get('t', 'n'), None, ""
+                        for child in c:
+                            cname = _xml_name(child.tag)
+                            if cname == 'v':
+                                v = child.text
+                            elif cname == 'is':
+                                v = ''.join(x.text or '' for x in child.iter() if _xml_name(x.tag) == 't')
+                        if v is not None:
+                            if t == 's':
+                                val = strings[int(v)]
+                            elif t == 'n':
+                                val = _cast_number(v)
+                                xf  = int(c.get('s', 0))
+                                if xf in date_xf:
+                                    try:
+                                        val = from_excel(val, epoch, timedelta=xf in delta_xf)
+                                    except (OverflowError, ValueError):
+                                        val = np.nan
+                                elif int(val) == val:
+                                    val = int(val)
+                            elif t == 'b':
+                                val = bool(int(v))
+                            elif t == 'e':
+                                val = np.nan
+                            elif t == 'd':
+                                val = from_ISO8601(v)
+                            else:           # str / inlineStr
+                                val = v
+                        row.append(val)
+                        if r == 1 and val == link_col:
+                            key_col = col
+                        elif key_col == col and ref:
+                            keys[ref] = val
+                    while row and row[-1] == "":
+                        row.pop()
+                    if row:
+                        last_with_data = len(data)
+                    data.append(row)
+                    # 处理完的行立即从树上摘掉，保证内存不随行数增长
+                    el.clear()
+                    sheet_data.remove(el)
+                elif name == 'hyperlink':
+                    rid = next((v for k, v in el.attrib.items() if _xml_name(k) == 'id'), None)
+                    if rid:
+                        link_refs.append((el.get('ref'), rid))
+
+        # 5) 超链接 rId → URL，只保留 link_col 列
+        id2url = {}
+        if link_refs and key_col:
+            base = posixpath.dirname(sheet_fp)
+            rels = _read_rels(zf, f"{base}/_rels/{posixpath.basename(sheet_fp)}.rels", base)
+            for ref, rid in link_refs:
+                url = rels.get(rid)
+                if not url:
+                    continue
+                min_col, min_row, max_col, max_row = range_boundaries(ref)
+                if not (min_col <= key_col <= max_col):
+                    continue
+                for r in range(min_row, max_row + 1):
+                    cell_ref = f"{get_column_letter(key_col)}{r}"
+                    if cell_ref in keys:
+                        id2url[keys[cell_ref]] = url
+
+    data = data[:last_with_data + 1]
+    if data:
+        width = max(len(row) for row in data)
+        data = [row + [""] * (width - len(row)) for row in data]
+    df = TextParser(data, header=0, skip_blank_lines=False).read() if data else pd.DataFrame()
+    return df, id2url
+
+
+def _read_csv_typed(fp, src_cfg):
+    """
+    按 sources 配置读 CSV：
+      usecols     "mapping" 表示只解析 mapping / date_col 用到的列，也可以给列名列表
+      dtype       {列名: 类型}，指定了的列不再做类型推断
+      csv_engine  "c"（默认）或 "pyarrow"（需已安装 pyarrow）
+    这些键都没配时与 pd.read_csv(fp) 相同；date_col 由 _normalize_dates 统一解析。
+    """
+    kwargs = {}
+    usecols = src_cfg.get('usecols')
+    if usecols:
+        if usecols == "mapping":
+            wanted = set(src_cfg['mapping']) | {src_cfg.get('date_col')}
+        else:
+            wanted = set(usecols)
+        header = pd.read_csv(fp, nrows=0).columns
+        kwargs['usecols'] = [c for c in header if c in wanted]
+    if src_cfg.get('dtype'):
+        kwargs['dtype'] = {c: t for c, t in src_cfg['dtype'].items()
+                           if 'usecols' not in kwargs or c in kwargs['usecols']}
+    engine = src_cfg.get('csv_engine', 'c')
+    if engine == 'pyarrow':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("⚠️ 未安装 pyarrow，CSV 改用默认解析器")
+            engine = 'c'
+    return pd.read_csv(fp, engine=engine, **kwargs)
+
+
+REL_HYPERLINK = "/hyperlink"
+REL_PRINTER   = "/printerSettings"
+
+
+def _load_target_sheet(xlsx_path, sheet_name):
+    """
+    只把目标工作表连同共享字符串 / 样式 / 主题拼成一个内存中的小工作簿交给 openpyxl，
+    其它工作表、透视表、缓存等部件既不解析也不重写。
+    返回 (wb, ws, ctx)；目标表还挂着超链接以外的部件（表格、批注、图片…）时返回 None，由调用方改用整本读写。
+    """
+    with zipfile.ZipFile(xlsx_path) as zf:
+        names = set(zf.namelist())
+        wb_xml = zf.read('xl/workbook.xml').decode('utf-8')
+        wb_rels = _read_rels(zf, 'xl/_rels/workbook.xml.rels', 'xl')
+
+        sheet_rid = None
+        for el in ET.fromstring(wb_xml).iter():
+            if _xml_name(el.tag) == 'sheet' and el.get('name') == sheet_name:
+                sheet_rid = next(v for k, v in el.attrib.items() if _xml_name(k) == 'id')
+        if sheet_rid is None:
+            return None
+        sheet_part = wb_rels[sheet_rid]
+        sheet_rels = f"{posixpath.dirname(sheet_part)}/_rels/{posixpath.basename(sheet_part)}.rels"
+
+        types = {}
+        _read_rels(zf, sheet_rels, posixpath.dirname(sheet_part), types)
+        if any(not t.endswith((REL_HYPERLINK, REL_PRINTER)) for t in types.values()):
+            return None
+
+        # 小工作簿的 workbook.xml：只留目标表，去掉引用其它表的名称和透视缓存
+        mini_xml = re.sub(r'<(?:\w+:)?sheet\b[^>]*/>',
+                          lambda m: m.group(0) if f'"{sheet_rid}"' in m.group(0) else '', wb_xml)
+        for tag in ('definedNames', 'pivotCaches', 'externalReferences'):
+            mini_xml = re.sub(rf'<(?:\w+:)?{tag}\b.*?</(?:\w+:)?{tag}>', '', mini_xml, flags=re.S)
+        mini_xml = re.sub(r'\b(activeTab|firstSheet)="\d+"', r'\1="0"', mini_xml)
+
+        keep = {'[Content_Types].xml', '_rels/.rels', 'xl/_rels/workbook.xml.rels',
+                'xl/styles.xml', 'xl/sharedStrings.xml', sheet_part, sheet_rels}
+        keep |= {n for n in names if n.startswith('xl/theme/')}
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as mini:
+            mini.writestr('xl/workbook.xml', mini_xml)
+            for n in keep & names:
+                mini.writestr(n, zf.read(n))
+        sheet_xml_head = zf.open(sheet_part).read(4096)
+
+    buf.seek(0)
+    wb = load_workbook(buf)
+    ctx = {
+        'sheet_part':   sheet_part,
+        'sheet_rels':   sheet_rels,
+        'tab_selected': b'tabSelected="1"' in sheet_xml_head,
+    }
+    return wb, wb[sheet_name], ctx
+
+
+def _numfmt_entries(styles_xml):
+    """styles.xml 里的自定义数字格式 [(numFmtId, formatCode)]，formatCode 已反转义"""
+    return [(int(a['numFmtId']), xml_unescape(a['formatCode'], {'&quot;': '"', '&apos;': "'"}))
+            for a in map(_xml_attrs, re.findall(r'<(?:\w+:)?numFmt\b[^>]*/>', styles_xml))
+            if 'numFmtId' in a and 'formatCode' in a]
+
+
+def _keep_numfmt_ids(orig_styles, new_styles):
+    """
+    openpyxl 写 styles.xml 时把自定义数字格式从 164 起重新编号，而透视表、条件格式等原样拷贝的部件
+    直接按 numFmtId 引用格式。这里把新样式表里的编号按 formatCode 改回原编号，原有格式全部保留，
+    新增的格式接在原最大编号后面。
+    """
+    orig_xml, new_xml = orig_styles.decode('utf-8'), new_styles.decode('utf-8')
+    orig, new = _numfmt_entries(orig_xml), _numfmt_entries(new_xml)
+    if not orig and not new:
+        return new_styles
+    code2id = {}
+    for i, code in orig:
+        code2id.setdefault(code, i)
+    next_id = max([i for i, _ in orig] + [BUILTIN_FORMATS_MAX_SIZE - 1]) + 1
+    remap, entries = {}, list(orig)
+    for i, code in new:
+        if code not in code2id:
+            code2id[code] = next_id
+            entries.append((next_id, code))
+            next_id += 1
+        remap[i] = code2id[code]
+
+    body = re.sub(r'<(?:\w+:)?numFmts\b.*?</(?:\w+:)?numFmts>|<(?:\w+:)?numFmts\b[^>]*/>', '', new_xml,
+                  count=1, flags=re.S)
+    body = re.sub(r'\bnumFmtId="(\d+)"', lambda m: f'numFmtId="{remap.get(int(m.group(1)), int(m.group(1)))}"', body)
+    block = (f'<numFmts count="{len(entries)}">' +
+             ''.join(f'<numFmt numFmtId="{i}" formatCode={quoteattr(code)}/>' for i, code in entries) +
+             '</numFmts>')
+    body = re.sub(r'<(?:\w+:)?styleSheet\b[^>]*>', lambda m: m.group(0) + block, body, count=1)
+    return body.encode('utf-8')
+
+
+def _save_target_sheet(wb, ctx, xlsx_path):
+    """
+    把小工作簿里改过的目标表写回原文件：只替换目标表 XML（及其超链接 rels）、
+    sharedStrings 和 styles（自定义数字格式保持原编号），其它部件原样拷贝。
+    新表里的共享字符串下标会重新映射到“原字符串表 + 追加的新字符串”上，
+    这样其它工作表引用的下标保持不变。
+    """
+    buf = io.BytesIO()
+    wb.save(buf)
+    with zipfile.ZipFile(buf) as mini:
+        new_sheet  = mini.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        new_styles = mini.read('xl/styles.xml')
+        mini_rels  = 'xl/worksheets/_rels/sheet1.xml.rels'
+        new_rels   = mini.read(mini_rels) if mini_rels in mini.namelist() else None
+        new_sst    = _read_shared_strings(mini)
+
+    with zipfile.ZipFile(xlsx_path) as zf:
+        names = zf.namelist()
+        orig_styles = zf.read('xl/styles.xml')
+        # openpyxl 只会在 cellXfs 末尾追加，少了说明其它表的样式下标会错位，宁可不写
+        count = lambda xml: int(re.search(rb'<cellXfs count="(\d+)"', xml).group(1))
+        if count(new_styles) < count(orig_styles):
+            raise RuntimeError("样式表 cellXfs 数量变少，无法只替换目标表")
+        new_styles = _keep_numfmt_ids(orig_styles, new_styles)
+
+        # 1) 共享字符串：原表下标不变，新字符串追加在末尾
+        orig_sst = _read_shared_strings(zf)
+        index = {}
+        for i, text in enumerate(orig_sst):
+            index.setdefault(text, i)
+        extra = []
+        remap = []
+        for text in new_sst:
+            if text not in index:
+                index[text] = len(orig_sst) + len(extra)
+                extra.append(text)
+            remap.append(index[text])
+        new_sheet = re.sub(r'(<c\b[^>]*\bt="s"[^>]*>\s*<v>)(\d+)(</v>)',
+                           lambda m: f"{m.group(1)}{remap[int(m.group(2))]}{m.group(3)}", new_sheet)
+        if not ctx['tab_selected']:
+            new_sheet = new_sheet.replace(' tabSelected="1"', '')
+
+        if 'xl/sharedStrings.xml' in names:
+            sst_xml = zf.read('xl/sharedStrings.xml').decode('utf-8')
+        else:
+            sst_xml = ('<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                       'count="0" uniqueCount="0"></sst>')
+        if extra:
+            items = ''.join(f'<si><t xml:space="preserve">{xml_escape(t)}</t></si>' for t in extra)
+            sst_xml = re.sub(r'</(\w+:)?sst>\s*$', lambda m: items + m.group(0), sst_xml)
+        total = len(orig_sst) + len(extra)
+        sst_xml = re.sub(r'\buniqueCount="\d+"', f'uniqueCount="{total}"', sst_xml, count=1)
+        sst_xml = re.sub(r'\bcount="\d+"', f'count="{total}"', sst_xml, count=1)
+
+        # 2) calcChain 记录的是旧公式位置，删掉让 Excel 打开时重建
+        content_types = zf.read('[Content_Types].xml').decode('utf-8')
+        wb_rels_xml   = zf.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        if 'xl/sharedStrings.xml' not in names:
+            content_types = content_types.replace('</Types>',
+                '<Override PartName="/xl/sharedStrings.xml" ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+            wb_rels_xml = wb_rels_xml.replace('</Relationships>',
+                '<Relationship Id="rIdSst1" Type="http://schemas.openxmlformats.org/officeDocument/'
+                '2006/relationships/sharedStrings" Target="sharedStrings.xml"/></Relationships>')
+        content_types = re.sub(r'<Override[^>]*PartName="/xl/calcChain.xml"[^>]*/>', '', content_types)
+        wb_rels_xml   = re.sub(r'<Relationship[^>]*Target="[^"]*calcChain.xml"[^>]*/>', '', wb_rels_xml)
+
+        replaced = {
+            ctx['sheet_part']:       new_sheet.encode('utf-8'),
+            'xl/styles.xml':         new_styles,
+            'xl/sharedStrings.xml':  sst_xml.encode('utf-8'),
+            '[Content_Types].xml':   content_types.encode('utf-8'),
+            'xl/_rels/workbook.xml.rels': wb_rels_xml.encode('utf-8'),
+        }
+        if new_rels is not None:
+            replaced[ctx['sheet_rels']] = new_rels
+        dropped = {'xl/calcChain.xml'}
+        if new_rels is None:
+            dropped.add(ctx['sheet_rels'])
+
+        # 3) 写到同目录临时文件再替换，避免写到一半的文件被 OneDrive / Excel 读到
+        tmp_fp = xlsx_path + '.tmp'
+        with zipfile.ZipFile(tmp_fp, 'w', zipfile.ZIP_DEFLATED) as out:
+            for info in zf.infolist():
+                if info.filename in dropped or info.filename in replaced:
+                    continue
+                out.writestr(info, zf.read(info.filename))
+            for name, data in replaced.items():
+                out.writestr(name, data)
+    os.replace(tmp_fp, xlsx_path)
+
+
+def _open_summary(orig_fp):
+    """按 settings.writer 打开汇总表：'sheet' 只载入目标表，否则整本载入。返回 (wb, ws, ctx)"""
+    wait_until_ready(orig_fp, "打开汇总表")
+    if writer_mode == 'sheet':
+        opened = _load_target_sheet(orig_fp, sheet)
+        if opened:
+            return opened
+        print(f"⚠️ 目标表 “{sheet}” 依赖表格/批注/图片等部件，改用整本读写")
+    wb = load_workbook(orig_fp)
+    return wb, wb[sheet], None
+
+
+def _save_summary(wb, ctx, orig_fp):
+    if ctx:
+        _save_target_sheet(wb, ctx, orig_fp)
+    else:
+        wb.save(orig_fp)
+
+
+def _sheet_extent(zf, sheet_part, key_header="ID"):
+    """
+    流式扫描工作表 XML，返回 (表头最后一列, key_header 列最后一个有值的行)，
+    对应 COM 里的 End(xlToLeft) / End(xlUp)。找不到 key_header 列时返回 None
+    """
+    strings = None
+    last_col, key_letter, last_row = 0, None, 1
+    with zf.open(sheet_part) as fh:
+        for _, el in iterparse(fh):
+            if _xml_name(el.tag) != 'row':
+                continue
+            if el.get('r') == '1':
+                for c in el:
+                    v = next((x for x in c if _xml_name(x.tag) in ('v', 'is')), None)
+                    if v is None:
+                        continue
+                    col = column_index_from_string(re.match(r'[A-Z]+', c.get('r')).group())
+                    last_col = max(last_col, col)
+                    if c.get('t') == 's':
+                        if strings is None:
+                            strings = _read_shared_strings(zf)
+                        text = strings[int(v.text)]
+                    elif _xml_name(v.tag) == 'is':
+                        text = ''.join(t.text or '' for t in v.iter() if _xml_name(t.tag) == 't')
+                    else:
+                        text = v.text or ''
+                    if key_letter is None and text.strip() == key_header:
+                        key_letter = re.match(r'[A-Z]+', c.get('r')).group()
+            elif key_letter:
+                n = len(key_letter)
+                for c in el:
+                    ref = c.get('r', '')
+                    if ref[:n] == key_letter and ref[n:n+1].isdigit():
+                        if any(_xml_name(x.tag) in ('v', 'is') for x in c):
+                            last_row = int(ref[n:])
+                        break
+            el.clear()
+    return (last_col, last_row) if key_letter else None
+
+
+def _xml_attrs(tag):
+    """开始标签文本 → {属性名: 值}（带前缀的属性保留前缀，如 'r:id'）"""
+    return dict(re.findall(r'\s([\w:]+)="([^"]*)"', tag))
+
+
+def _set_xml_attr(tag, name, value):
+    """在开始标签文本里设置属性（已有则替换）"""
+    if re.search(rf'\s{name}="[^"]*"', tag):
+        return re.sub(rf'(\s{name}=)"[^"]*"', rf'\g<1>"{value}"', tag, count=1)
+    return re.sub(r'\s*(/?>)$', rf' {name}="{value}"\1', tag, count=1)
+
+
+def _refresh_pivots_xml(xlsx_path, data_sheet_name):
+    """
+    不启动 Excel 的 Pivot 刷新：按 data_sheet_name 的 ID 列范围改写每个透视缓存的
+    worksheetSource ref，并标记 refreshOnLoad，Excel 打开时按新范围重算。
+    pivot_records = 'drop' 时顺带删掉旧的 pivotCacheRecords（saveData="0"），打开时重建。
+    只替换透视缓存部件，其它部件原样拷贝。
+    """
+    with zipfile.ZipFile(xlsx_path) as zf:
+        names = set(zf.namelist())
+        wb_types = {}
+        wb_rels = _read_rels(zf, 'xl/_rels/workbook.xml.rels', 'xl', wb_types)
+        cache_parts = [wb_rels[rid] for rid, t in wb_types.items()
+                       if t.endswith('/pivotCacheDefinition') and wb_rels[rid] in names]
+        if not cache_parts:
+            return
+
+        sheet_part = None
+        with zf.open('xl/workbook.xml') as fh:
+            for _, el in iterparse(fh):
+                if _xml_name(el.tag) == 'sheet' and el.get('name') == data_sheet_name:
+                    sheet_part = wb_rels[next(v for k, v in el.attrib.items() if _xml_name(k) == 'id')]
+        if sheet_part is None:
+            print(f"❌ 找不到数据表 “{data_sheet_name}”，跳过 Pivot 刷新")
+            return
+        extent = _sheet_extent(zf, sheet_part)
+        if extent is None:
+            print("❌ 未找到 ‘ID’ 列，无法定位数据区域，跳过 Pivot 刷新")
+            return
+        last_col, last_row = extent
+        if last_row <= 1:
+            print("⚠️ ‘ID’ 列无数据，跳过 Pivot 刷新")
+            return
+        new_ref = f"A1:{get_column_letter(last_col)}{last_row}"
+        print(f"  Pivot: 设置数据源为 '{data_sheet_name}'!{new_ref}")
+
+        replaced, dropped, n = {}, set(), 0
+        for part in cache_parts:
+            xml = zf.read(part).decode('utf-8')
+            src = re.search(r'<(?:\w+:)?worksheetSource\b[^>]*>', xml)
+            if not src:
+                continue
+            attrs = _xml_attrs(src.group(0))
+            if xml_unescape(attrs.get('sheet', ''), {'&quot;': '"', '&apos;': "'"}) != data_sheet_name \
+                    or 'ref' not in attrs:
+                continue
+            n += 1
+            root = re.search(r'<(?:\w+:)?pivotCacheDefinition\b[^>]*>', xml).group(0)
+            new_root = _set_xml_attr(root, 'refreshOnLoad', '1')
+
+            if pivot_records == 'drop':
+                rels_path = f"{posixpath.dirname(part)}/_rels/{posixpath.basename(part)}.rels"
+                types = {}
+                rels = _read_rels(zf, rels_path, posixpath.dirname(part), types)
+                for rid in [rid for rid, t in types.items() if t.endswith('/pivotCacheRecords')]:
+                    new_root = re.sub(rf'\s[\w]+:id="{rid}"', '', new_root)
+                    new_root = re.sub(r'\srecordCount="\d*"', '', _set_xml_attr(new_root, 'saveData', '0'))
+                    rels_xml = re.sub(rf'<(?:\w+:)?Relationship\b[^>]*\bId="{rid}"[^>]*/>', '',
+                                      zf.read(rels_path).decode('utf-8'))
+                    dropped.add(rels[rid])
+                    if re.search(r'<(?:\w+:)?Relationship\b', rels_xml):
+                        replaced[rels_path] = rels_xml.encode('utf-8')
+                    else:
+                        dropped.add(rels_path)
+
+            new_xml = xml.replace(src.group(0), _set_xml_attr(src.group(0), 'ref', new_ref), 1)
+            new_xml = new_xml.replace(root, new_root, 1)
+            if new_xml != xml:
+                replaced[part] = new_xml.encode('utf-8')
+
+        if dropped:
+            content_types = zf.read('[Content_Types].xml').decode('utf-8')
+            for d in dropped:
+                content_types = re.sub(rf'<Override[^>]*PartName="/{re.escape(d)}"[^>]*/>', '', content_types)
+            replaced['[Content_Types].xml'] = content_types.encode('utf-8')
+
+        if replaced:
+            tmp_fp = xlsx_path + '.tmp'
+            with zipfile.ZipFile(tmp_fp, 'w', zipfile.ZIP_DEFLATED) as out:
+                for info in zf.infolist():
+                    if info.filename in dropped or info.filename in replaced:
+                        continue
+                    out.writestr(info, zf.read(info.filename))
+                for name, data in replaced.items():
+                    out.writestr(name, data)
+    if replaced:
+        os.replace(tmp_fp, xlsx_path)
+    print(f"✅ {n} 个透视缓存已指向新数据范围，Excel 打开时自动刷新：{xlsx_path}\n")
+
+
+def _refresh_pivots_in_workbook(xlsx_path, data_sheet_name):
+    """按 settings.pivot_refresh 刷新整本工作簿中的 PivotTable"""
+    if pivot_refresh == 'off':
+        return
+    if pivot_refresh == 'com':
+        if win32com is not None:
+            return _refresh_pivots_com(xlsx_path, data_sheet_name)
+        print("⚠️ 未安装 pywin32（或不是 Windows），改用 xml 方式刷新 Pivot")
+    _refresh_pivots_xml(xlsx_path, data_sheet_name)
+
+
+def _load_seconds(fp):
+    t0 = time.perf_counter()
+    load_workbook(fp)
+    return time.perf_counter() - t0
+
+
+def consolidate_pivot_caches(xlsx_path=None):
+    """
+    维护命令：数据源相同（同一 cacheSource、同样的字段定义）的透视缓存合并成一个，
+    引用被合并缓存的透视表改指向保留的缓存（并标记打开时刷新）；没有透视表引用的缓存定义 / 记录部件删掉。
+    先写到临时文件、校验能作为 zip 读出后再替换原文件，中途出错原文件不动。
+    最后报告文件省下的字节数和 openpyxl 载入耗时的变化。
+    """
+    xlsx_path = xlsx_path or os.path.join(ORIG_DIR, paths['original_file'])
+    size_before = os.path.getsize(xlsx_path)
+    with zipfile.ZipFile(xlsx_path) as zf:
+        names = set(zf.namelist())
+        wb_xml      = zf.read('xl/workbook.xml').decode('utf-8')
+        wb_rels_xml = zf.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        content_types = zf.read('[Content_Types].xml').decode('utf-8')
+        wb_types = {}
+        wb_rels = _read_rels(zf, 'xl/_rels/workbook.xml.rels', 'xl', wb_types)
+        if any(t.endswith(('/slicerCache', '/timelineCache')) for t in wb_types.values()):
+            print("⚠️ 工作簿带切片器 / 日程表，它们按缓存编号引用透视缓存，不做合并")
+            return
+
+        # 1) 工作簿登记的缓存：缓存定义部件 → (cacheId, rId)
+        caches = {}
+        for m in re.finditer(r'<(?:\w+:)?pivotCache\b[^>]*>', wb_xml):
+            attrs = _xml_attrs(m.group(0))
+            rid = next(v for k, v in attrs.items() if k.endswith(':id'))
+            caches[wb_rels[rid]] = (attrs['cacheId'], rid)
+        if not caches:
+            print("工作簿里没有透视缓存")
+            return
+
+        # 2) 透视表 → 引用的缓存定义部件
+        tables = {}
+        for part in re.findall(r'PartName="/([^"]+)"[^>]*ContentType="[^"]*pivotTable\+xml"', content_types):
+            rels_path = f"{posixpath.dirname(part)}/_rels/{posixpath.basename(part)}.rels"
+            types = {}
+            rels = _read_rels(zf, rels_path, posixpath.dirname(part), types)
+            tables[part] = next((rels[rid] for rid, t in types.items() if t.endswith('/pivotCacheDefinition')), None)
+
+        # 3) 按 (cacheSource, cacheFields) 分组，每组留第一个被引用的缓存
+        keep_of, first = {}, {}
+        for part in sorted({c for c in tables.values() if c in caches}, key=lambda c: int(caches[c][0])):
+            xml = zf.read(part).decode('utf-8')
+            key = tuple(m.group(0) if m else None for m in (
+                re.search(r'<(?:\w+:)?cacheSource\b.*?(?:/>|</(?:\w+:)?cacheSource>)', xml, re.S),
+                re.search(r'<(?:\w+:)?cacheFields\b.*?</(?:\w+:)?cacheFields>', xml, re.S)))
+            keep_of[part] = first.setdefault(key, part)
+
+        replaced = {}
+        for part, cache in tables.items():
+            keep = keep_of.get(cache, cache)
+            if keep == cache:
+                continue
+            xml = zf.read(part).decode('utf-8')
+            root = re.search(r'<(?:\w+:)?pivotTableDefinition\b[^>]*>', xml).group(0)
+            replaced[part] = xml.replace(root, _set_xml_attr(root, 'cacheId', caches[keep][0]), 1).encode('utf-8')
+            rels_path = f"{posixpath.dirname(part)}/_rels/{posixpath.basename(part)}.rels"
+            target = posixpath.relpath(keep, posixpath.dirname(part))
+            replaced[rels_path] = re.sub(
+                r'(<(?:\w+:)?Relationship\b[^>]*pivotCacheDefinition"[^>]*\bTarget=")[^"]*(")',
+                rf'\g<1>{target}\2', zf.read(rels_path).decode('utf-8')).encode('utf-8')
+        # 共享缓存的透视表换了缓存，让 Excel 打开时按数据源重建
+        for keep in {keep_of[c] for c in tables.values() if keep_of.get(c, c) != c}:
+            xml = zf.read(keep).decode('utf-8')
+            root = re.search(r'<(?:\w+:)?pivotCacheDefinition\b[^>]*>', xml).group(0)
+            replaced[keep] = xml.replace(root, _set_xml_attr(root, 'refreshOnLoad', '1'), 1).encode('utf-8')
+
+        # 4) 没有透视表再引用的缓存：连同记录部件、rels、登记项一起删掉
+        used = {keep_of.get(c, c) for c in tables.values()}
+        orphans = [c for c in caches if c not in used]
+        dropped = set()
+        for cache in orphans:
+            rels_path = f"{posixpath.dirname(cache)}/_rels/{posixpath.basename(cache)}.rels"
+            dropped |= {cache, rels_path} | set(_read_rels(zf, rels_path, posixpath.dirname(cache)).values())
+            cache_id, rid = caches[cache]
+            wb_xml = re.sub(rf'<(?:\w+:)?pivotCache\b[^>]*\bcacheId="{cache_id}"[^>]*/>', '', wb_xml)
+            wb_rels_xml = re.sub(rf'<(?:\w+:)?Relationship\b[^>]*\bId="{rid}"[^>]*/>', '', wb_rels_xml)
+        if not replaced and not orphans:
+            print(f"✅ {len(caches)} 个透视缓存都在使用且互不重复，无需合并")
+            return
+        wb_xml = re.sub(r'<(?:\w+:)?pivotCaches\b[^>]*>\s*</(?:\w+:)?pivotCaches>', '', wb_xml)
+        for d in dropped:
+            content_types = re.sub(rf'<Override[^>]*PartName="/{re.escape(d)}"[^>]*/>', '', content_types)
+        replaced.update({
+            'xl/workbook.xml':            wb_xml.encode('utf-8'),
+            'xl/_rels/workbook.xml.rels': wb_rels_xml.encode('utf-8'),
+            '[Content_Types].xml':        content_types.encode('utf-8'),
+        })
+
+        tmp_fp = xlsx_path + '.tmp'
+        try:
+            with zipfile.ZipFile(tmp_fp, 'w', zipfile.ZIP_DEFLATED) as out:
+                for info in zf.infolist():
+                    if info.filename in dropped or info.filename in replaced:
+                        continue
+                    out.writestr(info, zf.read(info.filename))
+                for name, data in replaced.items():
+                    out.writestr(name, data)
+            with zipfile.ZipFile(tmp_fp) as check:
+                bad = check.testzip()
+            if bad is not None:
+                raise zipfile.BadZipFile(f"临时文件里的 {bad} 校验失败")
+        except Exception:
+            if os.path.exists(tmp_fp):
+                os.remove(tmp_fp)
+            raise
+
+    load_before = _load_seconds(xlsx_path)
+    os.replace(tmp_fp, xlsx_path)
+    load_after = _load_seconds(xlsx_path)
+    size_after = os.path.getsize(xlsx_path)
+    n_tables = sum(1 for p in tables if p in replaced)
+    print(f"✅ 透视缓存 {len(caches)} → {len(caches) - len(orphans)} 个："
+          f"{n_tables} 个透视表改用共享缓存，删除 {len(orphans)} 个无人引用的缓存")
+    print(f"  文件 {size_before / 1024:.0f} KiB → {size_after / 1024:.0f} KiB（省 {size_before - size_after} 字节），"
+          f"openpyxl 载入 {load_before:.2f}s → {load_after:.2f}s")
+
+
+
+CLOSED_PHASES = ("Concluded", "Closed", "Resolved")
+DATE_FORMAT   = "m/d/yyyy h:mm:ss AM/PM"
+UPDATE_RGB    = "ADD8E6"   # 蓝：已有行被更新
+NEW_RGB       = "8ED973"   # 绿：新增行
+GRAY_RGB      = "C0C0C0"   # 灰：Top issue 标签已去掉
+
+
+_ISTEP_RX = re.compile(r'[（(]([\d-]+)')
+
+def _istep_na05(val):
+    """
+    Involved I-Step 统一格式成 NA05 开头（整列）：
+      1) 以 G070 或 U006 开头的，前 4 位换成 NA05
+      2) 否则提取全角或半角括号内的编号，如 “（25-07-452 ATS+3...）” → "NA05-25-07-452"
+      3) 都不符合的保留原值；空值保持 NaN
+    """
+    s    = val.dropna().astype(str)
+    pre  = s.str.startswith(("G070", "U006"))
+    code = s.str.extract(_ISTEP_RX, expand=False)
+    out  = val.astype(object)
+    out.loc[s.index] = np.where(pre, "NA05" + s.str[4:],
+                                np.where(code.notna(), "NA05-" + code, val.loc[s.index].astype(object)))
+    return out
+
+
+# 字段转换注册表：名字 → 整列转换（输入输出都是 object Series，空值为 NaN）
+# 在 sources.<来源>.transforms 里按导出列引用：{"导出列": ["转换名", ...]}
+FIELD_TRANSFORMS = {
+    "istep_na05": _istep_na05,
+}
+# 来源没配 transforms 时按表头套用的默认转换
+_DEFAULT_TRANSFORMS = {
+    "Involved I-Step": ("istep_na05",),
+}
+
+_mapping_cache = {}
+
+def _compile_mapping(mapping, transforms=None):
+    """
+    把 {导出列: 表头} 和字段转换编译成合并要用的两张表，按配置内容的哈希缓存：
+      pairs: [(导出列, 表头, 转换函数)]   更新已有行时按配置顺序逐对使用
+      first: {表头: (导出列, 转换函数)}    新增行时每个表头取第一个映射到它的导出列
+    """
+    key = hashlib.sha1(json.dumps([mapping, transforms], ensure_ascii=False).encode('utf-8')).hexdigest()
+    if key not in _mapping_cache:
+        pairs = []
+        for nk, ok in mapping.items():
+            names = transforms.get(nk, ()) if transforms is not None else _DEFAULT_TRANSFORMS.get(ok, ())
+            unknown = [n for n in names if n not in FIELD_TRANSFORMS]
+            if unknown:
+                raise ValueError(f"未知的字段转换 {unknown}（{nk} → {ok}），可用：{list(FIELD_TRANSFORMS)}")
+            pairs.append((nk, ok, tuple(FIELD_TRANSFORMS[n] for n in names)))
+        first = {}
+        for nk, ok, fns in pairs:
+            first.setdefault(ok, (nk, fns))
+        _mapping_cache[key] = (pairs, first)
+    return _mapping_cache[key]
+
+
+def _apply_transforms(val, fns):
+    """按顺序对整列（空值已 mask 成 NaN）做转换"""
+    for fn in fns:
+        val = fn(val)
+    return val
+
+
+def _to_pydatetime(raw):
+    """解析失败返回 None（越界日期 OutOfBoundsDatetime 也是 ValueError）"""
+    try:
+        return pd.to_datetime(raw).to_pydatetime()
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _naive_datetime(ts, tz):
+    """带时区的时间按 tz 换算（tz 为空则保留墙上时间）后去掉时区：Excel 不支持时区"""
+    if ts.tzinfo is not None:
+        ts = pd.Timestamp(ts)
+        ts = (ts.tz_convert(tz) if tz else ts).tz_localize(None)
+    return ts.to_pydatetime() if isinstance(ts, pd.Timestamp) else ts
+
+
+def _normalize_dates(df_new, src_cfg):
+    """
+    把 date_col 整列一次解析成 Python datetime：先按 date_format（未配置则由 pandas 推断）向量化解析，
+    不符合的取值再逐个试一次；时区按 date_tz 处理。
+    解析不了的值原样保留（新增行照旧写原文，已有行不更新），返回 (df_new, 解析失败的行)。
+    """
+    date_col = src_cfg.get('date_col')
+    if not date_col or date_col not in df_new.columns:
+        return df_new, df_new.iloc[0:0]
+    fmt, tz = src_cfg.get('date_format'), src_cfg.get('date_tz')
+    raw   = df_new[date_col].astype(object)
+    blank = _blank_mask(raw)
+    uniq  = pd.Series(pd.unique(raw[~blank]), dtype=object)
+
+    try:
+        parsed = pd.to_datetime(uniq, format=fmt, errors='coerce')
+        parsed = parsed if pd.api.types.is_datetime64_any_dtype(parsed) else pd.Series(pd.NaT, index=uniq.index)
+    except (ValueError, TypeError):
+        parsed = pd.Series(pd.NaT, index=uniq.index)
+
+    lookup, failed = {}, set()
+    for v, ts in zip(uniq.tolist(), parsed.tolist()):
+        if pd.isna(ts):
+            ts = _to_pydatetime(v)
+        if ts is None or pd.isna(ts):
+            failed.add(v)
+            lookup[v] = v
+        else:
+            lookup[v] = _naive_datetime(ts, tz)
+
+    df_new = df_new.copy()
+    df_new[date_col] = raw.map(lookup).where(~blank, raw)
+    return df_new, df_new[~blank & raw.isin(failed)]
+
+
+def _report_bad_dates(bad, src_cfg, source_key, new_fp, ts, commit=True):
+    """把本次要合并的行里解析不了的日期写成 date_errors_<来源>.csv（每个来源一份，覆盖上次的）；dry-run 只打印"""
+    if bad.empty:
+        return
+    date_col = src_cfg['date_col']
+    id_key   = next(k for k, v in src_cfg['mapping'].items() if v == "ID")
+    cols     = [c for c in (id_key, date_col) if c in bad.columns]
+    print(f"⚠️ {source_key} 有 {len(bad)} 行 {date_col} 无法解析，如：{bad[date_col].iloc[0]!r}")
+    if commit:
+        report_fp = os.path.join(ORIG_DIR, f"date_errors_{source_key}.csv")
+        bad[cols].assign(file=os.path.basename(new_fp), run=ts).to_csv(report_fp, index=False,
+                                                                      encoding="utf-8-sig")
+        print(f"  明细见 {report_fp}")
+
+
+_pattern_cache = {}
+
+def _compile_patterns(patterns):
+    """
+    把 {分组名: [关键词...]} 编译成一个组合正则：每个分组是一个零宽前瞻里的命名分支，
+    同一位置先尝试配置里靠前的分组，所以全文所有命中里编号最小的就是“第一个命中的分组”。
+    按配置内容的哈希缓存，watcher 处理多次事件也只编译一次。
+    """
+    key = hashlib.sha1(json.dumps(patterns, ensure_ascii=False).encode('utf-8')).hexdigest()
+    if key not in _pattern_cache:
+        names = list(patterns)
+        alts  = [f"(?P<g{i}>{'|'.join(re.escape(kw.lower()) for kw in kws)})"
+                 for i, kws in enumerate(patterns.values()) if kws]
+        rx = re.compile("(?=" + "|".join(alts) + ")") if alts else None
+        _pattern_cache[key] = (rx, names)
+    return _pattern_cache[key]
+
+
+def _classify(text, rx, names):
+    """按配置顺序返回第一个命中的分组名，未命中返回 None"""
+    if rx is None:
+        return None
+    best = None
+    for m in rx.finditer(str(text or "").lower()):
+        g = int(m.lastgroup[1:])
+        if best is None or g < best:
+            best = g
+            if g == 0:
+                break
+    return None if best is None else names[best]
+
+
+def _classify_column(values, patterns):
+    """整列分类，每个不同的取值只匹配一次"""
+    rx, names = _compile_patterns(patterns)
+    lookup = {v: _classify(v, rx, names) for v in pd.unique(values)}
+    return values.map(lookup)
+
+
+# 启动时预编译
+_compile_patterns(fund_patterns)
+_compile_patterns(owner_patterns)
+for _src in sources.values():
+    _compile_mapping(_src['mapping'], _src.get('transforms'))
+
+
+def _blank_mask(s):
+    return s.isna() | s.eq("")
+
+
+def _snapshot_sheet(ws, min_row=2, max_row=None):
+    """
+    把目标表 min_row 行起（默认第 2 行到末行）的数据一次性读成 DataFrame：
+    index 为 Excel 行号，columns 为 Excel 列号，值保持 openpyxl 原样（object）。
+    """
+    ncol = ws.max_column
+    max_row = ws.max_row if max_row is None else max_row
+    rows = list(ws.iter_rows(min_row=min_row, max_row=max_row, max_col=ncol, values_only=True)) \
+        if max_row >= min_row else []
+    return pd.DataFrame(rows, index=range(min_row, min_row + len(rows)),
+                        columns=range(1, ncol + 1), dtype=object)
+
+
+def _style_array(wb, fill=None, number_format=None):
+    """预先在工作簿的样式表里登记好填充 / 数字格式，返回可直接给新单元格用的 StyleArray"""
+    sa = StyleArray()
+    if fill is not None:
+        sa.fillId = wb._fills.add(fill)
+    if number_format is not None:
+        if number_format in BUILTIN_FORMATS_REVERSE:
+            sa.numFmtId = BUILTIN_FORMATS_REVERSE[number_format]
+        else:
+            sa.numFmtId = wb._number_formats.add(number_format) + BUILTIN_FORMATS_MAX_SIZE
+    return sa
+
+
+def _append_row(ws, r, vals, styles):
+    """
+    把一整行新值写到第 r 行：非空值用对应列预登记的样式，空串不带样式。
+    该行原本没有单元格时直接放进 ws._cells；否则逐格赋值，保留原单元格的其它样式。
+    """
+    if any((r, c) in ws._cells for c in range(1, len(vals) + 1)):
+        for c, (val, sa) in enumerate(zip(vals, styles), start=1):
+            cell = ws.cell(r, c)
+            cell.value = val
+            if val != "":
+                cell.fill = ws.parent._fills[sa.fillId]
+                if sa.numFmtId:
+                    cell._style.numFmtId = sa.numFmtId
+        return
+    for c, (val, sa) in enumerate(zip(vals, styles), start=1):
+        ws._cells[(r, c)] = Cell(ws, row=r, column=c, value=val,
+                                 style_array=sa if val != "" else None)
+
+
+DERIVED_FILLS = {"new": NEW_RGB, "update": UPDATE_RGB, "gray": GRAY_RGB}
+
+
+def _rule_mask(s, cond):
+    """
+    单个条件 → 布尔掩码：contains（按文本包含）/ equals / in / blank /
+    older_than_days（日期距今超过 N 天，同 DATEDIF(日期, TODAY(), "D") > N），"not": true 取反
+    """
+    if "contains" in cond:
+        m = s.fillna("").astype(str).str.contains(cond["contains"], regex=False)
+    elif "older_than_days" in cond:
+        d = pd.to_datetime(s.where(s.map(lambda v: isinstance(v, datetime))), errors='coerce')
+        m = (pd.Timestamp(dt_date.today()) - d.dt.normalize()).dt.days > cond["older_than_days"]
+    elif "equals" in cond:
+        m = s.eq(cond["equals"])
+    elif "in" in cond:
+        m = s.isin(cond["in"])
+    else:
+        m = _blank_mask(s) if cond.get("blank", True) else ~_blank_mask(s)
+    return ~m if cond.get("not") else m
+
+
+def _apply_derived(snap, header2col, specs=None):
+    """
+    按 derived_columns（或传入的 specs）在整表快照上一次性算派生列（规则按配置顺序执行，后面的规则看得到前面的结果）。
+    snap 就地更新；返回 (值有变化的单元格 [(行, 列, 值)], 要染色的单元格 [(行, 列, RGB)])。
+    派生列或条件引用的列不存在时跳过该派生列。
+    """
+    changes, fills = [], []
+    for spec in (derived_columns if specs is None else specs):
+        needed = [spec["column"]] + [c["column"] for rule in spec["rules"] for c in rule.get("when", [])]
+        if not all(header2col.get(h) for h in needed):
+            continue
+        col = header2col[spec["column"]]
+        for rule in spec["rules"]:
+            mask = pd.Series(True, index=snap.index)
+            for cond in rule.get("when", []):
+                mask &= _rule_mask(snap[header2col[cond["column"]]], cond)
+            if "value" in rule or "else" in rule:
+                cur = snap[col]
+                new = cur.copy()
+                if "value" in rule:
+                    new[mask] = rule["value"]
+                if "else" in rule:
+                    new[~mask] = rule["else"]
+                diff = (new.ne(cur) | new.map(type).ne(cur.map(type))) & ~(new.isna() & cur.isna())
+                changed = new[diff]
+                changes.extend((r, col, v) for r, v in changed.items())
+                snap.loc[changed.index, col] = changed
+            if "fill" in rule:
+                rgb = DERIVED_FILLS.get(rule["fill"], rule["fill"])
+                fills.extend((r, col, rgb) for r in mask.index[mask.values])
+    return changes, fills
+
+
+def _merge_existing(snap, ex, mapping, header2col, date_col, date_c, transforms=None):
+    """ex: 导出中命中已有 ID 的行，index 为 Excel 行号且不重复；返回变化的单元格"""
+    updates = []
+    phase = snap.loc[ex.index, header2col["Phase"]].fillna("").astype(str)
+    ex = ex[~phase.str.contains("|".join(CLOSED_PHASES)).values]
+
+    # 同一列可能被多个源字段映射，后出现的非空值覆盖前面的
+    incoming = {}
+    if date_c and date_col in ex.columns:
+        # date_col 已由 _normalize_dates 解析好，解析不了的原文不更新已有行
+        raw = ex[date_col].astype(object)
+        raw = raw[[isinstance(v, datetime) for v in raw]]
+        incoming[date_c] = raw.reindex(ex.index)
+    pairs, _ = _compile_mapping(mapping, transforms)
+    for nk, ok, fns in pairs:
+        c = header2col.get(ok)
+        if nk == date_col or ok == "Function" or not c or nk not in ex.columns:
+            continue
+        val = ex[nk].astype(object)
+        val = _apply_transforms(val.mask(_blank_mask(val)), fns)
+        prev = incoming.get(c)
+        incoming[c] = val if prev is None else val.combine_first(prev)
+
+    for c, val in incoming.items():
+        val = val.dropna().astype(object)
+        changed = val[snap.loc[val.index, c].ne(val).values]
+        fmt = DATE_FORMAT if c == date_c else None
+        updates.extend((r, c, v, fmt) for r, v in changed.items())
+        snap.loc[changed.index, c] = changed
+
+    # 更新 Root cause via patterns
+    if "Owner" in header2col and "Root cause" in header2col and len(ex):
+        rc_c  = header2col["Root cause"]
+        cause = _classify_column(snap.loc[ex.index, header2col["Owner"]], owner_patterns).dropna()
+        changed = cause[snap.loc[cause.index, rc_c].ne(cause).values]
+        updates.extend((r, rc_c, v, None) for r, v in changed.items())
+        snap.loc[changed.index, rc_c] = changed
+    return updates
+
+
+def _merge_frames(snap, df_new, mapping, header2col, headers, id_key, date_col, transforms=None):
+    """
+    按 ID 把 df_new 与表快照一次性对齐，逐列算出变化掩码。
+    返回:
+      updates: [(row, col, value, number_format)]  已有行中真正变化的单元格
+      appends: [(new_id, [按表头顺序的值])]        需要追加的新行（保持导出顺序）
+    snap 会就地更新为合并后的值。
+    """
+    ids = df_new[id_key] if id_key in df_new.columns else pd.Series(None, index=df_new.index, dtype=object)
+    valid = ids.notna() & ids.astype(bool)
+    ids = ids[valid]
+
+    # 已有ID→行（重复 ID 以最后一行为准）
+    key = snap[header2col['ID']]
+    key = key[key.notna() & key.astype(bool)]
+    id2row = pd.Series(key.index, index=pd.Index(key.values, dtype=object))
+    id2row = id2row[~id2row.index.duplicated(keep="last")]
+    hit_rows = ids.map(id2row)
+
+    date_hdr = mapping.get(date_col)
+    updates  = []
+
+    # —— 已有行：跳过已关闭的，逐列比对 ——
+    # 导出中重复的 ID 按出现次序分批处理，保证与逐行更新的结果一致
+    hit = hit_rows.dropna().astype(int)
+    date_c = header2col.get(date_hdr) if date_col else None
+    for _, batch in hit.groupby(hit.groupby(hit.values).cumcount().values):
+        updates.extend(_merge_existing(snap, df_new.loc[batch.index].set_axis(batch.values),
+                                       mapping, header2col, date_col, date_c, transforms))
+
+    # —— 新增行：按表头一次性构造整列 ——
+    new = df_new.loc[hit_rows.index[hit_rows.isna()]]
+    _, first = _compile_mapping(mapping, transforms)
+
+    cols = {}
+    for idx, hdr in enumerate(headers, start=1):
+        nk, fns = first.get(hdr, (None, ()))
+        if nk is None or nk not in new.columns:
+            cols[idx] = pd.Series("", index=new.index, dtype=object)
+            continue
+        val   = new[nk].astype(object)
+        blank = _blank_mask(val)
+        if fns:
+            val = _apply_transforms(val.mask(blank), fns)
+        cols[idx] = val.mask(blank, "")
+    frame = pd.DataFrame(cols, index=new.index, dtype=object)
+
+    # 新增 Function / Root cause via patterns
+    for src, dst, patterns in (("Found in function", "Function", fund_patterns),
+                               ("Owner", "Root cause", owner_patterns)):
+        if src in header2col and dst in header2col and len(frame):
+            hit_name = _classify_column(frame[header2col[src]], patterns)
+            frame[header2col[dst]] = hit_name.where(hit_name.notna(), frame[header2col[dst]])
+
+    appends = list(zip(ids[new.index].tolist(), frame.values.tolist()))
+    return updates, appends
+
+
+def _formula_templates(header2col):
+    """
+    按当前表头把 formula_columns 编译成 [(列号, 只剩 {row} 的模板)]；
+    目标列或公式引用的列不存在时跳过该列。
+    """
+    out = []
+    for target, formula in formula_columns.items():
+        col  = next((header2col[h] for h in target.split("|") if header2col.get(h)), None)
+        refs = [h for h in re.findall(r"\{([^{}]+)\}", formula) if h != "row"]
+        if not col or any(not header2col.get(h) for h in refs):
+            continue
+        tpl = re.sub(r"\{([^{}]+)\}",
+                     lambda m: m.group(0) if m.group(1) == "row" else get_column_letter(header2col[m.group(1)]),
+                     formula)
+        out.append((col, tpl))
+    return out
+
+
+def _write_formula_columns(ws, header2col, first_row, last_row):
+    """给 first_row..last_row 写公式列（平时只写新增行，repair-formulas 时写全表）"""
+    for col, tpl in _formula_templates(header2col):
+        for r in range(first_row, last_row + 1):
+            ws.cell(r, col).value = tpl.replace("{row}", str(r))
+
+
+# === 列式工单库：settings.store = "Y" 时作为数据正本，汇总表由它渲染 ===
+# 时间类的值以 ISO 文本存，另在 cell_types 里记下类型，读回时还原
+_STORE_TYPES = {
+    'datetime':  (datetime,  datetime.fromisoformat),
+    'date':      (dt_date,   dt_date.fromisoformat),
+    'time':      (dt_time,   dt_time.fromisoformat),
+    'timedelta': (timedelta, lambda v: timedelta(seconds=float(v))),
+}
+
+
+def _store_value(v):
+    """写入 SQLite 前把 numpy 标量转成 Python 类型，时间类转成文本；返回 (值, 类型名或 None)"""
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return None, None
+    if isinstance(v, np.generic):
+        v = v.item()
+    for kind, (cls, _) in _STORE_TYPES.items():
+        if isinstance(v, cls):
+            return (v.total_seconds() if kind == 'timedelta' else v.isoformat()), kind
+    return v, None
+
+
+def _store_save(headers, values, fills, links, rows=None):
+    """
+    写回工单库：tickets 按列存值（列不声明类型，数字/文本原样保存），
+    fills / links 只存有填充色、有超链接的单元格。
+    rows 为 None 时整库重写；否则只删除并重写这些行（不在 values 里的行即被删除）。
+    """
+    if rows is None:
+        keep = values.index
+    else:
+        keep = values.index.intersection(pd.Index(rows))
+    vals = values.loc[keep]
+
+    data, kinds = [], []
+    for r, row in zip(vals.index.tolist(), vals.values.tolist()):
+        out = [r]
+        for c, v in zip(vals.columns, row):
+            v, kind = _store_value(v)
+            out.append(v)
+            if kind:
+                kinds.append((r, c, kind))
+        data.append(out)
+    stacked = fills.loc[keep].stack().dropna()
+    cells   = [(r, c, v) for (r, c), v in stacked.items()]
+    urls    = [(r, c, v) for (r, c), v in links.items() if r in keep]
+
+    with closing(sqlite3.connect(STORE_DB)) as conn, conn:
+        if rows is None:
+            cols = [f"c{c}" for c in values.columns]
+            for t in ('tickets', 'columns', 'cell_types', 'fills', 'links'):
+                conn.execute(f"DROP TABLE IF EXISTS {t}")
+            conn.execute(f"CREATE TABLE tickets (row INTEGER PRIMARY KEY, {', '.join(cols)})")
+            conn.execute("CREATE TABLE columns (col INTEGER PRIMARY KEY, header TEXT)")
+            for t, extra in (('cell_types', 'kind TEXT'), ('fills', 'rgb TEXT'), ('links', 'url TEXT')):
+                conn.execute(f"CREATE TABLE {t} (row INTEGER, col INTEGER, {extra})")
+                conn.execute(f"CREATE INDEX {t}_row ON {t} (row)")
+            conn.executemany("INSERT INTO columns VALUES (?, ?)", list(zip(values.columns.tolist(), headers)))
+        else:
+            gone = [(int(r),) for r in rows]
+            for t in ('tickets', 'cell_types', 'fills', 'links'):
+                conn.executemany(f"DELETE FROM {t} WHERE row=?", gone)
+        conn.executemany(f"INSERT INTO tickets VALUES ({', '.join('?' * (len(values.columns) + 1))})", data)
+        conn.executemany("INSERT INTO cell_types VALUES (?, ?, ?)", kinds)
+        conn.executemany("INSERT INTO fills VALUES (?, ?, ?)", cells)
+        conn.executemany("INSERT INTO links VALUES (?, ?, ?)", urls)
+
+
+def _store_load():
+    """读出 (headers, values, fills, links)；values / fills 的 index 为 Excel 行号，columns 为列号"""
+    with closing(sqlite3.connect(STORE_DB)) as conn:
+        meta = conn.execute("SELECT col, header FROM columns ORDER BY col").fetchall()
+        rows = conn.execute("SELECT * FROM tickets ORDER BY row").fetchall()
+        kinds = conn.execute("SELECT row, col, kind FROM cell_types").fetchall()
+        fill_rows = conn.execute("SELECT row, col, rgb FROM fills").fetchall()
+        links = {(r, c): url for r, c, url in conn.execute("SELECT row, col, url FROM links")}
+
+    cols    = [c for c, _ in meta]
+    headers = [h for _, h in meta]
+    index   = [row[0] for row in rows]
+    pos_r   = {r: i for i, r in enumerate(index)}
+    pos_c   = {c: i for i, c in enumerate(cols)}
+
+    arr = np.empty((len(rows), len(cols)), dtype=object)
+    arr[:] = [row[1:] for row in rows] if rows else arr
+    for r, c, kind in kinds:
+        i, j = pos_r[r], pos_c[c]
+        arr[i, j] = _STORE_TYPES[kind][1](arr[i, j])
+    fill_arr = np.full((len(rows), len(cols)), None, dtype=object)
+    for r, c, rgb in fill_rows:
+        fill_arr[pos_r[r], pos_c[c]] = rgb
+    values = pd.DataFrame(arr, index=index, columns=cols, dtype=object)
+    fills  = pd.DataFrame(fill_arr, index=index, columns=cols, dtype=object)
+    return headers, values, fills, links
+
+
+def _changed_rows(before, after):
+    """两张同列的 DataFrame 中值有差异的行号（含新增 / 删除的行）"""
+    common = before.index.intersection(after.index)
+    a, b = before.loc[common], after.loc[common]
+    same = (a == b) | (a.isna() & b.isna())
+    rows = set(common[~same.all(axis=1).values])
+    return rows | set(before.index.difference(after.index)) | set(after.index.difference(before.index))
+
+
+def _store_ready():
+    if not os.path.exists(STORE_DB):
+        return False
+    with closing(sqlite3.connect(STORE_DB)) as conn:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name='tickets'").fetchone() is not None
+
+
+def _store_seed(orig_fp):
+    """首次启用时从汇总表导入一次：值、纯色填充、超链接"""
+    wb = load_workbook(orig_fp)
+    ws = wb[sheet]
+    trim_trailing_blank_rows(ws)
+    headers = [ws.cell(1, c).value for c in range(1, ws.max_column + 1)]
+    values  = _snapshot_sheet(ws)
+    fills   = pd.DataFrame(None, index=values.index, columns=values.columns, dtype=object)
+    links   = {}
+    for (r, c), cell in ws._cells.items():
+        if r == 1 or r not in fills.index:
+            continue
+        pf = cell.fill
+        if getattr(pf, 'patternType', None) == "solid":
+            fills.at[r, c] = pf.fgColor.rgb
+        if cell.hyperlink is not None and cell.hyperlink.target:
+            links[(r, c)] = cell.hyperlink.target
+    _store_save(headers, values, fills, links)
+    print(f"  工单库已从汇总表初始化：{len(values)} 行 → {STORE_DB}")
+
+
+def _merge_into_frames(headers, snap, fills, links, job, formats=None):
+    """
+    与 update_excel 相同的合并规则，但全部在 DataFrame 上完成（store 模式和 dry-run 共用）。
+    snap / fills 的 index 为 Excel 行号、columns 为列号；返回合并后的 (snap, fills, links, 改动格数, 新增行数)。
+    给了 formats（dict）时，把 update_excel 会设置的数字格式按 (行, 列) 记进去。
+    """
+    header2col = {h: c for c, h in enumerate(headers, start=1)}
+    id_col     = header2col['ID']
+    source_key = job["source_key"]
+    id2url_new = job["id2url_new"]
+
+    if job["clear_old"] == "Y":
+        fills = fills.where(~fills.isin(_managed_colors(highlight_colors)), None)
+
+    updates, appends = _merge_frames(snap, job["df_new"], job["mapping"], header2col, headers,
+                                     job["id_key"], job["date_col"], job["transforms"])
+    for r, c, _, fmt in updates:
+        fills.at[r, c] = "00" + UPDATE_RGB
+        if fmt and formats is not None:
+            formats[(r, c)] = fmt
+
+    # 新增行接在最后一个有 ID 的行后面（与 update_excel 一样逐行占位，空值的格保留原填充），
+    # 其后没有 ID 的行（备注、合计等）原样保留
+    has_id   = snap[id_col].notna() & snap[id_col].ne("")
+    last_row = int(has_id[has_id].index.max()) if has_id.any() else 1
+    new_idx  = range(last_row + 1, last_row + 1 + len(appends))
+    new_vals = pd.DataFrame([vals for _, vals in appends], index=new_idx,
+                            columns=snap.columns, dtype=object)
+    old_fill = fills.reindex(index=new_idx, columns=snap.columns).astype(object)
+    old_fill = old_fill.where(old_fill.notna(), None)
+    new_fill = pd.DataFrame(np.where(new_vals.ne("").values, "00" + NEW_RGB, old_fill.values),
+                            index=new_idx, columns=snap.columns, dtype=object)
+    date_c = header2col.get(job["mapping"].get(job["date_col"]))
+    for r, (new_id, _) in zip(new_idx, appends):
+        if date_c and formats is not None and new_vals.at[r, date_c] != "":
+            formats[(r, date_c)] = DATE_FORMAT
+        url = id2url_new.get(new_id)
+        if url:
+            links[(r, id_col)] = url
+            new_fill.at[r, id_col] = None
+    oij = header2col.get("Octane or Jira")
+    if oij:
+        new_vals[oij] = source_key
+    for col, tpl in _formula_templates(header2col):
+        new_vals[col] = [tpl.replace("{row}", str(r)) for r in new_idx]
+
+    tail  = snap.index[snap.index > last_row + len(appends)]
+    snap  = pd.concat([snap.loc[:last_row], new_vals, snap.loc[tail]])
+    fills = pd.concat([fills.loc[:last_row], new_fill, fills.loc[tail]])
+    links = {k: v for k, v in links.items() if k[0] <= snap.index.max()}
+
+    # 派生列（Top issue / Rejected ticket 等，见 derived_columns）
+    _, derived_fills = _apply_derived(snap, header2col)
+    for r, c, rgb in derived_fills:
+        fills.at[r, c] = "00" + rgb
+    return snap, fills, links, len(updates), len(appends)
+
+
+def _update_store(job):
+    """store 模式下的合并：只写工单库，不打开汇总表"""
+    headers, snap, fills, links = _store_load()
+    before_v, before_f = snap.copy(), fills.copy()
+    snap, fills, links, n_upd, n_new = _merge_into_frames(headers, snap, fills, links, job)
+
+    rows = _changed_rows(before_v, snap) | _changed_rows(before_f, fills)
+    _store_save(headers, snap, fills, links, rows=rows)
+    print(f"  工单库已更新：改动 {n_upd} 格，新增 {n_new} 行，写回 {len(rows)} 行")
+
+
+_render_lock = threading.Lock()
+
+def render_store(orig_fp=None):
+    """把工单库渲染回汇总表的数据工作表：值、公式、填充、超链接；其它工作表不动"""
+    orig_fp = orig_fp or os.path.join(ORIG_DIR, paths['original_file'])
+    with _render_lock:
+        _render_store(orig_fp)
+
+
+def _date_columns(headers):
+    """
+    {汇总表列号: 该列是其 date_col 的数据源集合}：只有这些列、且行来自这些数据源
+    （按 Octane or Jira 列判断）时日期值才套 DATE_FORMAT，与直接更新汇总表一致。
+    """
+    cols = {}
+    for key, src in sources.items():
+        if src.get('date_col') and src['mapping'].get(src['date_col']) in headers:
+            cols.setdefault(headers.index(src['mapping'][src['date_col']]) + 1, set()).add(key)
+    return cols
+
+
+def _solid_rgb(cell):
+    pf = cell.fill if cell is not None and cell.has_style else None
+    return pf.fgColor.rgb if getattr(pf, 'patternType', None) == "solid" else None
+
+
+def _render_store(orig_fp):
+    """
+    把工单库逐格对到汇总表上：只改写值 / 纯色填充 / 超链接有差异的单元格，
+    其余单元格（边框、字体、数字格式等）原样保留；工单库里没有的行整行删除。
+    公式列已作为值存在工单库里（新增行入库时写入），这里不再整列重写。
+    """
+    headers, values, fills, links = _store_load()
+
+    wb, ws, ctx = _open_summary(orig_fp)
+    before = _journal_state(ws)
+    for c, h in enumerate(headers, start=1):
+        if ws.cell(1, c).value != h:
+            _journal_touch(before, ws, [(1, c)])
+            ws.cell(1, c).value = h
+    keep = set(values.index.tolist())
+    dropped = [k for k in ws._cells if k[0] > 1 and k[0] not in keep]
+    _journal_touch(before, ws, dropped)
+    for key in dropped:
+        del ws._cells[key]
+
+    date_cols  = _date_columns(headers)
+    oij_col    = headers.index("Octane or Jira") + 1 if "Octane or Jira" in headers else None
+    cols       = values.columns.tolist()
+    fill_cache = {}
+    n_cells    = 0
+    for r, row, row_fills in zip(values.index.tolist(), values.values.tolist(), fills.values.tolist()):
+        src_key = row[cols.index(oij_col)] if oij_col in cols else None
+        for c, v, rgb in zip(cols, row, row_fills):
+            cell = ws._cells.get((r, c))
+            old_v   = cell.value if cell is not None else None
+            old_url = cell.hyperlink.target if cell is not None and cell.hyperlink is not None else None
+            url     = links.get((r, c))
+            same_v  = old_v == v or (old_v in (None, "") and v in (None, ""))
+            if same_v and url == old_url and _solid_rgb(cell) == rgb:
+                continue
+            n_cells += 1
+            _journal_touch(before, ws, [(r, c)])
+            cell = ws.cell(r, c)
+            if not same_v:
+                cell.value = v
+                if isinstance(v, datetime) and c in date_cols and (oij_col is None or src_key in date_cols[c]):
+                    cell.number_format = DATE_FORMAT
+            if url != old_url:
+                cell.hyperlink = url
+                if url:
+                    cell.style = "Hyperlink"
+            if _solid_rgb(cell) != rgb:
+                if rgb not in fill_cache:
+                    fill_cache[rgb] = PatternFill("solid", fgColor=rgb) if rgb else PatternFill()
+                cell.fill = fill_cache[rgb]
+
+    _save_summary(wb, ctx, orig_fp)
+    print(f"✅ 已从工单库渲染汇总表 {orig_fp}（{len(values)} 行，改写 {n_cells} 格）")
+    _journal_write("render", ws, before, orig_fp)
+    if use_reports:
+        build_reports(headers, values)
+
+
+_render_timer = None
+
+def _schedule_render():
+    """去抖渲染：一段时间内多次入库只渲染一次"""
+    global _render_timer
+    if _render_timer is not None:
+        _render_timer.cancel()
+    _render_timer = threading.Timer(render_debounce, render_store)
+    _render_timer.daemon = True
+    _render_timer.start()
+    print(f"  {render_debounce}s 内无新入库则渲染汇总表")
+
+
+def flush_render():
+    """还有没到点的去抖渲染时立即渲染（命令行运行结束、监控退出前调用，守护线程不会等）"""
+    global _render_timer
+    timer, _render_timer = _render_timer, None
+    if timer is None or not timer.is_alive():
+        return
+    timer.cancel()
+    render_store()
+
+
+def _render_if_stale(orig_fp=None):
+    """启动时工单库比汇总表新（上次退出前没来得及渲染）就先渲染一次"""
+    orig_fp = orig_fp or os.path.join(ORIG_DIR, paths['original_file'])
+    if not (use_store and _store_ready() and os.path.exists(orig_fp)):
+        return
+    if os.path.getmtime(STORE_DB) > os.path.getmtime(orig_fp):
+        print("  工单库比汇总表新，先渲染汇总表")
+        render_store(orig_fp)
+
+
+def _fingerprint_db():
+    conn = sqlite3.connect(FINGERPRINT_DB)
+    conn.execute("CREATE TABLE IF NOT EXISTS fingerprint "
+                 "(source TEXT, id TEXT, hash INTEGER, PRIMARY KEY (source, id))")
+    conn.execute("CREATE TABLE IF NOT EXISTS source_state (source TEXT PRIMARY KEY, mapping TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS workbook_state (path TEXT PRIMARY KEY, size INTEGER, mtime REAL)")
+    return conn
+
+
+def _config_hash(source_key):
+    """
+    影响合并结果的全部配置：该来源的整段配置（mapping / date_col / date_format / date_tz / transforms /
+    usecols / dtype）、Function / Root cause 关键词和派生列规则；任何一项变了，指纹全部作废
+    """
+    cfg_in = [sources[source_key], fund_patterns, owner_patterns, derived_columns]
+    return hashlib.sha1(json.dumps(cfg_in, ensure_ascii=False, sort_keys=True, default=str)
+                        .encode('utf-8')).hexdigest()
+
+
+def _fingerprint_filter(df_new, source_key, mapping, id_key, orig_fp):
+    """
+    给导出中每个工单的映射字段算一个哈希，和上次成功运行记录的比对，
+    只返回哈希变了的工单和新 ID（导出里重复出现的 ID 一律保留）。
+    汇总表在上次运行后被别人改过、或影响合并结果的配置（见 _config_hash）变了时，指纹全部作废，原样返回。
+    返回 (df_new 子集, 本次的 {id: hash})
+    """
+    if not use_fingerprints or id_key not in df_new.columns:
+        return df_new, {}
+    df_new = df_new[df_new[id_key].notna() & df_new[id_key].astype(bool)]
+    cols   = [c for c in mapping if c in df_new.columns]
+    hashes = pd.Series(pd.util.hash_pandas_object(df_new[cols], index=False).values.view('int64'),
+                       index=df_new.index)
+    ids    = df_new[id_key].astype(str)
+    fps    = dict(zip(ids, hashes.tolist()))
+
+    with closing(_fingerprint_db()) as conn:
+        row = conn.execute("SELECT mapping FROM source_state WHERE source=?", (source_key,)).fetchone()
+        wb_state = conn.execute("SELECT size, mtime FROM workbook_state WHERE path=?", (orig_fp,)).fetchone()
+        st = os.stat(orig_fp) if os.path.exists(orig_fp) else None
+        if (row is None or row[0] != _config_hash(source_key)
+                or st is None or wb_state != (st.st_size, st.st_mtime)):
+            return df_new, fps
+        known = dict(conn.execute("SELECT id, hash FROM fingerprint WHERE source=?", (source_key,)))
+
+    stored  = ids.map(known)
+    changed = stored.isna() | stored.ne(hashes) | ids.duplicated(keep=False)
+    return df_new[changed.values], fps
+
+
+def _fingerprint_commit(source_key, fps, orig_fp):
+    """本次运行成功后记录指纹，以及汇总表此刻的大小/修改时间"""
+    if not use_fingerprints:
+        return
+    st = os.stat(orig_fp)
+    with closing(_fingerprint_db()) as conn, conn:
+        conn.executemany("INSERT OR REPLACE INTO fingerprint VALUES (?, ?, ?)",
+                         [(source_key, k, v) for k, v in fps.items()])
+        conn.execute("INSERT OR REPLACE INTO source_state VALUES (?, ?)",
+                     (source_key, _config_hash(source_key)))
+        conn.execute("INSERT OR REPLACE INTO workbook_state VALUES (?, ?, ?)",
+                     (orig_fp, st.st_size, st.st_mtime))
+
+
+# === 变更日志 & 回滚 ===
+# 旧版日志表没有的列：数字格式、超链接、改动前单元格是否存在（NULL 表示旧记录，回滚时按旧规则处理）
+_JOURNAL_EXTRA = (("old_fmt", "TEXT"), ("new_fmt", "TEXT"), ("old_link", "TEXT"), ("new_link", "TEXT"),
+                  ("existed", "INTEGER"))
+
+
+def _journal_db():
+    conn = sqlite3.connect(JOURNAL_DB)
+    conn.execute("CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "ts TEXT, action TEXT, workbook TEXT, cells INTEGER)")
+    conn.execute("CREATE TABLE IF NOT EXISTS journal (run INTEGER, sheet TEXT, row INTEGER, col INTEGER, "
+                 "old, old_kind TEXT, new, new_kind TEXT, old_fill TEXT, new_fill TEXT)")
+    have = {row[1] for row in conn.execute("PRAGMA table_info(journal)")}
+    for name, kind in _JOURNAL_EXTRA:
+        if name not in have:
+            conn.execute(f"ALTER TABLE journal ADD COLUMN {name} {kind}")
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_run ON journal (run)")
+    return conn
+
+
+def _journal_state(ws):
+    """
+    开始记一个 run：返回空的登记表 {(行, 列): 改动前状态}，没开变更日志时返回 None。
+    改写单元格的地方先用 _journal_touch 登记要动的格，_journal_write 只比对登记过的格，不再整表比对。
+    """
+    return {} if use_journal else None
+
+
+def _cell_state(cell):
+    """单元格的 (值, fillId, numFmtId, 超链接)；单元格不存在时为 None"""
+    if cell is None:
+        return None
+    return (cell._value,
+            cell._style.fillId if cell._style is not None else 0,
+            cell._style.numFmtId if cell._style is not None else 0,
+            cell._hyperlink.target if cell._hyperlink is not None else None)
+
+
+def _journal_touch(journal, ws, keys):
+    """改写 keys 这些单元格之前调用：第一次登记时记下改动前状态；journal 为 None（没开变更日志）时什么都不做"""
+    if journal is None:
+        return
+    cells = ws._cells
+    for key in keys:
+        if key not in journal:
+            journal[key] = _cell_state(cells.get(key))
+
+
+def _fill_rgb(wb, fill_id):
+    pf = wb._fills[fill_id] if fill_id < len(wb._fills) else None
+    return pf.fgColor.rgb if getattr(pf, 'patternType', None) == "solid" else None
+
+
+def _fmt_code(wb, fmt_id):
+    """numFmtId → 格式字符串（内置格式或工作簿自定义格式）"""
+    if fmt_id < BUILTIN_FORMATS_MAX_SIZE:
+        return BUILTIN_FORMATS.get(fmt_id, "General")
+    return wb._number_formats[fmt_id - BUILTIN_FORMATS_MAX_SIZE]
+
+
+def _journal_write(action, ws, before, orig_fp):
+    """保存成功后调用：把 before 里登记过的格中真正变了的作为一个 run 追加到日志，返回 run 号"""
+    if before is None:
+        return None
+    wb    = ws.parent
+    blank = (None, 0, 0, None)
+    changes = []
+    for key in sorted(before):
+        old = before[key] or blank
+        new = _cell_state(ws._cells.get(key)) or blank
+        if old == new:
+            continue
+        old_v, old_f, old_n, old_l = old
+        new_v, new_f, new_n, new_l = new
+        old_rgb, new_rgb = _fill_rgb(wb, old_f), _fill_rgb(wb, new_f)
+        old_fmt, new_fmt = _fmt_code(wb, old_n), _fmt_code(wb, new_n)
+        if old_v == new_v and old_rgb == new_rgb and old_fmt == new_fmt and old_l == new_l:
+            continue
+        changes.append((key, _store_value(old_v), _store_value(new_v), old_rgb, new_rgb,
+                        old_fmt, new_fmt, old_l, new_l, int(before[key] is not None)))
+
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    print(f"[{ts}] 开始更新: {new_fp}")
+    with closing(_journal_db()) as conn, conn:
+        run = conn.execute("INSERT INTO runs (ts, action, workbook, cells) VALUES (?, ?, ?, ?)",
+                           (ts, action, orig_fp, len(changes))).lastrowid
+        conn.executemany("INSERT INTO journal (run, sheet, row, col, old, old_kind, new, new_kind, old_fill, "
+                         "new_fill, old_fmt, new_fmt, old_link, new_link, existed) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         [(run, ws.title, r, c, o, ok, n, nk, of, nf, ofm, nfm, ol, nl, ex)
+                          for (r, c), (o, ok), (n, nk), of, nf, ofm, nfm, ol, nl, ex in changes])
+    print(f"  变更日志：run {run}，{len(changes)} 个单元格（回滚：rollback {run}）")
+    return run
+
+
+def list_runs(limit=20):
+    if not os.path.exists(JOURNAL_DB):
+        print("还没有变更日志")
+        return
+    with closing(_journal_db()) as conn:
+        for run, ts, action, cells in conn.execute(
+                "SELECT run, ts, action, cells FROM runs ORDER BY run DESC LIMIT ?", (limit,)):
+            print(f"  run {run:<5} {ts}  {cells:>7} 格  {action}")
 
+
+def rollback(run):
+    """
+    把某次 run 改过的单元格还原成旧值 / 旧填充色 / 旧数字格式 / 旧超链接，该 run 新建的单元格直接删掉；
+    只在这些单元格此刻仍是该 run 写入的状态时执行，之后被别的 run 或手工改过的单元格会被列出来并放弃回滚。
+    回滚本身也记成一个 run。
+    """
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    with closing(_journal_db()) as conn:
+        meta = conn.execute("SELECT workbook, action FROM runs WHERE run=?", (run,)).fetchone()
+        rows = conn.execute("SELECT sheet, row, col, old, old_kind, new, new_kind, old_fill, new_fill, "
+                            "old_fmt, new_fmt, old_link, new_link, existed FROM journal WHERE run=?",
+                            (run,)).fetchall()
+    if meta is None:
+        print(f"❌ 变更日志里没有 run {run}")
+        return False
+    orig_fp, action = meta
+    if use_store:
+        print("⚠️ 工单库模式：回滚只还原汇总表，工单库不变，下次渲染会重新写回")
+
+    def parse(v, kind):
+        return _STORE_TYPES[kind][1](v) if kind else v
+
+    wb, ws, ctx = _open_summary(orig_fp)
+    before = _journal_state(ws)
+    _journal_touch(before, ws, [(r, c) for _, r, c, *_ in rows])
+    conflicts = []
+    for sheet_name, r, c, _, _, new, new_kind, _, new_fill, _, new_fmt, _, new_link, existed in rows:
+        cell = ws._cells.get((r, c))
+        styled = cell is not None and cell._style is not None
+        cur_v = cell.value if cell is not None else None
+        cur_f = _fill_rgb(wb, cell._style.fillId) if styled else None
+        new   = parse(new, new_kind)
+        changed = not (cur_v == new or (cur_v in (None, "") and new in (None, ""))) or cur_f != new_fill
+        if existed is not None:                      # 旧版日志没有记格式和超链接，不比
+            cur_fmt  = _fmt_code(wb, cell._style.numFmtId if styled else 0)
+            cur_link = cell._hyperlink.target if cell is not None and cell._hyperlink is not None else None
+            changed = changed or cur_fmt != new_fmt or cur_link != new_link
+        if changed:
+            conflicts.append((r, c))
+    if conflicts:
+        r, c = conflicts[0]
+        print(f"❌ run {run} 之后有 {len(conflicts)} 个单元格又被改过（如 {get_column_letter(c)}{r}），未回滚")
+        return False
+
+    fill_cache = {None: PatternFill()}
+    for _, r, c, old, old_kind, _, _, old_fill, new_fill, old_fmt, new_fmt, old_link, new_link, existed in rows:
+        # 该 run 之前不存在的格（如追加行）直接删掉，超链接随之去掉；旧版日志按“原本无值无填充”判断
+        if existed == 0 or (existed is None and old is None and old_fill is None):
+            ws._cells.pop((r, c), None)
+            continue
+        cell = ws.cell(r, c)
+        cell.value = parse(old, old_kind)
+        if existed is not None and old_link != new_link:
+            cell.hyperlink = old_link
+        if old_fill != new_fill:
+            if old_fill not in fill_cache:
+                fill_cache[old_fill] = PatternFill("solid", fgColor=old_fill)
+            cell.fill = fill_cache[old_fill]
+        if existed is not None and old_fmt != new_fmt:
+            cell.number_format = old_fmt
+
+    _save_summary(wb, ctx, orig_fp)
+    print(f"[{ts}] 已回滚 run {run}（{action}）：{len(rows)} 个单元格")
+    _journal_write(f"rollback {run}", ws, before, orig_fp)
+    wait_until_ready(orig_fp, "保存后刷新 Pivot")
+    _refresh_pivots_in_workbook(orig_fp, sheet)
+    wait_until_ready(orig_fp, "刷新 Pivot 后")
+    _build_reports_from(ws)
+    return True
+
+
+def _source_of(new_fp):
+    """按所在文件夹判断来源，未识别返回 None"""
     folder = os.path.basename(os.path.dirname(new_fp))
     if folder == os.path.basename(JIRA_DIR):
-        source_key  = "Jira"
-        jira_flag   = 'Y'
-        octane_flag = 'N'
-    elif folder == os.path.basename(OCTANE_DIR):
-        source_key  = "Octane"
-        jira_flag   = 'N'
-        octane_flag = 'Y'
-    else:
-        print(f" → 未识别来源 ({folder})，跳过。")
-        return
+        return "Jira"
+    if folder == os.path.basename(OCTANE_DIR):
+        return "Octane"
+    return None
 
-    # 原表与新版输出路径
-    orig_fp  = os.path.join(ORIG_DIR, paths['original_file'])
-    template = paths['updated_file']
-    filename = template.format(time=ts, jira=jira_flag, octane=octane_flag)
-    upd_fp   = os.path.join(os.path.dirname(orig_fp), filename)#
 
+def _prepare_source(new_fp, ts, commit=True):
+    """
+    读取一份导出并做指纹过滤，返回合并所需的 job 字典；
+    来源未识别或导出与上次相比没有变化时返回 None。
+    commit=False（dry-run）时什么都不写。
+    """
+    source_key = _source_of(new_fp)
+    if source_key is None:
+        folder = os.path.basename(os.path.dirname(new_fp))
+        print(f" → 未识别来源 ({folder})，跳过。")
+        return None
+
+    orig_fp   = os.path.join(ORIG_DIR, paths['original_file'])
     src_cfg   = sources[source_key]
     read_meth = src_cfg['read_method']
     date_col  = src_cfg.get('date_col')
     mapping   = src_cfg['mapping']
 
-    # 读取 df_new
-    df_new = pd.read_excel(new_fp) if read_meth=="excel" else pd.read_csv(new_fp)
+    # 读取 df_new（Excel 一次解析，同时拿到 ID 列的超链接）
+    id2url_new = {}
+    if read_meth=="excel":
+        df_new, id2url_new = _read_excel_with_links(new_fp)
+    else:
+        df_new = _read_csv_typed(new_fp, src_cfg)
+
+    # 日期列整列解析一次
+    df_new, bad_dates = _normalize_dates(df_new, src_cfg)
+
+    id_key = next(k for k,v in mapping.items() if v=="ID")
+
+    # 只让指纹变化的工单和新 ID 进入合并；完全没变的导出不用打开原表
+    record_fp = STORE_DB if use_store else orig_fp
+    df_new, fps = _fingerprint_filter(df_new, source_key, mapping, id_key, record_fp)
+
+    # 解析不了的日期只报告真正要合并的行，指纹没变的工单上次已经报过
+    _report_bad_dates(bad_dates.loc[bad_dates.index.intersection(df_new.index)],
+                      src_cfg, source_key, new_fp, ts, commit)
+    if df_new.empty:
+        print(f"[{ts}] 导出与上次运行相比没有变化，跳过更新")
+        if commit:
+            _fingerprint_commit(source_key, fps, record_fp)
+            _manifest_record([new_fp])
+        return None
+    print(f"  待合并工单 {len(df_new)} 条")
 
     #添加判定，如果是Octane先清除之前的颜色
     clear_old = "Y" if src_cfg["pattern"] == "Octane" else "N"#自定义时请注释掉这一行
     print(f"判断是否清洗就更新颜色：",clear_old)
 
-    # 打开原表
-    wb = load_workbook(orig_fp)
-    ws = wb[sheet]
+    return {
+        "path": new_fp, "source_key": source_key, "mapping": mapping, "date_col": date_col,
+        "transforms": src_cfg.get('transforms'),
+        "df_new": df_new, "id2url_new": id2url_new, "id_key": id_key,
+        "fps": fps, "record_fp": record_fp, "clear_old": clear_old,
+    }
+
+
+def _apply_source(ws, job, journal=None):
+    """把一份导出（job）合并进已打开的汇总 sheet，不保存；journal 为变更日志的登记表（见 _journal_touch）"""
+    source_key = job["source_key"]
+    mapping    = job["mapping"]
+    date_col   = job["date_col"]
+    id2url_new = job["id2url_new"]
 
     # 清除旧高亮
-    if clear_old == "Y":
-        green = {"8ED973","008ED973","FF8ED973"}
-        blue  = {'FFADD8E6','00ADD8E6','ADD8E6'}
-        gray  = {'FFC0C0C0','00C0C0C0','C0C0C0'}
-        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, max_col=ws.max_column):
-            for cell in row:
-                pf = cell.fill
-                if getattr(pf,'patternType',None)=="solid":
-                    argb = pf.fgColor.rgb or pf.fgColor.value
-                    if argb in green|blue|gray:
-                        cell.fill = PatternFill()
+    if job["clear_old"] == "Y":
+        clear_highlight(ws, highlight_colors, journal)
 
-    trim_trailing_blank_rows(ws)
+    trim_trailing_blank_rows(ws, journal)
     #重置所有行高
     for r in range(1,ws.max_row +1):
         ws.row_dimensions[r].height = None
@@ -201,247 +2019,801 @@ def update_excel(new_fp):
     id_col     = header2col['ID']
     headers    = list(header2col.keys())
 
-    # 已有ID→行
-    id2row = {
-        ws.cell(r,id_col).value: r
-        for r in range(2, ws.max_row+1)
-        if ws.cell(r,id_col).value
-    }
-
-    # 如果是 Excel，提取超链接
-    id2url_new = {}
-    if read_meth=="excel":
-        tmpwb = load_workbook(new_fp)
-        nws   = tmpwb.active
-        cid   = next((c for c in range(1,nws.max_column+1)
-                      if nws.cell(1,c).value=="ID"), None)
-        if cid:
-            for r in range(2, nws.max_row+1):
-                cell = nws.cell(r,cid)
-                if cell.hyperlink:
-                    id2url_new[cell.value] = cell.hyperlink.target
-
     last_row      = find_last_data_row(ws, id_col)
     original_last = last_row
 
-    update_fill = PatternFill("solid", fgColor="ADD8E6")
-    new_fill    = PatternFill("solid", fgColor="8ED973")
-    gray_fill   = PatternFill("solid", fgColor="C0C0C0")
+    update_fill = PatternFill("solid", fgColor=UPDATE_RGB)
+    new_fill    = PatternFill("solid", fgColor=NEW_RGB)
+
+    # 4. 更新 or 追加：整表快照后按 ID 一次性比对，只回写真正变化的单元格
+    snap = _snapshot_sheet(ws)
+    updates, appends = _merge_frames(snap, job["df_new"], mapping, header2col, headers,
+                                     job["id_key"], date_col, job["transforms"])
+    # 变更日志只登记这次要写的格：改动的格 + 新增行整行（公式 / 来源列也在其中）
+    _journal_touch(journal, ws, [(r, c) for r, c, _, _ in updates])
+    _journal_touch(journal, ws, [(r, c) for r in range(last_row + 1, last_row + 1 + len(appends))
+                                 for c in range(1, len(headers) + 1)])
+
+    for r, c, val, fmt in updates:
+        cell = ws.cell(r, c)
+        cell.value = val
+        cell.fill  = update_fill
+        if fmt:
+            cell.number_format = fmt
+
+    # —— 新增行，填值并染粉色 ——
+    date_hdr = mapping.get(date_col)
+    new_style  = _style_array(ws.parent, fill=new_fill)
+    date_style = _style_array(ws.parent, fill=new_fill, number_format=DATE_FORMAT)
+    row_styles = [date_style if hdr == date_hdr else new_style for hdr in headers]
+    for new_id, vals in appends:
+        last_row += 1
+        _append_row(ws, last_row, vals, row_styles)
+
+        # 新增 ID 超链接，继承自Octane的表
+        url = id2url_new.get(new_id)
+        if url:
+            cell = ws.cell(last_row, id_col)
+            cell.hyperlink = url
+            cell.style     = "Hyperlink"
 
-    id_key = next(k for k,v in mapping.items() if v=="ID")
+    # === 5. 填充公式 & 标记 Octane/Jira & 其它列 ===
+    # 只动新增行；其后没有 ID 的行（备注、合计等）不写公式 / 来源
+    max_row = ws.max_row
 
-    # 4. 更新 or 追加
-    for _, new_row in df_new.iterrows():
-        new_id = new_row.get(id_key)
-        if pd.isna(new_id) or not new_id:
-            continue
+    # 5.1 Days / Open >20 days / No TIS 公式（只写新增行，整列重建用 repair-formulas）
+    _write_formula_columns(ws, header2col, original_last + 1, last_row)
 
-        if new_id in id2row:
-            # 已有行------------------------
-            r = id2row[new_id]
-            phase_val = ws.cell(r,header2col["Phase"]).value or ""
-            if any(k in phase_val for k in ("Concluded","Closed","Resolved")):
-                continue
+    # 5.2 Octane or Jira 列（仅新增）
+    oij_idx = header2col.get("Octane or Jira")
+    if oij_idx:
+        for r in range(original_last + 1, last_row + 1):
+            ws.cell(r, oij_idx).value = source_key
 
-            # 更新日期 (Jira)
-            if date_col:
-                raw = new_row.get(date_col, "")
-                if pd.notna(raw) and raw != "":
-                    try:
-                        ts = pd.to_datetime(raw)
-                        dt = ts.to_pydatetime()
-                        c  = header2col[mapping[date_col]]
-                        cell = ws.cell(r,c)
-                        if cell.value != dt:
-                            cell.value         = dt
-                            cell.number_format = "m/d/yyyy h:mm:ss AM/PM"
-                            cell.fill          = update_fill
-                    except:
-                        pass
-
-            # 更新其他字段 (跳过 Function)
-            for nk, ok in mapping.items():
-                if nk==date_col or ok=="Function":
-                    continue
-                val = new_row.get(nk, "")
-                if pd.isna(val) or val=="":
-                    continue
-                if ok == "Involved I-Step":
-                    s = str(val)
-                    # 1) 如果以 G070 或 U006 开头，沿用原逻辑
-                    if s.startswith("G070") or s.startswith("U006"):
-                        val = "NA05" + s[4:]
-                    else:
-                        # 2) 否则尝试提取全角或半角括号内的编号，如 “（25-07-452 ATS+3...）”
-                        m = re.search(r'[（(]([\d-]+)', s)
-                        if m:
-                            code = m.group(1)               # e.g. "25-07-452"
-                            val = f"NA05-{code}"           # 结果 "NA05-25-07-452"
-
-                c = header2col.get(ok)
-                if c:
-                    cell = ws.cell(r,c)
-                    if cell.value != val:
-                        cell.value = val
-                        cell.fill  = update_fill
-
-            # 更新 Root cause via patterns
-            if "Owner" in header2col and "Root cause" in header2col:
-                raw_ow = ws.cell(r, header2col["Owner"]).value or ""
-                ow = str(raw_ow).lower()
-                for cause, names in owner_patterns.items():
-                    if any(n.lower() in ow for n in names):
-                        cell = ws.cell(r, header2col["Root cause"])
-                        if cell.value != cause:
-                            cell.value = cause
-                            cell.fill  = update_fill
-                        break
+    # 5.3 派生列（Top issue / Rejected ticket 等，见 derived_columns）：
+    # 合并后的快照接上新增行，整表一次算完，只回写值变了的格和要染色的格
+    full = pd.concat([snap.loc[:original_last], _snapshot_sheet(ws, original_last + 1, max_row)])
+    changes, derived_fills = _apply_derived(full, header2col)
+    _journal_touch(journal, ws, [(r, c) for r, c, _ in changes] + [(r, c) for r, c, _ in derived_fills])
+    for r, c, val in changes:
+        ws.cell(r, c).value = val
+    fill_cache = {}
+    for r, c, rgb in derived_fills:
+        if rgb not in fill_cache:
+            fill_cache[rgb] = PatternFill("solid", fgColor=rgb)
+        ws.cell(r, c).fill = fill_cache[rgb]
 
-        else:
-            # —— 新增行，填值并染粉色 —— 
-            last_row += 1
-            for idx, hdr in enumerate(headers, start=1):
-                val = ""
-                for nk, ok in mapping.items():
-                    if ok == hdr:
-                        tmp = new_row.get(nk, "")
-                        if pd.notna(tmp) and tmp != "":
-                            if hdr == mapping.get(date_col):
-                                try:
-                                    ts = pd.to_datetime(tmp)
-                                    val = ts.to_pydatetime()
-                                except:
-                                    val = tmp
-                            else:
-                                val = tmp
-                            #对于 Involved I-Step的更改统一格式成NA05开头
-                            if ok == "Involved I-Step":
-                                s = str(val)
-                                # 1) 如果以 G070 或 U006 开头，沿用原逻辑
-                                if s.startswith("G070") or s.startswith("U006"):
-                                    val = "NA05" + s[4:]
-                                else:
-                                    # 2) 否则尝试提取全角或半角括号内的编号，如 “（25-07-452 ATS+3...）”
-                                    m = re.search(r'[（(]([\d-]+)', s)
-                                    if m:
-                                        code = m.group(1)               # e.g. "25-07-452"
-                                        val = f"NA05-{code}"           # 结果 "NA05-25-07-452"
 
-                        break
-                cell = ws.cell(last_row, idx)
-                cell.value = val
-                if val != "":
-                    cell.fill = new_fill
-                    if hdr == mapping.get(date_col):
-                        cell.number_format = "m/d/yyyy h:mm:ss AM/PM"
-
-            # 新增 ID 超链接，继承自Octane的表
-            url = id2url_new.get(new_id)
-            if url:
-                cell = ws.cell(last_row, id_col)
-                cell.hyperlink = url
-                cell.style     = "Hyperlink"
-           
-            # 新增 Function via patterns
-            if "Found in function" in header2col and "Function" in header2col:
-                raw_fv = ws.cell(last_row, header2col["Found in function"]).value or ""
-                fv = str(raw_fv).lower()
-                for func_name, kws in fund_patterns.items():
-                    if any(kw.lower() in fv for kw in kws):
-                        cell = ws.cell(last_row, header2col["Function"])
-                        cell.value = func_name
-                        cell.fill  = new_fill
-                        break
+def update_excel(new_fp):
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"[{ts}] 开始更新: {new_fp}")
 
-            # 新增 Root cause via patterns
-            if "Owner" in header2col and "Root cause" in header2col:
-                raw_ow = ws.cell(last_row, header2col["Owner"]).value or ""
-                ow = str(raw_ow).lower()
-                for cause, names in owner_patterns.items():
-                    if any(n.lower() in ow for n in names):
-                        cell = ws.cell(last_row, header2col["Root cause"])
-                        cell.value = cause
-                        cell.fill  = new_fill
-                        break
+    job = _prepare_source(new_fp, ts)
+    if job is None:
+        return
 
-    # === 5. 填充公式 & 标记 Octane/Jira & 其它列 ===
-    max_row = ws.max_row
+    # store 模式：只写工单库，汇总表稍后统一渲染
+    if use_store:
+        _store_apply([job])
+        return
 
-    # 5.1 Days 列公式
-    d_idx  = header2col.get("Days")
-    ct_idx = header2col.get("Creation time")
-    if d_idx and ct_idx:
-        colL = get_column_letter(ct_idx)
-        for r in range(2, max_row + 1):
-            ws.cell(r, d_idx).value = f'=DATEDIF(${colL}{r},TODAY(),"D")'
+    orig_fp = os.path.join(ORIG_DIR, paths['original_file'])
+    wb, ws, ctx = _open_summary(orig_fp)
+    before = _journal_state(ws)
+    _apply_source(ws, job, before)
+    _finish_summary(wb, ws, ctx, orig_fp, [job], ts, before, f"update {os.path.basename(new_fp)}")
 
-    # 5.2 Octane or Jira 列（仅新增）
-    oij_idx = header2col.get("Octane or Jira")
-    if oij_idx:
-        for r in range(original_last + 1, max_row + 1):
-            ws.cell(r, oij_idx).value = source_key
 
-    # 5.3 Open > 20 days 列
-    o20 = header2col.get("Open >20 days") or header2col.get("Open > 20 days")
-    if o20 and d_idx:
-        dl = get_column_letter(d_idx)
-        for r in range(2, max_row + 1):
-            ws.cell(r, o20).value = f'=IF({dl}{r}>20,1,0)'
-
-    # 5.4 No TIS 列
-    nt = header2col.get("No TIS")
-    pl = header2col.get("Planned closing version")
-    ti = header2col.get("Target I-Step:")
-    if nt and pl and ti:
-        pL = get_column_letter(pl)
-        tL = get_column_letter(ti)
-        for r in range(2, max_row + 1):
-            ws.cell(r, nt).value = f'=IF(OR({pL}{r}<>"",{tL}{r}<>""),0,1)'
-
-    # 5.5 Top issue 列
-    tags_idx = header2col.get("Tags")
-    top_idx =  header2col.get("Top issue Candidiate")
-    gray_fill = PatternFill("solid", fgColor="C0C0C0")
-
-    if tags_idx and top_idx:
-        for r in range(2,max_row+1):
-            tags_val = ws.cell(r, tags_idx).value or ""
-            top_cell = ws.cell(r, top_idx)
-            top_val = top_cell.value or ""
-            if "IPN_CN_TopIssue" in tags_val:
-                if top_val == "":
-                    top_cell.value = "Yes"
-                    top_cell.fill = new_fill
-            else:
-                if top_val == "Yes":
-                    top_cell.fill = gray_fill
-    #rejected ticket
-    br_idx  = header2col.get("Blocking reason")
-    ph_idx  = header2col.get("Phase")
-    rej_idx = header2col.get("Rejected ticket")
-
-    if br_idx and ph_idx and rej_idx:
-        for r in range(2, ws.max_row + 1):
-            br_val = ws.cell(r, br_idx).value
-            ph_val = str(ws.cell(r, ph_idx).value or "")
-            ws.cell(r, rej_idx).value = 1 if (br_val not in (None, "") and "New" in ph_val) else 0
-    
-    # 保存
-    wb.save(orig_fp)
+def _store_apply(jobs):
+    orig_fp = os.path.join(ORIG_DIR, paths['original_file'])
+    if not _store_ready():
+        _store_seed(orig_fp)
+    for job in jobs:
+        _update_store(job)
+        _fingerprint_commit(job["source_key"], job["fps"], STORE_DB)
+    _manifest_record([job["path"] for job in jobs])
+    _schedule_render()
+
+
+def _finish_summary(wb, ws, ctx, orig_fp, jobs, ts, before=None, action=""):
+    """保存汇总表、记变更日志、刷新 PivotTable，成功后再记录各导出的指纹"""
+    _save_summary(wb, ctx, orig_fp)
     #print(f"[{ts}] 更新完成，保存至原表 {orig_fp}")
     print(f"[{ts}] 更新完成并保存到原表{orig_fp}，下一步更新PivotTable")
-    time.sleep(10)
+    run = _journal_write(action, ws, before, orig_fp)
+    wait_until_ready(orig_fp, "保存后刷新 Pivot")
     # -------- PivotTable 自动刷新 ----------------
     _refresh_pivots_in_workbook(orig_fp, sheet)
-    time.sleep(10)
-    
+    wait_until_ready(orig_fp, "刷新 Pivot 后")
+    _build_reports_from(ws)
+    for job in jobs:
+        _fingerprint_commit(job["source_key"], job["fps"], job["record_fp"])
+    _manifest_record([job["path"] for job in jobs], run)
+
+
+def _report_frame(headers, snap):
+    """
+    汇总表快照 → 报表用的 DataFrame（列名为表头，ID 为空的行去掉）。
+    pivot_reports.columns 按派生列规则重算公式列（Open >20 days、No TIS…），表里没有的列临时补上。
+    """
+    header2col = {h: c for c, h in enumerate(headers, start=1) if h not in (None, "")}
+    snap = snap.copy()
+    specs = pivot_reports.get('columns', [])
+    for spec in specs:
+        if spec["column"] not in header2col:
+            header2col[spec["column"]] = c = max(header2col.values(), default=0) + 1
+            snap[c] = None
+    _apply_derived(snap, header2col, specs)
+    df = pd.DataFrame({h: snap[c] for h, c in header2col.items() if c in snap.columns}, index=snap.index)
+    df = df.mask(df.isna() | df.eq(""))     # None / "" / NaN 统一成 NaN，哈希只随真实取值变化
+    return df[df["ID"].notna()] if "ID" in df.columns else df
+
+
+def _report_fields(spec):
+    fields = [spec["index"], spec.get("columns"), spec["values"]] + [c["column"] for c in spec.get("when", [])]
+    return [f for f in fields if f]
+
+
+def _pivot_report(df, spec):
+    """一张报表：按 index × columns 对 values 做 count / sum，带 Total 行列；空值归到 (blank)"""
+    data = df
+    for cond in spec.get("when", []):
+        data = data[_rule_mask(data[cond["column"]], cond)]
+    keys = [k for k in (spec["index"], spec.get("columns")) if k]
+    if data.empty:
+        return pd.DataFrame(columns=["Total"])
+    agg = spec.get("aggfunc", "count")
+    val = data[spec["values"]]
+    val = val.mask(_blank_mask(val)) if agg == "count" else pd.to_numeric(val, errors='coerce')
+    data = pd.DataFrame({**{k: data[k].mask(_blank_mask(data[k]), "(blank)").astype(str) for k in keys},
+                         "_v": val})
+    table = data.pivot_table(index=spec["index"], columns=spec.get("columns"), values="_v",
+                             aggfunc=agg, fill_value=0, margins=True, margins_name="Total")
+    if not spec.get("columns"):
+        table.columns = ["Total"]
+    return table
+
+
+def _write_report_sheet(ws, spec, table, stamp, n_rows):
+    """把一张聚合结果写成静态表：标题、数据时间、加粗灰底表头、Total 行列加粗、冻结表头"""
+    bold   = Font(bold=True)
+    header = PatternFill("solid", fgColor="D9D9D9")
+    ws.append([spec.get("title", spec["sheet"])])
+    ws.cell(1, 1).font = Font(bold=True, size=13)
+    ws.append([f"数据时间 {stamp}，工单 {n_rows} 条，{spec['values']} / {spec.get('aggfunc', 'count')}"])
+    ws.append([])
+    ws.append([spec["index"]] + [str(c) for c in table.columns])
+    for cell in ws[4]:
+        cell.font, cell.fill = bold, header
+    for idx, row in zip(table.index.tolist(), table.values.tolist()):
+        ws.append([idx] + [int(v) if float(v).is_integer() else float(v) for v in row])
+        if idx == "Total":
+            for cell in ws[ws.max_row]:
+                cell.font = bold
+    if "Total" in table.columns:
+        col = ws.max_column
+        for r in range(4, ws.max_row + 1):
+            ws.cell(r, col).font = bold
+    widths = [len(str(spec["index"]))] + [len(str(c)) for c in table.columns]
+    widths[0] = max([widths[0]] + [len(str(i)) for i in table.index])
+    for c, w in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(c)].width = min(max(w + 2, 8), 60)
+    ws.freeze_panes = "B5"
+
+
+def build_reports(headers=None, snap=None, force=False):
+    """
+    报表阶段：按 pivot_reports.reports 用 pandas 聚合汇总表数据，写成静态报表工作簿 REPORT_FP。
+    用到的列连同报表配置和当天日期（Open >20 days 随日期变化）一起算哈希，与上次相同就直接跳过。
+    不传 headers/snap 时从工单库（store 模式）或汇总表读取。
+    """
+    reports = pivot_reports.get('reports', [])
+    if not reports:
+        return
+    if headers is None:
+        if use_store:
+            headers, snap = _store_load()[:2]
+        else:
+            headers, snap = _read_snapshot(os.path.join(ORIG_DIR, paths['original_file']))
+    df = _report_frame(headers, snap)
+
+    todo = []
+    for spec in reports:
+        missing = [f for f in _report_fields(spec) if f not in df.columns]
+        if missing:
+            print(f"⚠️ 报表 “{spec['sheet']}” 用到的列不存在：{missing}，跳过")
+        else:
+            todo.append(spec)
+    if not todo:
+        return
+    needed = sorted({f for spec in todo for f in _report_fields(spec)})
+    h = hashlib.sha1(json.dumps([pivot_reports, str(dt_date.today())], ensure_ascii=False,
+                                sort_keys=True).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df[needed].astype(str), index=False).values.tobytes())
+    digest = h.hexdigest()
+    try:
+        with open(REPORT_CACHE, encoding='utf-8') as fh:
+            cached = json.load(fh).get('hash')
+    except (OSError, ValueError):
+        cached = None
+    if not force and cached == digest and os.path.exists(REPORT_FP):
+        print(f"  报表数据未变化，沿用 {REPORT_FP}")
+        return
+
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+    out = Workbook()
+    out.remove(out.active)
+    for spec in todo:
+        _write_report_sheet(out.create_sheet(spec["sheet"][:31]), spec, _pivot_report(df, spec), stamp, len(df))
+    tmp_fp = REPORT_FP + '.tmp'
+    out.save(tmp_fp)
+    os.replace(tmp_fp, REPORT_FP)
+    with open(REPORT_CACHE, 'w', encoding='utf-8') as fh:
+        json.dump({'hash': digest, 'created': stamp, 'rows': len(df)}, fh)
+    print(f"✅ 报表已生成：{REPORT_FP}（{len(todo)} 张）")
+
+
+def _build_reports_from(ws):
+    if use_reports:
+        build_reports([ws.cell(1, c).value for c in range(1, ws.max_column + 1)], _snapshot_sheet(ws))
+
+
+def _batch_order(paths_):
+    """
+    批量合并的固定顺序：会清除旧高亮的来源（Octane）排在前面，
+    这样同一批里后合并的导出的高亮不会被清掉；同来源内按修改时间、再按路径。
+    """
+    order = list(sources)
+    def key(p):
+        src = _source_of(p)
+        clears = src is not None and sources[src].get("pattern") == "Octane"
+        return (not clears, order.index(src) if src in order else len(order), os.path.getmtime(p), p)
+    ordered = sorted(paths_, key=key)
+    if ordered != list(paths_):
+        print("⚠️ 合并顺序已调整（Octane 先合并，同来源按修改时间）：" +
+              " → ".join(os.path.basename(p) for p in ordered))
+    return ordered
+
+
+def update_batch(new_fps):
+    """
+    一次合并多份导出：按 _batch_order 的顺序依次应用到同一个内存中的汇总表，
+    只保存一次、刷新一次 PivotTable。
+    """
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    new_fps = _batch_order([os.path.abspath(p) for p in new_fps])
+    print(f"[{ts}] 批量更新 {len(new_fps)} 份导出")
+
+    jobs = []
+    for fp in new_fps:
+        print(f"[{ts}] 读取: {fp}")
+        job = _prepare_source(fp, ts)
+        if job is not None:
+            jobs.append(job)
+    if not jobs:
+        print(f"[{ts}] 没有需要合并的导出")
+        return
+
+    if use_store:
+        _store_apply(jobs)
+        return
+
+    orig_fp = os.path.join(ORIG_DIR, paths['original_file'])
+    wb, ws, ctx = _open_summary(orig_fp)
+    before = _journal_state(ws)
+    for job in jobs:
+        print(f"  合并 {job['source_key']}: {os.path.basename(job['path'])}")
+        _apply_source(ws, job, before)
+    _finish_summary(wb, ws, ctx, orig_fp, jobs, ts, before,
+                    "batch " + ", ".join(os.path.basename(job['path']) for job in jobs))
+
+
+# === dry-run：只算变更集（JSON），不以写方式打开汇总表；之后可用 apply 原样应用 ===
+def _cs_value(v):
+    """变更集里的值：时间类写成 {类型: 文本}，其余原样"""
+    v, kind = _store_value(v)
+    return {kind: v} if kind else v
+
+
+def _cs_parse(v):
+    if isinstance(v, dict):
+        kind, raw = next(iter(v.items()))
+        return _STORE_TYPES[kind][1](raw)
+    return v
+
+
+def _read_snapshot(orig_fp):
+    """只读方式取数据工作表的表头和值（不加载样式），去掉末尾空行"""
+    wb = load_workbook(orig_fp, read_only=True)
+    try:
+        rows = list(wb[sheet].iter_rows(values_only=True))
+    finally:
+        wb.close()
+    ncol = max((len(r) for r in rows), default=0)
+    rows = [tuple(r) + (None,) * (ncol - len(r)) for r in rows]
+    last = len(rows)
+    while last > 1 and all(v in (None, "") for v in rows[last - 1]):
+        last -= 1
+    headers = list(rows[0]) if rows else []
+    snap = pd.DataFrame(rows[1:last], index=range(2, last + 1),
+                        columns=range(1, ncol + 1), dtype=object)
+    return headers, snap
+
+
+def plan_changes(new_fps, out_fp=None):
+    """
+    dry-run：按批量合并的顺序把导出合并到汇总表（或工单库）的内存快照上，
+    把会改的单元格、新增的 ID、需要设置的填充色和超链接写成一个 JSON 变更集，返回其路径。
+    """
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    orig_fp = os.path.join(ORIG_DIR, paths['original_file'])
+    new_fps = _batch_order([os.path.abspath(p) for p in new_fps])
+    print(f"[{ts}] dry-run {len(new_fps)} 份导出")
+
+    jobs = [job for job in (_prepare_source(fp, ts, commit=False) for fp in new_fps) if job is not None]
+    if use_store:
+        headers, snap, _, _ = _store_load()
+    else:
+        headers, snap = _read_snapshot(orig_fp)
+    before = snap.copy()
+    fills  = pd.DataFrame(None, index=snap.index, columns=snap.columns, dtype=object)
+    links  = {}
+    formats = {}
+    for job in jobs:
+        snap, fills, links, _, _ = _merge_into_frames(headers, snap, fills, links, job, formats)
+
+    # 值的差异（None 与空串视为相同）
+    rows  = snap.index.union(before.index)
+    a, b  = before.reindex(rows), snap.reindex(rows)
+    blank_a, blank_b = _blank_mask(a), _blank_mask(b)
+    changed = ~((a == b) | (blank_a & blank_b)).values
+    ri, ci  = np.nonzero(changed)
+    cells = [[int(r), int(c), _cs_value(x), _cs_value(y)]
+             for r, c, x, y in zip(rows[ri], a.columns[ci], a.values[ri, ci], b.values[ri, ci])]
+
+    by_column = {}
+    for _, c, _, _ in cells:
+        by_column[str(headers[c - 1])] = by_column.get(str(headers[c - 1]), 0) + 1
+    id_col   = headers.index('ID') + 1
+    new_rows = snap.index.difference(before.index)
+    change_set = {
+        "created":  ts,
+        "target":   "store" if use_store else "workbook",
+        "sheet":    sheet,
+        "headers":  headers,
+        "clear_old": any(job["clear_old"] == "Y" for job in jobs),
+        "sources":  [{"path": job["path"], "source": job["source_key"], "fingerprints": job["fps"]}
+                     for job in jobs],
+        "summary":  {"cells": len(cells), "appended": len(new_rows), "by_column": by_column},
+        "appended": [[int(r), _cs_value(snap.at[r, id_col])] for r in new_rows],
+        "cells":    cells,
+        "fills":    [[int(r), int(c), v] for (r, c), v in fills.stack().dropna().items()],
+        "links":    [[int(r), int(c), v] for (r, c), v in links.items()],
+        "formats":  [[int(r), int(c), v] for (r, c), v in formats.items() if r <= snap.index.max()],
+    }
+    out_fp = out_fp or os.path.join(ORIG_DIR, f"changeset_{ts}.json")
+    with open(out_fp, "w", encoding="utf-8") as f:
+        json.dump(change_set, f, ensure_ascii=False, separators=(",", ":"), default=str)
+    print(f"[{ts}] 变更集：改动 {len(cells)} 格，新增 {len(new_rows)} 行 → {out_fp}")
+    for hdr in ("Function", "Root cause", "Top issue Candidiate", "Rejected ticket"):
+        if hdr in by_column:
+            print(f"  {hdr}: {by_column[hdr]} 格")
+    return out_fp
+
+
+def apply_changes(cs_fp):
+    """把 plan_changes 生成的变更集应用到汇总表（或工单库），不重新计算差异"""
+    with open(cs_fp, encoding="utf-8") as f:
+        cs = json.load(f)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    orig_fp = os.path.join(ORIG_DIR, paths['original_file'])
+    cells = [(r, c, _cs_parse(old), _cs_parse(new)) for r, c, old, new in cs["cells"]]
+
+    def _same(x, y):
+        return x == y or (x in (None, "") and y in (None, ""))
+
+    if cs["target"] == "store":
+        headers, snap, fills, links = _store_load()
+        before_v, before_f = snap.copy(), fills.copy()
+        current = lambda r, c: snap.at[r, c] if r in snap.index else None
+    else:
+        wb, ws, ctx = _open_summary(orig_fp)
+        before = _journal_state(ws)
+        trim_trailing_blank_rows(ws, before)
+        headers = [ws.cell(1, c).value for c in range(1, ws.max_column + 1)]
+        # 只查不建：ws.cell() 会新建没有样式的空单元格
+        current = lambda r, c: getattr(ws._cells.get((r, c)), "value", None)
+
+    # 生成变更集之后表被改过就不应用
+    if headers != cs["headers"]:
+        print(f"❌ 表头与变更集不一致，未应用 {cs_fp}")
+        return False
+    stale = [(r, c) for r, c, old, _ in cells if not _same(current(r, c), old)]
+    if stale:
+        print(f"❌ 有 {len(stale)} 个单元格在生成变更集后被改过（如第 {stale[0][0]} 行第 {stale[0][1]} 列），未应用 {cs_fp}")
+        return False
+
+    jobs = [{"path": src["path"], "source_key": src["source"], "mapping": sources[src["source"]]["mapping"],
+             "date_col": sources[src["source"]].get("date_col"), "fps": src["fingerprints"],
+             "record_fp": STORE_DB if cs["target"] == "store" else orig_fp} for src in cs["sources"]]
+
+    if cs["target"] == "store":
+        if cs["clear_old"]:
+            fills = fills.where(~fills.isin(_managed_colors(highlight_colors)), None)
+        new_rows = sorted(({r for r, _, _, _ in cells} | {r for r, _, _ in cs["fills"]}) - set(snap.index))
+        snap  = snap.reindex(snap.index.append(pd.Index(new_rows)))
+        fills = fills.reindex(snap.index)
+        for r, c, _, new in cells:
+            snap.at[r, c] = new
+        for r, c, rgb in cs["fills"]:
+            fills.at[r, c] = rgb
+        links.update({(r, c): url for r, c, url in cs["links"]})
+        rows = _changed_rows(before_v, snap) | _changed_rows(before_f, fills)
+        _store_save(headers, snap, fills, links, rows=rows)
+        for job in jobs:
+            _fingerprint_commit(job["source_key"], job["fps"], STORE_DB)
+        _manifest_record([job["path"] for job in jobs])
+        print(f"[{ts}] 已把变更集应用到工单库：{len(cells)} 格")
+        _schedule_render()
+        return True
+
+    if cs["clear_old"]:
+        clear_highlight(ws, highlight_colors, before)
+    for r in range(1, ws.max_row + 1):
+        ws.row_dimensions[r].height = None
+    _journal_touch(before, ws, [(r, c) for r, c, _, _ in cells] + [(r, c) for r, c, _ in cs.get("formats", [])]
+                   + [(r, c) for r, c, _ in cs["links"]] + [(r, c) for r, c, _ in cs["fills"]])
+    for r, c, _, new in cells:
+        ws.cell(r, c).value = new
+    # 只套变更集里记下的格式（update_excel 会设置的那些），其它日期值保持单元格原格式
+    for r, c, fmt in cs.get("formats", []):
+        ws.cell(r, c).number_format = fmt
+    for r, c, url in cs["links"]:
+        cell = ws.cell(r, c)
+        cell.hyperlink = url
+        cell.style     = "Hyperlink"
+    fill_cache = {}
+    for r, c, rgb in cs["fills"]:
+        if rgb not in fill_cache:
+            fill_cache[rgb] = PatternFill("solid", fgColor=rgb)
+        ws.cell(r, c).fill = fill_cache[rgb]
+    print(f"[{ts}] 应用变更集 {cs_fp}：{len(cells)} 格")
+    _finish_summary(wb, ws, ctx, orig_fp, jobs, ts, before, f"apply {os.path.basename(cs_fp)}")
+    return True
+
+
+def repair_formulas():
+    """一次性重建所有数据行的公式列（平时每次运行只给新增行写公式）"""
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    orig_fp = os.path.join(ORIG_DIR, paths['original_file'])
+    if use_store:
+        headers, snap, fills, links = _store_load()
+        header2col = {h: c for c, h in enumerate(headers, start=1)}
+        before = snap.copy()
+        for col, tpl in _formula_templates(header2col):
+            snap[col] = [tpl.replace("{row}", str(r)) for r in snap.index]
+        rows = _changed_rows(before, snap)
+        _store_save(headers, snap, fills, links, rows=rows)
+        print(f"[{ts}] 工单库公式列已重建：{len(rows)} 行有变化")
+        render_store(orig_fp)
+        return
+
+    wb, ws, ctx = _open_summary(orig_fp)
+    before = _journal_state(ws)
+    trim_trailing_blank_rows(ws, before)
+    header2col = { ws.cell(1,c).value: c for c in range(1, ws.max_column+1) }
+    _journal_touch(before, ws, [(r, col) for col, _ in _formula_templates(header2col)
+                                for r in range(2, ws.max_row + 1)])
+    _write_formula_columns(ws, header2col, 2, ws.max_row)
+    _save_summary(wb, ctx, orig_fp)
+    print(f"[{ts}] 公式列已重建（第 2–{ws.max_row} 行），保存到原表{orig_fp}")
+    _journal_write("repair-formulas", ws, before, orig_fp)
+    wait_until_ready(orig_fp, "保存后刷新 Pivot")
+    _refresh_pivots_in_workbook(orig_fp, sheet)
+
+
+# === 已处理导出清单：守护进程启动时据此补处理停机期间到达的导出 ===
+def _manifest_db():
+    conn = sqlite3.connect(MANIFEST_DB)
+    conn.execute("CREATE TABLE IF NOT EXISTS manifest (path TEXT PRIMARY KEY, source TEXT, size INTEGER, "
+                 "mtime REAL, sha1 TEXT, run INTEGER, processed TEXT)")
+    return conn
+
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _manifest_record(paths_, run=None):
+    """导出处理成功（含“与上次相比没有变化”）后记入清单"""
+    rows = []
+    for p in paths_:
+        p = os.path.abspath(p)
+        try:
+            st = os.stat(p)
+            rows.append((p, _source_of(p), st.st_size, st.st_mtime, _file_sha1(p), run,
+                         datetime.now().strftime("%Y%m%d_%H%M%S")))
+        except OSError:
+            continue
+    with closing(_manifest_db()) as conn, conn:
+        conn.executemany("INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def catch_up_scan():
+    """
+    对比 JIRA / OCTANE 文件夹和已处理清单，返回需要补处理的导出：
+    每个来源只看最新的一份（后导出的覆盖先导出的），它没处理过或内容变了才返回。
+    临时文件和还没写完的文件（结尾不完整，见 _complete_trailer）不算，写完时监控会收到事件。
+    只是修改时间变了、内容哈希相同的（如同步盘重新下载）只更新清单。
+    """
+    with closing(_manifest_db()) as conn:
+        seen = {p: (size, mtime, sha1) for p, size, mtime, sha1
+                in conn.execute("SELECT path, size, mtime, sha1 FROM manifest")}
+    todo, touched = [], []
+    for folder in (JIRA_DIR, OCTANE_DIR):
+        if not os.path.isdir(folder):
+            continue
+        files = [os.path.join(folder, fn) for fn in os.listdir(folder)
+                 if fn.lower().endswith((".xlsx", ".csv")) and not _is_temp_name(fn)]
+        files = [f for f in files if os.path.isfile(f)]
+        partial = [f for f in files if not _trailer_ok(f)]
+        for f in partial:
+            print(f"  跳过未写完的 {os.path.basename(f)}")
+        files = [f for f in files if f not in partial]
+        if not files:
+            continue
+        newest = os.path.abspath(max(files, key=os.path.getmtime))
+        st = os.stat(newest)
+        old = seen.get(newest)
+        if old and old[:2] == (st.st_size, st.st_mtime):
+            continue
+        if old and old[2] == _file_sha1(newest):
+            touched.append(newest)
+            continue
+        todo.append(newest)
+        print(f"  补处理 {_source_of(newest)}：{os.path.basename(newest)}（{'内容有变化' if old else '未处理过'}）")
+    if touched:
+        with closing(_manifest_db()) as conn, conn:
+            conn.executemany("UPDATE manifest SET size = ?, mtime = ? WHERE path = ?",
+                             [(os.path.getsize(p), os.path.getmtime(p), p) for p in touched])
+    if not todo:
+        print("  停机期间没有新的导出")
+    return todo
+
+
+def _start_observer(handler, dirs):
+    """fs_watch.start_observer，监控模式 / 轮询间隔取 settings.observer / poll_interval_seconds"""
+    return fs_watch.start_observer(handler, dirs, observer_mode, poll_interval)
+
+
+_TEMP_SUFFIXES = ('.tmp', '.crdownload', '.part', '.partial', '.download')
+
+def _is_temp_name(path):
+    """下载 / 同步 / Excel 的临时文件，改名成正式文件名时会另有事件"""
+    name = os.path.basename(path).lower()
+    return name.startswith(('~$', '.~')) or name.endswith(_TEMP_SUFFIXES)
+
+
+def _complete_trailer(path):
+    """xlsx 等 zip 包要有中央目录结尾记录；csv 要以换行结尾。打不开时抛 OSError"""
+    if path.lower().endswith('.csv'):
+        with open(path, 'rb') as fh:
+            fh.seek(0, os.SEEK_END)
+            if fh.tell() == 0:
+                return False
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) in (b'\n', b'\r')
+    with open(path, 'rb'):
+        pass
+    return zipfile.is_zipfile(path)
+
+
+def _trailer_ok(path):
+    """_complete_trailer，打不开（被占用等）时按没写完处理"""
+    try:
+        return _complete_trailer(path)
+    except OSError:
+        return False
+
+
+class SettleTracker:
+    """
+    按路径跟踪还在写入的导出（OneDrive 同步、浏览器下载时 on_created 来得比写完早）：
+    size / mtime 连续 settle_seconds 不变、能打开、结尾完整后才交给 dispatch，
+    同一版本（size, mtime）只在 dispatch 成功后记为已交出，之后的重复事件忽略；改写成新版本会再交一次。
+    超过 timeout 仍不完整时：csv 照常交出（个别导出不以换行结尾），zip 包视为损坏跳过。
+    """
+    def __init__(self, dispatch, settle_seconds=2, timeout=120):
+        self._dispatch = dispatch
+        self._settle   = settle_seconds
+        self._timeout  = timeout
+        self._pending  = {}         # 路径 → [(size, mtime), 稳定起点, 首次登记时间]
+        self._done     = {}         # 路径 → 已交出的 (size, mtime)
+        self._cond     = threading.Condition()
+        threading.Thread(target=self._watch, name="settle-tracker", daemon=True).start()
+
+    def track(self, path):
+        with self._cond:
+            if path not in self._pending:
+                self._pending[path] = [None, 0.0, time.monotonic()]
+                self._cond.notify()
+
+    def _check(self, path, item, now):
+        """返回 'wait' / 'ready' / 'drop'"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return 'drop'
+        sig = (st.st_size, st.st_mtime_ns)
+        if self._done.get(path) == sig:
+            return 'drop'
+        if sig != item[0]:
+            # 第一次看到的文件按 mtime 推算已经稳定了多久，旧文件不用再等
+            age = max(time.time() - st.st_mtime, 0) if item[0] is None else 0
+            item[0], item[1] = sig, now - age
+        if now - item[1] < self._settle:
+            return 'wait'
+        if _trailer_ok(path):
+            return 'ready'
+        if now - item[2] < self._timeout:
+            return 'wait'
+        if path.lower().endswith('.csv'):
+            print(f"⚠️ {os.path.basename(path)} 等了 {self._timeout}s 仍不以换行结尾，按完整文件处理")
+            return 'ready'
+        print(f"❌ {os.path.basename(path)} 等了 {self._timeout}s 仍不是完整的 xlsx（zip 结尾缺失），跳过")
+        self._done[path] = sig
+        return 'drop'
+
+    def _watch(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                items = list(self._pending.items())
+            now, ready = time.monotonic(), []
+            for path, item in items:
+                state = self._check(path, item, now)
+                if state == 'wait':
+                    continue
+                with self._cond:
+                    self._pending.pop(path, None)
+                if state == 'ready':
+                    ready.append((path, item[0], now - item[2]))
+            for path, sig, waited in ready:
+                print(f"  {os.path.basename(path)} 已写完（登记后 {waited:.1f}s）")
+                try:
+                    self._dispatch(path)
+                    self._done[path] = sig
+                except Exception as e:
+                    print(f"❌ 处理 {path} 失败：{e}")
+                    traceback.print_exc()
+            time.sleep(ready_poll)
+
+
+def _mtime_or_zero(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+class UpdateQueue:
+    """
+    导出事件的工作队列：watchdog 的分发线程只管入队，专门的工作线程取出后执行更新，
+    长时间的更新不再堵住事件分发。
+    同一来源还没处理的事件合并成最新的那份导出（后导出的覆盖先导出的）；
+    一次取出多个来源时用 update_batch，只读写一次汇总表。
+    status() 给出队列深度、排队时长等统计；入队、开始和结束处理时都打印队列深度和正在处理的导出。
+    """
+    def __init__(self, delay_seconds=2):
+        self._delay   = delay_seconds
+        self._pending = {}          # 来源 → [路径, 首次入队时间, 最近入队时间]
+        self._running = None
+        self._closed  = False
+        self._cond    = threading.Condition()
+        self.stats    = {"enqueued": 0, "coalesced": 0, "runs": 0, "errors": 0,
+                         "last_wait": 0.0, "max_wait": 0.0}
+        self._worker  = threading.Thread(target=self._work, name="update-worker", daemon=True)
+        self._worker.start()
+
+    def put(self, path):
+        key = _source_of(path) or path
+        now = time.monotonic()
+        with self._cond:
+            self.stats["enqueued"] += 1
+            item = self._pending.get(key)
+            if item is None:
+                self._pending[key] = [path, now, now]
+            else:
+                self.stats["coalesced"] += 1
+                if _mtime_or_zero(path) >= _mtime_or_zero(item[0]):
+                    item[0] = path
+                item[2] = now
+            print(f"  入队 {key}：{os.path.basename(self._pending[key][0])}"
+                  f"{'（已合并）' if item else ''}；{self._status_line()}")
+            self._cond.notify()
+
+    def _status_line(self):
+        """队列深度和正在处理的导出（调用方持有 self._cond）"""
+        running = ", ".join(os.path.basename(p) for p in self._running) if self._running else "无"
+        return f"队列深度 {len(self._pending)}，正在处理：{running}"
+
+    def status(self):
+        with self._cond:
+            now = time.monotonic()
+            return dict(self.stats, depth=len(self._pending), running=self._running,
+                        oldest_wait=max((now - t0 for _, t0, _ in self._pending.values()), default=0.0))
+
+    def close(self):
+        """不再取新任务；等正在执行的更新结束，没来得及处理的导出打印出来"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+        if self._pending:
+            print(f"⚠️ 退出时还有 {len(self._pending)} 份导出未处理："
+                  + ", ".join(os.path.basename(p) for p, _, _ in self._pending.values()))
+
+    def _take(self):
+        """等到队列非空且最后一个事件之后静默 delay 秒，整批取出；关闭时返回 None"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                if self._pending:
+                    quiet = time.monotonic() - max(t for _, _, t in self._pending.values())
+                    if quiet >= self._delay:
+                        break
+                    self._cond.wait(self._delay - quiet)
+                else:
+                    self._cond.wait()
+            items, self._pending = list(self._pending.values()), {}
+            wait = time.monotonic() - min(t0 for _, t0, _ in items)
+            self.stats["last_wait"] = wait
+            self.stats["max_wait"]  = max(self.stats["max_wait"], wait)
+            self._running = [p for p, _, _ in items]
+            return self._running, wait
+
+    def _work(self):
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            paths_, wait = taken
+            with self._cond:
+                print(f"▶ 开始处理 {len(paths_)} 份导出（排队 {wait:.1f}s）；{self._status_line()}")
+            ok = False
+            try:
+                if len(paths_) == 1:
+                    update_excel(paths_[0])
+                else:
+                    update_batch(paths_)
+                ok = True
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ 更新失败：{e}")
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._running = None
+                    self.stats["runs"] += 1
+                    print(f"■ 处理{'完成' if ok else '失败'}：{', '.join(os.path.basename(p) for p in paths_)}；"
+                          f"{self._status_line()}（累计 {self.stats['runs']} 次，失败 {self.stats['errors']} 次）")
+
 
 class FolderHandler(FileSystemEventHandler):
-    def __init__(self, folders, debounce_seconds=5):
+    def __init__(self, folders, queue=None):
         self.folders = folders
-        # 用来记录上次对同一路径触发更新的时间戳
-        self._last_run = {}
-        self._debounce = debounce_seconds
+        # 重复事件由 SettleTracker 按文件版本去重、同一来源由 UpdateQueue 合并，不再按时间去抖
+        # （按时间去抖会把几秒内改写的新版本丢掉）
+        # 有队列时只入队，由工作线程执行；没有时仍在分发线程里直接更新
+        self._queue = queue
+        # 新文件先等写完再处理
+        self._settle = SettleTracker(self._dispatch, settle_seconds, settle_timeout)
 
     def on_created(self, event):
         self._maybe_update(event.src_path)
@@ -458,28 +2830,28 @@ class FolderHandler(FileSystemEventHandler):
         dir_name = os.path.basename(os.path.dirname(path))
         if dir_name not in (self.folders['jira_dir'], self.folders['octane_dir']):
             return
-
-        now = time.time()
-        last = self._last_run.get(path, 0)
-        # 如果上次更新离现在小于阈值，就跳过
-        if now - last < self._debounce:
-            print(f"⚠️ 去抖：忽略短时间内重复触发 {path}")
+        if _is_temp_name(path):
             return
+        self._settle.track(path)
 
-        # 记录本次时间，执行更新
-        self._last_run[path] = now
-        update_excel(path)
+    def _dispatch(self, path):
+        if self._queue is not None:
+            self._queue.put(path)
+        else:
+            update_excel(path)
 
 
 def main():
     for d in (ORIG_DIR, JIRA_DIR, OCTANE_DIR):
         os.makedirs(d, exist_ok=True)
 
-    observer = Observer()
-    handler  = FolderHandler(folders, debounce_seconds=5)
-    observer.schedule(handler, path=JIRA_DIR, recursive=False)
-    observer.schedule(handler, path=OCTANE_DIR, recursive=False)
-    observer.start()
+    queue    = UpdateQueue(queue_delay)
+    handler  = FolderHandler(folders, queue=queue)
+    _render_if_stale()
+    observer = _start_observer(handler, [JIRA_DIR, OCTANE_DIR])
+    # 停机期间到达的导出：只补每个来源最新且没处理过的那份
+    for path in catch_up_scan():
+        handler._maybe_update(path)
     print(f"监控：{JIRA_DIR}, {OCTANE_DIR}")
 
     '''schedule.every().day.at("18:00").do(lambda:
@@ -495,6 +2867,48 @@ def main():
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    queue.close()
+    flush_render()
+    print(f"队列统计：{queue.status()}")
 
 if __name__ == "__main__":
-    main()
+    # python tx_auto_update2.3.1.2.py render              —— 从工单库渲染汇总表
+    # python tx_auto_update2.3.1.2.py batch a.xlsx b.csv  —— 多份导出一次合并、一次保存
+    #                                                        （不按参数顺序：Octane 先合并，同来源按修改时间）
+    # python tx_auto_update2.3.1.2.py dry-run a.xlsx ...  —— 只生成变更集 JSON，不写汇总表（顺序同 batch）
+    # python tx_auto_update2.3.1.2.py apply changeset.json —— 应用之前生成的变更集
+    # python tx_auto_update2.3.1.2.py rollback [run]       —— 回滚某次 run；不带 run 列出最近的 run
+    # python tx_auto_update2.3.1.2.py repair-formulas      —— 整列重建 Days / Open >20 days / No TIS 公式
+    # python tx_auto_update2.3.1.2.py refresh-pivots       —— 只把透视缓存指向当前数据范围
+    # python tx_auto_update2.3.1.2.py consolidate-pivots [xlsx] —— 合并重复的透视缓存、删掉无人引用的缓存
+    # python tx_auto_update2.3.1.2.py reports              —— 重新生成 pandas 报表工作簿
+    # python tx_auto_update2.3.1.2.py catch-up             —— 补处理清单里没有的最新导出（不启动监控）
+    if sys.argv[1:2] == ["render"]:
+        render_store()
+    elif sys.argv[1:2] == ["batch"]:
+        update_batch(sys.argv[2:])
+    elif sys.argv[1:2] == ["dry-run"]:
+        plan_changes(sys.argv[2:])
+    elif sys.argv[1:2] == ["apply"]:
+        apply_changes(sys.argv[2])
+    elif sys.argv[1:2] == ["repair-formulas"]:
+        repair_formulas()
+    elif sys.argv[1:2] == ["refresh-pivots"]:
+        _refresh_pivots_in_workbook(os.path.join(ORIG_DIR, paths['original_file']), sheet)
+    elif sys.argv[1:2] == ["consolidate-pivots"]:
+        consolidate_pivot_caches(*sys.argv[2:3])
+    elif sys.argv[1:2] == ["reports"]:
+        build_reports(force=True)
+    elif sys.argv[1:2] == ["catch-up"]:
+        pending = catch_up_scan()
+        if pending:
+            update_batch(pending)
+    elif sys.argv[1:2] == ["rollback"]:
+        if sys.argv[2:]:
+            rollback(int(sys.argv[2]))
+        else:
+            list_runs()
+    else:
+        main()
+    # store 模式下 batch / apply / catch-up 只写了工单库，退出前把汇总表渲染出来
+    flush_render()
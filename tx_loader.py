@@ -0,0 +1,39 @@
+# tx_loader.py
+# 在指定工作目录里载入 tx_auto_update2.3.1.2.py，供 bench_*.py 和 tests/ 调用真实实现：
+# 脚本文件名带点，不能直接 import；而且导入时就会读取同目录下的 unified_config_auto3.json。
+# 所以这里先把脚本复制到 workdir，再把 unified_config_auto.json（加上覆盖项）写成
+# unified_config_auto3.json，然后按文件路径导入。脚本依赖的同目录模块（fs_watch）从仓库目录导入。
+
+import os
+import sys
+import json
+import shutil
+import importlib.util
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT   = "tx_auto_update2.3.1.2.py"
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def load_tx(workdir, settings=None, config="unified_config_auto.json"):
+    """
+    在 workdir 下准备 orig / Jira / Octane 三个目录和配置，返回载入后的模块。
+    settings 里的键覆盖配置文件的 settings；文件夹一律指向 workdir 内部。
+    """
+    with open(os.path.join(REPO_DIR, config), encoding="utf-8") as f:
+        cfg = json.load(f)
+    cfg["folders"].update({"orig_dir": "orig"})
+    cfg["settings"].update(settings or {})
+    for key in ("orig_dir", "jira_dir", "octane_dir"):
+        os.makedirs(os.path.join(workdir, cfg["folders"][key]), exist_ok=True)
+    with open(os.path.join(workdir, "unified_config_auto3.json"), "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False)
+
+    dst = os.path.join(workdir, SCRIPT)
+    shutil.copy(os.path.join(REPO_DIR, SCRIPT), dst)
+    name = "tx_auto_update_" + str(abs(hash(os.path.abspath(workdir))))
+    spec = importlib.util.spec_from_file_location(name, dst)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module